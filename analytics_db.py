@@ -0,0 +1,518 @@
+"""SQLite copy of a session dataset for the summary and seller comparison views.
+
+The pandas views keep each session's aggregates in the memory of every web
+worker that served it, so memory grows with the sessions holding large
+datasets. This module instead loads a dataset, chunk by chunk, into one SQLite
+file per dataset, and the views run indexed queries against it: only the rows
+of the requested page are read, and the file's pages are cached by the
+operating system rather than held per worker.
+
+Text values (seller and buyer PANs and names, products) are stored once in
+small dimension tables; the sales table holds their integer ids and the day,
+with indexes on seller (and day), buyer PAN, buyer name, product and day. The aggregates behind the views
+(summary per buyer and product, seller per buyer and product, seller totals)
+are computed in SQL when the file is built. The rank of a dimension value is
+its position in sorted order, which is how the views order their rows.
+
+A file records the dataset version it was built from; build() writes a new
+file aside and renames it into place, so readers never see half of one.
+
+The *_range() functions serve the JSON API: a slice (offset, limit) of the
+rows matching a filters dict (see matching_rows()), in a chosen order. Without
+a date range they read the aggregates; with one they sum the matching sales,
+using the index on their day.
+"""
+import datetime
+import json
+import os
+import sqlite3
+import uuid
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+# Columns build() reads from each chunk; missing ones are stored as NULL
+COLUMNS = ['SELLER_PAN', 'SELLER_NAME', 'PAN', 'NAME', 'HSN Desc.', 'Date', 'VALUE', 'QUANTITY_MT']
+
+# Files built with another layout are rebuilt
+SCHEMA_VERSION = '2'
+
+# Columns of the frames of summary_chunks() and seller_analysis_chunks()
+SUMMARY_COLUMNS = ['PAN', 'NAME', 'HSN Desc.', 'product_value', 'total_value']
+SELLER_ANALYSIS_COLUMNS = ['SELLER_PAN', 'SELLER_NAME', 'NAME', 'HSN Desc.', 'product_value', 'product_quantity']
+
+# Dimension table of each text column, in the order of the sales table
+_DIMENSIONS = [
+    ('SELLER_PAN', 'sellers', 'pan'),
+    ('SELLER_NAME', 'seller_names', 'name'),
+    ('PAN', 'buyer_pans', 'pan'),
+    ('NAME', 'buyer_names', 'name'),
+    ('HSN Desc.', 'products', 'hsn_desc'),
+]
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE sellers (id INTEGER PRIMARY KEY, pan UNIQUE, rank INTEGER, name);
+CREATE TABLE seller_names (id INTEGER PRIMARY KEY, name, rank INTEGER);
+CREATE TABLE buyer_pans (id INTEGER PRIMARY KEY, pan, rank INTEGER);
+CREATE TABLE buyer_names (id INTEGER PRIMARY KEY, name, rank INTEGER);
+CREATE TABLE products (id INTEGER PRIMARY KEY, hsn_desc, rank INTEGER);
+CREATE TABLE seller_directory (name PRIMARY KEY, seller INTEGER);
+CREATE TABLE sales (
+    seller INTEGER,
+    seller_name INTEGER,
+    pan INTEGER,
+    name INTEGER,
+    product INTEGER,
+    day INTEGER,
+    value,
+    quantity REAL
+);
+"""
+
+# Built after the sales rows are in: the aggregates behind the views, then the indexes
+# (the grouping sorts the table faster than it walks an index)
+_AGGREGATES = """
+CREATE TABLE summary_products (pan INTEGER, name INTEGER, product INTEGER, value,
+                               PRIMARY KEY (pan, name, product)) WITHOUT ROWID;
+INSERT INTO summary_products
+    SELECT pan, name, product, COALESCE(SUM(value), 0) FROM sales
+    WHERE pan IS NOT NULL AND name IS NOT NULL AND product IS NOT NULL
+    GROUP BY pan, name, product;
+
+CREATE TABLE summary_groups (rank INTEGER PRIMARY KEY, pan INTEGER, name INTEGER, total);
+INSERT INTO summary_groups (pan, name, total)
+    SELECT s.pan, s.name, SUM(s.value) FROM summary_products s
+    JOIN buyer_pans p ON p.id = s.pan JOIN buyer_names n ON n.id = s.name
+    GROUP BY s.pan, s.name ORDER BY MIN(p.rank), MIN(n.rank);
+
+CREATE TABLE seller_products (seller INTEGER, name INTEGER, product INTEGER, value, quantity,
+                              PRIMARY KEY (seller, name, product)) WITHOUT ROWID;
+INSERT INTO seller_products
+    SELECT seller, name, product, COALESCE(SUM(value), 0), COALESCE(SUM(quantity), 0) FROM sales
+    WHERE seller IS NOT NULL AND name IS NOT NULL AND product IS NOT NULL
+    GROUP BY seller, name, product;
+
+CREATE TABLE seller_totals (seller INTEGER PRIMARY KEY, value, quantity, buyers INTEGER, products INTEGER);
+INSERT INTO seller_totals
+    SELECT seller, COALESCE(SUM(value), 0), COALESCE(SUM(quantity), 0), 0, 0 FROM sales
+    WHERE seller IS NOT NULL GROUP BY seller;
+UPDATE seller_totals SET
+    buyers = (SELECT COUNT(DISTINCT name) FROM seller_products s WHERE s.seller = seller_totals.seller),
+    products = (SELECT COUNT(DISTINCT product) FROM seller_products s WHERE s.seller = seller_totals.seller);
+
+CREATE INDEX sales_seller ON sales (seller, day);
+CREATE INDEX sales_pan ON sales (pan);
+CREATE INDEX sales_name ON sales (name);
+CREATE INDEX sales_product ON sales (product);
+CREATE INDEX sales_day ON sales (day);
+"""
+
+_NAT_DAY = np.iinfo('int64').min
+_EPOCH = datetime.date(1970, 1, 1)
+
+# Key and measure columns of the aggregate tables matching_rows() can filter
+_AGGREGATE_TABLES = {
+    'summary_products': ('pan', ['value']),
+    'seller_products': ('seller', ['value', 'quantity']),
+}
+
+# ORDER BY terms of each sort of the *_range() functions
+SUMMARY_SORTS = {
+    'pan': ['bp.rank', 'n.rank'],
+    'name': ['n.rank', 'bp.rank'],
+    'total': ['g.total', 'bp.rank', 'n.rank'],
+}
+SELLER_SORTS = {
+    'name': ['s.name'],
+    'value': ['t.value', 's.name'],
+    'quantity': ['t.quantity', 's.name'],
+    'buyers': ['t.buyers', 's.name'],
+    'products': ['t.products', 's.name'],
+}
+# The comparison page's order: common buyers first, then those of seller 1 only, then of seller 2 only
+COMPARISON_SORTS = ('default', 'name', 'value1', 'value2')
+
+
+def _connect(path):
+    """Read-only connection to a built file"""
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+
+
+def _ranks(values):
+    """Position of each value in sorted order (by text where the values cannot be compared)"""
+    try:
+        ordered = sorted(values)
+    except TypeError:
+        ordered = sorted(values, key=str)
+    return {value: rank for rank, value in enumerate(ordered)}
+
+
+def _nullable(ids):
+    """Python list of ids with 0 (missing) as None"""
+    return [value or None for value in ids.tolist()]
+
+
+def _encode(series, ids):
+    """Dimension ids of a column, adding new values to ids ({value: id})"""
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        return [None] * len(series)
+    unique_ids = np.array([ids.setdefault(value, len(ids) + 1) for value in uniques.tolist()])
+    return _nullable(np.where(codes >= 0, unique_ids[codes], 0))
+
+
+def _days(series):
+    """Days since 1970-01-01 of a datetime column, None for missing dates"""
+    if series is None or not pd.api.types.is_datetime64_any_dtype(series):
+        return None
+    days = series.to_numpy(dtype='datetime64[D]').astype('int64')
+    return [None if day == _NAT_DAY else day for day in days.tolist()]
+
+
+def version(path):
+    """Version of the dataset a file was built from, or None if there is no file"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with closing(_connect(path)) as conn:
+            schema, dataset_version = conn.execute(
+                "SELECT (SELECT value FROM meta WHERE key = 'schema'), "
+                "(SELECT value FROM meta WHERE key = 'version')").fetchone()
+    except sqlite3.Error:
+        return None
+    return dataset_version if schema == SCHEMA_VERSION else None
+
+
+def build(path, dataset_version, chunks, details=None):
+    """Load the frames of chunks (with the COLUMNS) into a new file at path
+
+    details (a JSON-serializable dict) is stored with the file and returned by
+    info(), along with the row count and the distinct buyers and products.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    dimensions = {table: {} for _, table, _ in _DIMENSIONS}
+    listed_names = {}   # seller id -> first name seen with it, for the selection lists
+    directory = {}      # seller name -> first seller id seen with it
+    rows = 0
+    total_value = 0
+    try:
+        with closing(sqlite3.connect(tmp_path)) as conn:
+            # A file that is renamed into place only once complete needs no journal
+            conn.execute('PRAGMA journal_mode=OFF')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.executescript(_SCHEMA)
+            for chunk in chunks:
+                columns = [_encode(chunk[col], dimensions[table]) if col in chunk.columns else [None] * len(chunk)
+                           for col, table, _ in _DIMENSIONS]
+                days = _days(chunk['Date'] if 'Date' in chunk.columns else None) or [None] * len(chunk)
+                values = chunk['VALUE'].tolist() if 'VALUE' in chunk.columns else [None] * len(chunk)
+                quantities = (chunk['QUANTITY_MT'].tolist() if 'QUANTITY_MT' in chunk.columns
+                              else [None] * len(chunk))
+                conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 zip(*columns, days, values, quantities))
+
+                # First name of each seller and first seller of each name, in row order
+                for seller, name in dict.fromkeys(zip(columns[0], columns[1])):
+                    if seller is not None and name is not None:
+                        listed_names.setdefault(seller, name)
+                        directory.setdefault(name, seller)
+                rows += len(chunk)
+                if 'VALUE' in chunk.columns:
+                    total_value += chunk['VALUE'].sum()
+
+            for _, table, column in _DIMENSIONS:
+                ids = dimensions[table]
+                ranks = _ranks(list(ids))
+                conn.executemany(f"INSERT INTO {table} (id, {column}, rank) VALUES (?, ?, ?)",
+                                 ((ids[value], value, ranks[value]) for value in ids))
+            seller_name_values = {name_id: name for name, name_id in dimensions['seller_names'].items()}
+            conn.executemany("UPDATE sellers SET name = ? WHERE id = ?",
+                             ((seller_name_values[name_id], seller) for seller, name_id in listed_names.items()))
+            conn.executemany("INSERT INTO seller_directory VALUES (?, ?)",
+                             ((seller_name_values[name_id], seller) for name_id, seller in directory.items()))
+            conn.executescript(_AGGREGATES)
+
+            listed_sellers = conn.execute(
+                "SELECT COUNT(*) FROM sellers WHERE name IS NOT NULL AND name != '' AND name != 'None'").fetchone()[0]
+            info_details = dict(details or {}, rows=rows, sellers=listed_sellers, buyers=len(dimensions['buyer_names']),
+                                products=len(dimensions['products']), total_value=float(total_value))
+            conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                             [('schema', SCHEMA_VERSION), ('version', dataset_version),
+                              ('details', json.dumps(info_details))])
+            conn.commit()
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def info(path):
+    """The details stored by build(), with the row count and the sellers listed, buyers and products"""
+    with closing(_connect(path)) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'details'").fetchone()
+    return json.loads(row[0]) if row else {}
+
+
+def _summary_groups(conn, first, last):
+    """generate_summary() groups with ranks in (first, last], as summary_page() dicts"""
+    groups = {}
+    for rank, pan, name, total in conn.execute(
+            "SELECT g.rank, p.pan, n.name, g.total FROM summary_groups g "
+            "JOIN buyer_pans p ON p.id = g.pan JOIN buyer_names n ON n.id = g.name "
+            "WHERE g.rank > ? AND g.rank <= ? ORDER BY g.rank", (first, last)):
+        groups[rank] = {'pan': pan, 'name': name, 'products': [], 'total': total}
+    for rank, product, value in conn.execute(
+            "SELECT g.rank, p.hsn_desc, s.value FROM summary_groups g "
+            "JOIN summary_products s ON s.pan = g.pan AND s.name = g.name "
+            "JOIN products p ON p.id = s.product "
+            "WHERE g.rank > ? AND g.rank <= ? ORDER BY g.rank, p.rank", (first, last)):
+        groups[rank]['products'].append((product, value))
+    return list(groups.values())
+
+
+def summary_page(path, page, per_page):
+    """The (PAN, NAME) groups of one summary page and the page count, as app.summary_page()"""
+    with closing(_connect(path)) as conn:
+        total_groups = conn.execute("SELECT COUNT(*) FROM summary_groups").fetchone()[0]
+        first = min(max(page - 1, 0) * per_page, total_groups)
+        groups = _summary_groups(conn, first, first + per_page)
+    return groups, (total_groups + per_page - 1) // per_page
+
+
+def summary_chunks(path, groups_per_chunk=5000):
+    """The whole summary as frames with the columns of generate_summary()"""
+    with closing(_connect(path)) as conn:
+        total_groups = conn.execute("SELECT COUNT(*) FROM summary_groups").fetchone()[0]
+        for first in range(0, total_groups, groups_per_chunk):
+            rows = [(group['pan'], group['name'], product, value, group['total'])
+                    for group in _summary_groups(conn, first, first + groups_per_chunk)
+                    for product, value in group['products']]
+            yield pd.DataFrame.from_records(rows, columns=SUMMARY_COLUMNS)
+
+
+def seller_analysis_chunks(path, chunk_rows=50000):
+    """generate_seller_analysis()['seller_analysis'] as frames, aggregated by the query"""
+    with closing(_connect(path)) as conn:
+        cursor = conn.execute(
+            "SELECT s.pan, sn.name, n.name, p.hsn_desc, COALESCE(SUM(x.value), 0), COALESCE(SUM(x.quantity), 0) "
+            "FROM sales x JOIN sellers s ON s.id = x.seller JOIN seller_names sn ON sn.id = x.seller_name "
+            "JOIN buyer_names n ON n.id = x.name JOIN products p ON p.id = x.product "
+            "GROUP BY x.seller, x.seller_name, x.name, x.product "
+            "ORDER BY MIN(s.rank), MIN(sn.rank), MIN(n.rank), MIN(p.rank)")
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=SELLER_ANALYSIS_COLUMNS)
+
+
+def _seller_id(conn, name):
+    row = conn.execute("SELECT seller FROM seller_directory WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _contains(text):
+    """LIKE pattern (with ESCAPE '\\') matching text anywhere, ignoring ASCII case"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def _day(date):
+    return (date - _EPOCH).days
+
+
+def matching_rows(table, filters=None):
+    """SQL (and its parameters) selecting the rows of an aggregate table that match filters
+
+    filters is a dict with any of 'hsn' and 'buyer' (text found anywhere in
+    the HSN description or the buyer name, ignoring case) and 'date_from' and
+    'date_to' (datetime.date, inclusive). The aggregates have no dates, so with
+    a date range the rows are summed from the sales of the range instead;
+    sales without a date are then left out.
+    """
+    filters = filters or {}
+    first_key, measures = _AGGREGATE_TABLES[table]
+    keys = f"{first_key}, name, product"
+    clauses, params = [], []
+    if filters.get('hsn'):
+        clauses.append("product IN (SELECT id FROM products WHERE hsn_desc LIKE ? ESCAPE '\\')")
+        params.append(_contains(filters['hsn']))
+    if filters.get('buyer'):
+        clauses.append("name IN (SELECT id FROM buyer_names WHERE name LIKE ? ESCAPE '\\')")
+        params.append(_contains(filters['buyer']))
+    if filters.get('date_from') is None and filters.get('date_to') is None:
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return f"SELECT {keys}, {', '.join(measures)} FROM {table}{where}", params
+
+    clauses += [f"{key} IS NOT NULL" for key in (first_key, 'name', 'product')]
+    if filters.get('date_from') is not None:
+        clauses.append("day >= ?")
+        params.append(_day(filters['date_from']))
+    if filters.get('date_to') is not None:
+        clauses.append("day <= ?")
+        params.append(_day(filters['date_to']))
+    sums = ', '.join(f"COALESCE(SUM({measure}), 0) AS {measure}" for measure in measures)
+    return f"SELECT {keys}, {sums} FROM sales WHERE {' AND '.join(clauses)} GROUP BY {keys}", params
+
+
+def _filtered(filters):
+    return bool(filters) and any(value is not None and value != '' for value in filters.values())
+
+
+def _order_by(terms, descending):
+    return ', '.join(f"{term} DESC" if descending else term for term in terms)
+
+
+def _seller_totals(conn, seller, filters=None):
+    """(value, quantity) of a seller's rows, or of those matching filters"""
+    if not _filtered(filters):
+        row = conn.execute("SELECT value, quantity FROM seller_totals WHERE seller = ?", (seller,)).fetchone()
+        return tuple(row) if row else (0, 0)
+    rows_sql, params = matching_rows('seller_products', filters)
+    row = conn.execute(f"SELECT COALESCE(SUM(value), 0), COALESCE(SUM(quantity), 0) FROM ({rows_sql}) "
+                       f"WHERE seller IS ?", (*params, seller)).fetchone()
+    return tuple(row)
+
+
+def _comparison(conn, seller1, seller2, start, count, filters=None, sort='default', descending=False):
+    """Buyers start to start + count of the comparison of two sellers (by name)
+
+    Returns (buyers, total buyers, (seller1 value, quantity), (seller2 value,
+    quantity)), buyers as app.build_comparison_view().
+    """
+    seller1_id = _seller_id(conn, seller1)
+    seller2_id = _seller_id(conn, seller2)
+    sellers_ids = (seller1_id, seller2_id)
+    rows_sql, params = matching_rows('seller_products', filters)
+
+    buyer_rows = conn.execute(
+        f"SELECT s.name, n.name, n.rank, MAX(s.seller IS ?), MAX(s.seller IS ?), "
+        f"SUM(CASE WHEN s.seller IS ? THEN s.value END), SUM(CASE WHEN s.seller IS ? THEN s.value END) "
+        f"FROM ({rows_sql}) s JOIN buyer_names n ON n.id = s.name "
+        f"WHERE s.seller IN (?, ?) GROUP BY s.name", (*sellers_ids, *sellers_ids, *params, *sellers_ids)).fetchall()
+    if sort == 'name':
+        buyer_rows.sort(key=lambda row: row[2], reverse=descending)
+    elif sort in ('value1', 'value2'):
+        column = 5 if sort == 'value1' else 6
+        # Buyers the seller does not sell to come last either way
+        buyer_rows.sort(key=lambda row: row[2])
+        buyer_rows.sort(key=lambda row: -(row[column] or 0) if descending else (row[column] or 0))
+        buyer_rows.sort(key=lambda row: row[column] is None)
+    else:
+        buyer_rows.sort(key=lambda row: (0 if row[3] and row[4] else 1 if row[3] else 2, row[2]),
+                        reverse=descending)
+    page_buyers = buyer_rows[start:start + count] if start >= 0 else []
+
+    # Only the product rows of the buyers on this page are read
+    placeholders = ', '.join('?' * len(page_buyers))
+    products = {buyer_id: {} for buyer_id, *_ in page_buyers}
+    for seller, buyer_id, product, rank, value, quantity in conn.execute(
+            f"SELECT s.seller, s.name, p.hsn_desc, p.rank, s.value, s.quantity "
+            f"FROM ({rows_sql}) s JOIN products p ON p.id = s.product "
+            f"WHERE s.seller IN (?, ?) AND s.name IN ({placeholders})",
+            (*params, *sellers_ids, *products)):
+        entry = products[buyer_id].setdefault(rank, {'name': product, 'value1': None, 'qty1': None,
+                                                     'value2': None, 'qty2': None})
+        if seller == seller1_id:
+            entry['value1'], entry['qty1'] = value, quantity
+        if seller == seller2_id:
+            entry['value2'], entry['qty2'] = value, quantity
+
+    buyers = []
+    for buyer_id, buyer_name, *_ in page_buyers:
+        # Seller 1's products first, then those only seller 2 sells, each alphabetically
+        rows = [entry for _, entry in sorted(products[buyer_id].items(),
+                                             key=lambda item: (item[1]['value1'] is None, item[0]))]
+        buyer = {'name': buyer_name, 'products': rows}
+        for total, column in (('total1', 'value1'), ('qty_total1', 'qty1'),
+                              ('total2', 'value2'), ('qty_total2', 'qty2')):
+            present = [entry[column] for entry in rows if entry[column] is not None]
+            buyer[total] = sum(present) if present else None
+        buyers.append(buyer)
+
+    return (buyers, len(buyer_rows), _seller_totals(conn, seller1_id, filters),
+            _seller_totals(conn, seller2_id, filters))
+
+
+def comparison(path, seller1, seller2, page, per_page):
+    """Comparison of two sellers, given by name, as app.build_comparison_view()
+
+    Returns (buyers, total_pages, (seller1 value, quantity), (seller2 value,
+    quantity)), the totals being over all of the seller's rows.
+    """
+    with closing(_connect(path)) as conn:
+        buyers, total_buyers, totals1, totals2 = _comparison(conn, seller1, seller2, (page - 1) * per_page, per_page)
+    return buyers, (total_buyers + per_page - 1) // per_page, totals1, totals2
+
+
+def comparison_range(path, seller1, seller2, offset, limit, filters=None, sort='default', descending=False):
+    """Buyers offset to offset + limit of a comparison, as _comparison(), in a sort of COMPARISON_SORTS
+
+    The seller totals are over the rows matching filters.
+    """
+    with closing(_connect(path)) as conn:
+        return _comparison(conn, seller1, seller2, offset, limit, filters, sort, descending)
+
+
+def summary_range(path, offset, limit, filters=None, sort='pan', descending=False):
+    """(groups, total groups) of the summary of the rows matching filters, in a sort of SUMMARY_SORTS
+
+    Groups are summary_page() dicts; their products are in HSN description order.
+    """
+    rows_sql, params = matching_rows('summary_products', filters)
+    if _filtered(filters):
+        groups_sql = f"SELECT pan, name, SUM(value) AS total FROM ({rows_sql}) GROUP BY pan, name"
+        groups_params = params
+    else:
+        groups_sql, groups_params = "SELECT pan, name, total FROM summary_groups", []
+    with closing(_connect(path)) as conn:
+        total_groups = conn.execute(f"SELECT COUNT(*) FROM ({groups_sql})", groups_params).fetchone()[0]
+        groups = {}
+        for pan_id, name_id, pan, name, total in conn.execute(
+                f"SELECT g.pan, g.name, bp.pan, n.name, g.total FROM ({groups_sql}) g "
+                f"JOIN buyer_pans bp ON bp.id = g.pan JOIN buyer_names n ON n.id = g.name "
+                f"ORDER BY {_order_by(SUMMARY_SORTS[sort], descending)} LIMIT ? OFFSET ?",
+                (*groups_params, limit, offset)):
+            groups[pan_id, name_id] = {'pan': pan, 'name': name, 'products': [], 'total': total}
+
+        pans = sorted({pan_id for pan_id, _ in groups})
+        for pan_id, name_id, product, value in conn.execute(
+                f"SELECT s.pan, s.name, p.hsn_desc, s.value FROM ({rows_sql}) s "
+                f"JOIN products p ON p.id = s.product "
+                f"WHERE s.pan IN ({', '.join('?' * len(pans))}) ORDER BY p.rank", (*params, *pans)):
+            group = groups.get((pan_id, name_id))
+            if group is not None:
+                group['products'].append((product, value))
+    return list(groups.values()), total_groups
+
+
+def seller_range(path, offset, limit, search=None, filters=None, sort='name', descending=False):
+    """(sellers, total sellers) listed for selection, one per PAN, with their totals
+
+    search is text found anywhere in the seller name, ignoring case. Each
+    seller is a dict of name, pan, value, quantity, buyers and products, over
+    the rows matching filters; in a sort of SELLER_SORTS.
+    """
+    if _filtered(filters):
+        rows_sql, params = matching_rows('seller_products', filters)
+        totals_sql = (f"SELECT seller, SUM(value) AS value, SUM(quantity) AS quantity, "
+                      f"COUNT(DISTINCT name) AS buyers, COUNT(DISTINCT product) AS products "
+                      f"FROM ({rows_sql}) GROUP BY seller")
+    else:
+        totals_sql, params = "SELECT * FROM seller_totals", []
+    clauses = ["s.name IS NOT NULL", "s.name != ''", "s.name != 'None'"]
+    if search:
+        clauses.append("s.name LIKE ? ESCAPE '\\'")
+        params = [*params, _contains(search)]
+    query = (f"FROM ({totals_sql}) t JOIN sellers s ON s.id = t.seller WHERE {' AND '.join(clauses)}")
+    with closing(_connect(path)) as conn:
+        total_sellers = conn.execute(f"SELECT COUNT(*) {query}", params).fetchone()[0]
+        sellers_page = [
+            {'name': name, 'pan': pan, 'value': value, 'quantity': quantity, 'buyers': buyers, 'products': products}
+            for name, pan, value, quantity, buyers, products in conn.execute(
+                f"SELECT s.name, s.pan, t.value, t.quantity, t.buyers, t.products {query} "
+                f"ORDER BY {_order_by(SELLER_SORTS[sort], descending)} LIMIT ? OFFSET ?",
+                (*params, limit, offset))]
+    return sellers_page, total_sellers
@@ -1,15 +1,32 @@
 import os
 import pandas as pd
 import numpy as np
-from flask import Flask, render_template, request, send_file, flash, redirect, url_for, session
+from flask import (Flask, render_template, request, send_file, flash, redirect, url_for, session, jsonify,
+                   Response, abort, g, stream_with_context)
 from werkzeug.utils import secure_filename
 import re
-from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
-import pickle
+from datetime import date, datetime
 import uuid
-import gc  # For garbage collection
+import copy
+import tempfile
+import threading
+import time
+import multiprocessing
+import shutil
+import zipfile
+import hmac
+import weakref
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+import analytics_db
+import excel_io
+import instrumentation
+import jobs
+import lifecycle
+import price_lists
+import profiling
+import result_cache
+import session_store
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here-change-this-to-random-string'  # Change this to a random secret key
@@ -20,6 +37,7 @@ UPLOAD_FOLDER = 'uploads'
 PROCESSED_FOLDER = 'processed'
 CACHE_FOLDER = 'cache'
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+BATCH_EXTENSIONS = ALLOWED_EXTENSIONS | {'zip'}
 
 # Create directories if they don't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -30,30 +48,603 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['PROCESSED_FOLDER'] = PROCESSED_FOLDER
 app.config['CACHE_FOLDER'] = CACHE_FOLDER
 
+# Session datasets are stored as Feather files (memory-mapped, column-selective reads)
+# when pyarrow is installed; set to 'pickle' to force the old format
+app.config['SESSION_CACHE_FORMAT'] = session_store.FEATHER
+
+# Per-worker in-memory cache of loaded session datasets (bytes, 0 disables it)
+app.config['SESSION_MEMORY_BUDGET'] = 256 * 1024 * 1024
+dataframe_cache = session_store.DataFrameCache(app.config['SESSION_MEMORY_BUDGET'])
+
+# Per-worker cache of generate_seller_analysis results, keyed by dataset version
+app.config['ANALYSIS_MEMORY_BUDGET'] = 256 * 1024 * 1024
+analysis_cache = session_store.DataFrameCache(app.config['ANALYSIS_MEMORY_BUDGET'])
+
+# Per-worker cache of generate_summary results, keyed by dataset version
+app.config['SUMMARY_MEMORY_BUDGET'] = 64 * 1024 * 1024
+summary_cache = session_store.DataFrameCache(app.config['SUMMARY_MEMORY_BUDGET'])
+
+# The in-memory caches by the name /metrics reports them under
+MEMORY_CACHES = {'dataframe': dataframe_cache, 'analysis': analysis_cache, 'summary': summary_cache}
+
+# Engine for reading uploaded workbooks: None picks calamine when python-calamine is
+# installed and openpyxl (read-only streaming) otherwise
+app.config['EXCEL_READER'] = None
+
+# Uploads bigger than this are processed in chunks of PROCESS_CHUNK_ROWS rows, which keeps
+# memory flat however large the export is (0 processes every upload in one piece)
+app.config['CHUNKED_UPLOAD_BYTES'] = 20 * 1024 * 1024
+app.config['PROCESS_CHUNK_ROWS'] = 50000
+# Chunked processing reads with openpyxl streaming: calamine is several times faster but
+# holds the whole sheet in memory while reading (None uses EXCEL_READER's choice)
+app.config['CHUNKED_EXCEL_READER'] = excel_io.OPENPYXL
+
+# Workbooks of a batch upload are read in parallel by this many processes (1 reads them
+# one after another in the job), and zip files may hold at most this much uncompressed
+app.config['BATCH_WORKERS'] = os.cpu_count() or 1
+app.config['MAX_BATCH_UNZIPPED_BYTES'] = 1024 * 1024 * 1024
+
+# Price lists uploaded to the data cleaner are kept here as HSN lookups, so later
+# cleanings can pick one instead of uploading the file again
+app.config['PRICE_LIST_FOLDER'] = os.path.join(CACHE_FOLDER, 'price_lists')
+
+# Results of uploads and cleanings are cached by the content of the uploaded files, so
+# uploading the same export again restores the first result (0 bytes disables the cache)
+app.config['RESULT_CACHE_FOLDER'] = os.path.join(CACHE_FOLDER, 'results')
+app.config['RESULT_CACHE_BYTES'] = 2 * 1024 * 1024 * 1024
+# Part of every result cache key: bump it when a change to the pipelines changes their results
+RESULT_PIPELINE_VERSION = 1
+
+# Uploads and data cleaning run in background processes so they never hold a request
+# thread (0 runs them inside the request instead)
+app.config['JOB_WORKERS'] = 2
+app.config['JOBS_DATABASE'] = os.path.join(CACHE_FOLDER, 'jobs.sqlite3')
+job_queue = jobs.JobQueue(app.config['JOBS_DATABASE'], max_workers=app.config['JOB_WORKERS'])
+
+# Disk quotas of the working folders (see lifecycle.py), by the config key of the folder:
+# files unused for max_age seconds are removed, then the least recently used ones until
+# the folder fits in max_bytes. Files younger than min_age may belong to a running job and
+# are kept, as is everything of a session used within ACTIVE_SESSION_SECONDS
+app.config['STORAGE_QUOTAS'] = {
+    'UPLOAD_FOLDER': {'max_bytes': 2 * 1024 * 1024 * 1024, 'max_age': 24 * 3600, 'min_age': 3600},
+    'PROCESSED_FOLDER': {'max_bytes': 5 * 1024 * 1024 * 1024, 'max_age': 7 * 24 * 3600, 'min_age': 3600},
+    'CACHE_FOLDER': {'max_bytes': 10 * 1024 * 1024 * 1024, 'max_age': 7 * 24 * 3600, 'min_age': 3600},
+}
+app.config['ACTIVE_SESSION_SECONDS'] = 4 * 3600
+# Every web worker sweeps the folders this often (0 leaves it to `flask --app app cleanup`)
+app.config['STORAGE_SWEEP_SECONDS'] = 15 * 60
+app.config['STORAGE_METRICS'] = os.path.join(CACHE_FOLDER, 'lifecycle.json')
+
+# Wall time, rows and memory of every pipeline stage and route, from all processes (see
+# instrumentation.py), served at /metrics
+app.config['METRICS_DATABASE'] = os.path.join(CACHE_FOLDER, 'metrics.sqlite3')
+instrumentation.configure(app.config['METRICS_DATABASE'])
+
+# Opt-in profiles of single requests (see profiling.py): send the header 'X-Profile: cpu' (or
+# 'memory') with 'X-Profile-Token: <PROFILE_TOKEN>', or the query parameters _profile and
+# _profile_token. Jobs queued by a profiled request are profiled too. Without a token
+# profiling is off. Recent profiles are listed at /profiles?token=<PROFILE_TOKEN>
+app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN')
+app.config['PROFILE_FOLDER'] = os.path.join(CACHE_FOLDER, 'profiles')
+app.config['PROFILE_KEEP'] = 50
+
+# Backend of the summary, seller comparison and their exports. 'pandas' keeps each session's
+# aggregates in the worker's memory caches; 'sqlite' loads each dataset into its own SQLite
+# file (see analytics_db.py) and answers every page with indexed queries, so worker memory
+# no longer grows with the sessions holding large datasets
+app.config['ANALYTICS_BACKEND'] = 'pandas'
+
+# Columns each analytics view reads from the session dataset
+SUMMARY_COLUMNS = ['PAN', 'NAME', 'HSN Desc.', 'VALUE']
+SELLER_ANALYSIS_COLUMNS = ['From GSTIN & Name', 'NAME', 'HSN Desc.', 'VALUE', 'QTY.MT', 'Assess Val.']
+
+# Session dataset columns stored as categoricals when their values repeat enough, and
+# 'DD-MM-YYYY' text columns stored as datetime64 (see compact_session_dataset)
+CATEGORY_COLUMNS = ['PAN', 'NAME', 'GSTIN', 'From GSTIN & Name', 'From Place & Pin', 'To Place & Pin',
+                    'HSN Desc.', 'HSN Code']
+DATE_COLUMNS = ['Date']
+
 # Helper functions for session data storage using file-based cache
-def save_to_session(df):
-    """Save DataFrame to file-based cache and store reference in session"""
+def current_session_id():
+    """Return the session's ID, creating one if the session does not have it yet"""
     # Generate unique session ID if not exists
     if 'session_id' not in session:
         session['session_id'] = str(uuid.uuid4())
-    
-    cache_file = os.path.join(app.config['CACHE_FOLDER'], f"{session['session_id']}.pkl")
-    with open(cache_file, 'wb') as f:
-        pickle.dump(df, f)
-    
-    session['has_data'] = True
+    return session['session_id']
+
+def write_session_dataset(session_id, df):
+    """Save DataFrame to the file-based cache of a session (usable outside a request)"""
+    with instrumentation.stage('store', rows_in=len(df)) as stage:
+        session_store.write_dataset(app.config['CACHE_FOLDER'], session_id, df,
+                                    fmt=app.config['SESSION_CACHE_FORMAT'])
+        stage['rows_out'] = len(df)
+    invalidate_session_caches(session_id)
+
+def session_compact_dtypes():
+    """CompactDtypes for the columns of the session dataset"""
+    return session_store.CompactDtypes(CATEGORY_COLUMNS, DATE_COLUMNS, date_format='%d-%m-%Y')
+
+def compact_session_dataset(session_id):
+    """Rewrite the stored session dataset with compact column types
+
+    Categoricals for the repeated text columns, int32 where the values fit and
+    datetime64 dates make the dataset smaller on disk and in the caches, and
+    speed up the groupbys of the analytics views. Groupbys on these columns
+    must pass observed=True.
+    """
+    compact = session_compact_dtypes()
+    with instrumentation.stage('compact') as stage:
+        before, after = session_store.compact_dataset(app.config['CACHE_FOLDER'], session_id, compact,
+                                                      fmt=app.config['SESSION_CACHE_FORMAT'])
+        stage['rows_in'] = stage['rows_out'] = compact.rows
+    for state, size in (('before', before), ('after', after)):
+        instrumentation.set_gauge('session_dataset_bytes', 'In-memory size of the last session dataset compacted',
+                                  size, state=state)
+    invalidate_session_caches(session_id)
+
+def invalidate_session_caches(session_id):
+    """Drop this worker's in-memory copies of a session's data"""
+    dataframe_cache.invalidate(session_id)
+    analysis_cache.invalidate(session_id)
+    summary_cache.invalidate(session_id)
+
+def load_from_session(columns=None):
+    """Load DataFrame from file-based cache, optionally only the given columns
+
+    The returned frame may be shared with other requests through the in-memory
+    cache, so callers must not modify it in place.
+    """
+    session_id, version = session_dataset_version()
+    if version is not None:
+        df = dataframe_cache.get(session_id, version, columns)
+        if df is None:
+            df = session_store.read_dataset(app.config['CACHE_FOLDER'], session_id, columns=columns)
+            if df is not None:
+                dataframe_cache.put(session_id, version, df, columns)
+        return df
+    return None
 
-def load_from_session():
-    """Load DataFrame from file-based cache"""
+def session_dataset_version():
+    """Return (session_id, dataset version) for the current session, version is None without data"""
     if 'session_id' in session and session.get('has_data'):
-        cache_file = os.path.join(app.config['CACHE_FOLDER'], f"{session['session_id']}.pkl")
-        if os.path.exists(cache_file):
-            with open(cache_file, 'rb') as f:
-                return pickle.load(f)
+        session_id = session['session_id']
+        version = session_store.dataset_version(app.config['CACHE_FOLDER'], session_id)
+        if version is None:
+            # Removed by the storage sweep after the session was inactive for a while
+            session['has_data'] = False
+            session['data_expired'] = True
+        else:
+            lifecycle.touch(session_marker_path(session_id))
+        return session_id, version
+    return None, None
+
+def session_marker_path(session_id):
+    """File whose modification time is the last use of a session's data (see lifecycle.py)"""
+    return os.path.join(app.config['CACHE_FOLDER'], f"{session_id}.used")
+
+def no_data_message(message):
+    """message for a request without session data, or that the data expired if it did"""
+    if session.pop('data_expired', False):
+        return 'Your processed data was removed after a period of inactivity, please upload the file again'
+    return message
+
+def session_columns():
+    """Return the column names of the session dataset without loading it"""
+    if 'session_id' in session and session.get('has_data'):
+        return session_store.dataset_columns(app.config['CACHE_FOLDER'], session['session_id'])
     return None
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def seller_analysis_columns():
+    """Columns needed by generate_seller_analysis, including the 2024-25 price column if present"""
+    columns = list(SELLER_ANALYSIS_COLUMNS)
+    columns += [col for col in (session_columns() or []) if '2024-25' in str(col)]
+    return columns
+
+def appended_rows(cache, session_id, version, columns):
+    """Return (value cached in cache, rows added since) if rows were only appended since it
+
+    Returns (None, None) when nothing is cached or the dataset changed otherwise.
+    """
+    cached_version, cached = cache.latest(session_id)
+    if cached is None:
+        return None, None
+    lineage = session_store.read_lineage(app.config['CACHE_FOLDER'], session_id)
+    if cached_version not in lineage or version not in lineage or lineage[cached_version] > lineage[version]:
+        return None, None
+    new_rows = session_store.read_dataset(app.config['CACHE_FOLDER'], session_id, columns=columns,
+                                          start=lineage[cached_version])
+    if new_rows is None:
+        return None, None
+    return cached, new_rows
+
+def load_summary():
+    """Return the generate_summary() frame and its (PAN, NAME) block offsets, memoized per dataset version
+
+    Returns None if there is no session data or the summary failed.
+    """
+    session_id, version = session_dataset_version()
+    if version is None:
+        return None
+
+    summary_data = summary_cache.get(session_id, version)
+    if summary_data is None:
+        cached, new_rows = appended_rows(summary_cache, session_id, version, SUMMARY_COLUMNS)
+        if cached is not None:
+            # Only rows were added since the cached summary: summarize just those
+            new_summary = generate_summary(new_rows)
+            summary_df = merge_summaries(cached['summary'], new_summary) if new_summary is not None else None
+        else:
+            processed_data = load_from_session(columns=SUMMARY_COLUMNS)
+            if processed_data is None:
+                return None
+            with instrumentation.stage('summary', rows_in=len(processed_data)) as stage:
+                summary_df = generate_summary(processed_data)
+                stage['rows_out'] = 0 if summary_df is None else len(summary_df)
+        if summary_df is None:
+            return None
+        summary_data = {'summary': summary_df, 'starts': summary_block_starts(summary_df)}
+        summary_cache.put(session_id, version, summary_data)
+    return summary_data
+
+def load_seller_analysis():
+    """Return generate_seller_analysis() for the session dataset, memoized per dataset version
+
+    Returns None if there is no session data or the analysis failed.
+    """
+    session_id, version = session_dataset_version()
+    if version is None:
+        return None
+
+    analysis_data = analysis_cache.get(session_id, version)
+    if analysis_data is None:
+        cached, new_rows = appended_rows(analysis_cache, session_id, version, seller_analysis_columns())
+        if cached is not None:
+            # Only rows were added since the cached analysis: analyze just those
+            new_analysis = generate_seller_analysis(new_rows)
+            analysis_data = merge_seller_analysis(cached, new_analysis) if new_analysis is not None else None
+        else:
+            processed_data = load_from_session(columns=seller_analysis_columns())
+            if processed_data is None:
+                return None
+            with instrumentation.stage('seller_analysis', rows_in=len(processed_data)) as stage:
+                analysis_data = generate_seller_analysis(processed_data)
+                stage['rows_out'] = 0 if analysis_data is None else len(analysis_data['seller_analysis'])
+        if analysis_data is not None:
+            with instrumentation.stage('seller_index', rows_in=len(analysis_data['processed_data'])) as stage:
+                analysis_data['seller_index'] = build_seller_index(analysis_data['processed_data'])
+                stage['rows_out'] = len(analysis_data['seller_index']['products'])
+            analysis_cache.put(session_id, version, analysis_data)
+    return analysis_data
+
+# One lock per analytics database path. An entry lives as long as a request holds or waits
+# on its lock, so a third request cannot start a second build, and then goes away by itself
+_analytics_build_locks = weakref.WeakValueDictionary()
+_analytics_build_locks_lock = threading.Lock()
+
+def analytics_rows(df):
+    """The columns analytics_db.build() loads, from a chunk of the session dataset"""
+    rows = seller_rows(df)
+    if 'Date' in rows.columns and not pd.api.types.is_datetime64_any_dtype(rows['Date']):
+        rows['Date'] = pd.to_datetime(rows['Date'], format='%d-%m-%Y', errors='coerce')
+    return rows[[col for col in analytics_db.COLUMNS if col in rows.columns]]
+
+def analytics_database():
+    """Path of the session dataset's analytics database, built on first use; None without data
+
+    The database belongs to the session's group of cache files, so the storage
+    sweep removes it with the dataset.
+    """
+    session_id, version = session_dataset_version()
+    if version is None:
+        return None
+    path = os.path.join(app.config['CACHE_FOLDER'], f"{session_id}.analytics.sqlite3")
+    if analytics_db.version(path) == version:
+        return path
+
+    with _analytics_build_locks_lock:
+        lock = _analytics_build_locks.get(path)
+        if lock is None:
+            lock = _analytics_build_locks[path] = threading.Lock()
+    with lock:
+        # Another request of this worker may have built it while this one waited
+        if analytics_db.version(path) != version:
+            columns = seller_analysis_columns() + ['PAN', 'Date']
+            has_price_col = any('2024-25' in str(col) for col in columns)
+            chunks = session_store.read_dataset_chunks(app.config['CACHE_FOLDER'], session_id, columns=columns)
+            with instrumentation.stage('analytics_build') as stage:
+                analytics_db.build(path, version, (analytics_rows(chunk) for chunk in chunks),
+                                   details={'has_price_col': has_price_col})
+                stage['rows_in'] = stage['rows_out'] = analytics_db.info(path)['rows']
+    return path
+
+# Column that carries the highlight flags of a queued export (not part of the data)
+EXPORT_HIGHLIGHT_COLUMN = '_export_highlight'
+
+def queue_excel_export(filename, df, highlight=None):
+    """Store the frame behind a processed-file download; the Excel file is written on first download"""
+    if highlight is not None:
+        df = df.assign(**{EXPORT_HIGHLIGHT_COLUMN: highlight})
+    session_store.write_dataset(app.config['CACHE_FOLDER'], f"export_{filename}", df,
+                                fmt=app.config['SESSION_CACHE_FORMAT'])
+
+def queue_session_export(filename, session_id):
+    """Queue the session's stored dataset as the frame behind a download, without loading it"""
+    session_store.copy_dataset(app.config['CACHE_FOLDER'], session_id, f"export_{filename}")
+
+def excel_export_path(filename):
+    """Path of a processed Excel file, writing it from its queued frame if needed; None if unknown"""
+    filename = secure_filename(filename)
+    file_path = os.path.join(app.config['PROCESSED_FOLDER'], filename)
+    if os.path.exists(file_path):
+        lifecycle.touch(file_path)
+        return file_path
+
+    export_key = f"export_{filename}"
+    df = session_store.read_dataset(app.config['CACHE_FOLDER'], export_key)
+    if df is None:
+        # A concurrent request may have just written it and removed the queued frame
+        return file_path if os.path.exists(file_path) else None
+
+    highlight = None
+    if EXPORT_HIGHLIGHT_COLUMN in df.columns:
+        highlight = df[EXPORT_HIGHLIGHT_COLUMN].to_numpy(dtype=bool)
+        df = df.drop(columns=[EXPORT_HIGHLIGHT_COLUMN])
+
+    tmp_path = os.path.join(app.config['PROCESSED_FOLDER'], f"tmp_{uuid.uuid4().hex}_{filename}")
+    try:
+        with instrumentation.stage('write', rows_in=len(df)) as stage:
+            excel_io.write_excel(df, tmp_path, highlight=highlight)
+            stage['rows_out'] = len(df)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    session_store.delete_dataset(app.config['CACHE_FOLDER'], export_key)
+    cache_export_workbook(filename, file_path)
+    return file_path
+
+def export_result_path(filename):
+    """Path of the note naming the cached result a queued download belongs to"""
+    return os.path.join(app.config['CACHE_FOLDER'], f"export_{filename}.result")
+
+def note_export_result(filename, key):
+    """Remember the cached result a queued download belongs to, for cache_export_workbook"""
+    with open(export_result_path(filename), 'w') as f:
+        f.write(key)
+
+def cache_export_workbook(filename, file_path):
+    """Add a workbook just written from its queued frame to the cached result it belongs to"""
+    try:
+        with open(export_result_path(filename)) as f:
+            key = f.read().strip()
+        os.remove(export_result_path(filename))
+    except FileNotFoundError:
+        return
+    result_cache.save_workbook(app.config['RESULT_CACHE_FOLDER'], key, file_path, app.config['RESULT_CACHE_BYTES'])
+
+def cache_result(session_id, key, output_filename, details):
+    """Store the session dataset and the queued download of a finished job under a result cache key"""
+    if app.config['RESULT_CACHE_BYTES'] <= 0:
+        return
+    cache_folder = app.config['CACHE_FOLDER']
+    result_cache.save(app.config['RESULT_CACHE_FOLDER'], key,
+                      {'dataset': (cache_folder, session_id), 'export': (cache_folder, f"export_{output_filename}")},
+                      details, app.config['RESULT_CACHE_BYTES'])
+    # The workbook is only written on the first download, which adds it to the result
+    note_export_result(output_filename, key)
+
+def restore_cached_result(session_id, key, output_filename):
+    """Make a cached result the session dataset and the download; returns its details or None"""
+    folder = app.config['RESULT_CACHE_FOLDER']
+    if app.config['RESULT_CACHE_BYTES'] <= 0:
+        return None
+    details = result_cache.lookup(folder, key)
+    if details is None:
+        return None
+    with instrumentation.stage('result_cache_restore'):
+        if not result_cache.restore_dataset(folder, key, 'dataset', app.config['CACHE_FOLDER'], session_id):
+            return None
+        invalidate_session_caches(session_id)
+        workbook_path = os.path.join(app.config['PROCESSED_FOLDER'], secure_filename(output_filename))
+        if not result_cache.restore_workbook(folder, key, workbook_path):
+            # No download of this result yet: queue its frame like the pipeline does
+            if not result_cache.restore_dataset(folder, key, 'export', app.config['CACHE_FOLDER'],
+                                                f"export_{output_filename}"):
+                return None
+            note_export_result(output_filename, key)
+    return details
+
+def active_session_ids():
+    """IDs of the sessions whose data was used within ACTIVE_SESSION_SECONDS"""
+    since = time.time() - app.config['ACTIVE_SESSION_SECONDS']
+    active = set()
+    with os.scandir(app.config['CACHE_FOLDER']) as entries:
+        for entry in entries:
+            if entry.name.endswith('.used'):
+                try:
+                    if entry.stat().st_mtime >= since:
+                        active.add(lifecycle.group_key(entry.name))
+                except FileNotFoundError:
+                    pass
+    return active
+
+def storage_in_use():
+    """File groups the storage sweep must keep: active sessions' data and downloads, and app state"""
+    active = active_session_ids()
+    in_use = set(active)
+    in_use.add(lifecycle.group_key(os.path.basename(app.config['JOBS_DATABASE'])))
+    in_use.add(lifecycle.group_key(os.path.basename(app.config['STORAGE_METRICS'])))
+    in_use.add(lifecycle.group_key(os.path.basename(app.config['METRICS_DATABASE'])))
+    for owner, result in job_queue.results():
+        if owner in active:
+            filename = secure_filename(result.get('download_filename') or result.get('output_filename') or '')
+            if filename:
+                in_use.add(lifecycle.group_key(filename))
+                in_use.add(lifecycle.group_key(f"export_{filename}"))
+    return in_use
+
+def sweep_storage():
+    """Apply STORAGE_QUOTAS to the working folders and record the bytes reclaimed"""
+    in_use = storage_in_use()
+    results = {}
+    for config_key, quota in app.config['STORAGE_QUOTAS'].items():
+        results[config_key] = lifecycle.sweep(app.config[config_key], in_use=in_use, **quota)
+    lifecycle.record_sweep(app.config['STORAGE_METRICS'], results)
+    reclaimed = sum(result['bytes_removed'] for result in results.values())
+    if reclaimed:
+        print(f"Storage sweep reclaimed {reclaimed / 1024 / 1024:.1f} MB")
+    return results
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    """Add the request to the timing totals of its route (streamed bodies are not included)"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        instrumentation.record_route(route, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Stage and route timings, and storage use, in the Prometheus text format"""
+    storage = lifecycle.read_metrics(app.config['STORAGE_METRICS'])
+    reclaimed = [({'folder': config_key}, totals['bytes_removed'])
+                 for config_key, totals in storage.get('folders', {}).items()]
+    usage = [({'folder': config_key}, lifecycle.usage(app.config[config_key])['bytes'])
+             for config_key in app.config['STORAGE_QUOTAS']]
+    cached = result_cache.stats(app.config['RESULT_CACHE_FOLDER'])
+    memory = {name: cache.stats() for name, cache in MEMORY_CACHES.items()}
+
+    def memory_samples(counter):
+        return [({'cache': name}, stats[counter]) for name, stats in memory.items()]
+
+    text = instrumentation.prometheus_text(extra=[
+        ('storage_reclaimed_bytes_total', 'counter', 'Bytes removed by the storage sweeps', reclaimed),
+        ('storage_used_bytes', 'gauge', 'Bytes in each working folder', usage),
+        ('result_cache_bytes', 'gauge', 'Bytes in the result cache', [({}, cached['bytes'])]),
+        ('result_cache_entries', 'gauge', 'Results in the result cache', [({}, cached['entries'])]),
+        # The in-memory caches belong to the worker that answers the scrape
+        ('memory_cache_hits_total', 'counter', 'Lookups served by the in-memory caches', memory_samples('hits')),
+        ('memory_cache_misses_total', 'counter', 'Lookups the in-memory caches could not serve',
+         memory_samples('misses')),
+        ('memory_cache_evictions_total', 'counter', 'Entries evicted to stay within the memory budgets',
+         memory_samples('evictions')),
+        ('memory_cache_bytes', 'gauge', 'Bytes held by the in-memory caches', memory_samples('bytes')),
+        ('memory_cache_entries', 'gauge', 'Entries in the in-memory caches', memory_samples('entries')),
+    ])
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+def profile_authorized(token):
+    """Whether token is the configured PROFILE_TOKEN (always False without one)"""
+    expected = app.config['PROFILE_TOKEN']
+    return bool(expected) and bool(token) and hmac.compare_digest(token.encode(), expected.encode())
+
+def profile_spec(mode, label, parent=None):
+    return profiling.spec(mode, app.config['PROFILE_FOLDER'], label, keep=app.config['PROFILE_KEEP'],
+                          parent=parent)
+
+@app.before_request
+def start_profile():
+    """Profile this request if an admin asked for it"""
+    mode = request.headers.get('X-Profile') or request.args.get('_profile')
+    if not mode:
+        return
+    token = request.headers.get('X-Profile-Token') or request.args.get('_profile_token')
+    if mode not in profiling.MODES or not profile_authorized(token):
+        return
+    stack = ExitStack()
+    g.profile = stack.enter_context(profiling.profiled(profile_spec(mode, f"{request.method} {request.path}")))
+    g.profile_stack = stack
+
+@app.after_request
+def note_profile(response):
+    profile = g.get('profile')
+    if profile is not None:
+        profile['status'] = response.status_code
+        response.headers['X-Profile-Id'] = profile['id']
+    return response
+
+@app.teardown_request
+def save_profile(error=None):
+    # After the response, so a streamed body is part of the profile
+    stack = g.pop('profile_stack', None)
+    if stack is not None:
+        stack.close()
+
+def job_profile(kind):
+    """Profile spec for a job queued by this request: profiled like the request, if it is"""
+    profile = g.get('profile')
+    if profile is None:
+        return None
+    return profile_spec(profile['mode'], f"job {kind}", parent=profile['id'])
+
+@app.route('/profiles')
+def profiles():
+    """Recent profiles with their top functions"""
+    token = request.args.get('token')
+    if not profile_authorized(token):
+        abort(404)
+    recent = profiling.list_profiles(app.config['PROFILE_FOLDER'])
+    for profile in recent:
+        profile['created_at'] = datetime.fromtimestamp(profile['created']).strftime('%d-%m-%Y %H:%M:%S')
+    return render_template('profiles.html', profiles=recent, token=token)
+
+@app.route('/profiles/<profile_id>/download')
+def profile_download(profile_id):
+    """The raw profile (pstats dump or tracemalloc snapshot) for offline tools"""
+    if not profile_authorized(request.args.get('token')):
+        abort(404)
+    details = profiling.load(app.config['PROFILE_FOLDER'], profile_id)
+    if details is None:
+        abort(404)
+    file_path = os.path.join(app.config['PROFILE_FOLDER'], details['artifact'])
+    return send_file(file_path, as_attachment=True)
+
+_storage_sweeper = None
+_storage_sweeper_lock = threading.Lock()
+
+def storage_sweeper_loop():
+    while True:
+        time.sleep(app.config['STORAGE_SWEEP_SECONDS'])
+        try:
+            sweep_storage()
+        except Exception as e:
+            print(f"Storage sweep failed: {str(e)}")
+
+@app.before_request
+def start_storage_sweeper():
+    """Start this web worker's storage sweeper thread on its first request"""
+    global _storage_sweeper
+    if _storage_sweeper is not None or app.config['STORAGE_SWEEP_SECONDS'] <= 0:
+        return
+    with _storage_sweeper_lock:
+        if _storage_sweeper is None:
+            _storage_sweeper = threading.Thread(target=storage_sweeper_loop, name='storage-sweeper', daemon=True)
+            _storage_sweeper.start()
+
+@app.cli.command('cleanup')
+def cleanup_command():
+    """Apply the storage quotas to the upload, processed and cache folders now"""
+    for config_key, result in sweep_storage().items():
+        print(f"{app.config[config_key]}: removed {result['files_removed']} files "
+              f"({result['bytes_removed'] / 1024 / 1024:.1f} MB), {result['bytes_left'] / 1024 / 1024:.1f} MB left")
+
+@app.route('/storage/metrics')
+def storage_metrics():
+    """Bytes reclaimed by the storage sweeps, the current size of each working folder and the cache counters"""
+    metrics = lifecycle.read_metrics(app.config['STORAGE_METRICS'])
+    metrics['usage'] = {config_key: lifecycle.usage(app.config[config_key])
+                        for config_key in app.config['STORAGE_QUOTAS']}
+    metrics['result_cache'] = result_cache.stats(app.config['RESULT_CACHE_FOLDER'])
+    metrics['memory_caches'] = {name: cache.stats() for name, cache in MEMORY_CACHES.items()}
+    return jsonify(metrics)
+
+def allowed_file(filename, extensions=ALLOWED_EXTENSIONS):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in extensions
 
 def extract_gstin(gstin_name_string):
     """Extract GSTIN from the format '01AAACI6306G1Z7 / IND LABORATORIES LTD'"""
@@ -93,18 +684,22 @@ def extract_date(ewb_date_string):
         date_time_part = parts[1].strip()
         # Extract just the date part (before the time)
         date_part = date_time_part.split(' ')[0]
-        # Convert from MM/DD/YYYY to DD-MM-YYYY format
+        return format_date_part(date_part)
+    return None
+
+def format_date_part(date_part):
+    """Convert '02/09/2023' (DD/MM/YYYY, falling back to MM/DD/YYYY) to '02-09-2023'"""
+    # Convert from DD/MM/YYYY to DD-MM-YYYY format
+    try:
+        date_obj = datetime.strptime(date_part, '%d/%m/%Y')
+        return date_obj.strftime('%d-%m-%Y')
+    except ValueError:
         try:
-            date_obj = datetime.strptime(date_part, '%d/%m/%Y')
+            # Try MM/DD/YYYY format
+            date_obj = datetime.strptime(date_part, '%m/%d/%Y')
             return date_obj.strftime('%d-%m-%Y')
         except ValueError:
-            try:
-                # Try MM/DD/YYYY format
-                date_obj = datetime.strptime(date_part, '%m/%d/%Y')
-                return date_obj.strftime('%d-%m-%Y')
-            except ValueError:
-                return date_part.replace('/', '-')
-    return None
+            return date_part.replace('/', '-')
 
 def extract_pan_from_gstin_name(gstin_name_string):
     """Extract PAN from From GSTIN & Name for duplicate checking"""
@@ -127,19 +722,141 @@ def round_assess_value(assess_val):
     except (ValueError, TypeError):
         return assess_val
 
-def process_excel_file(input_path, output_path):
-    """Process the Excel file according to the specifications"""
+# Vectorized versions of the helpers above. They operate on whole columns and
+# must produce exactly the same values as the per-row helpers.
+
+def _string_values(series):
+    """Return the series as object dtype for the .str accessor, or None if it holds no strings at all"""
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        # Purely numeric/datetime columns contain no strings
+        return None
+    values = series.astype(object)
+    if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'mixed', 'mixed-integer'):
+        return None
+    return values
+
+def _all_none(series):
+    """Object series of None aligned with the given series"""
+    # pd.Series(None, dtype=object) would hold NaN, not None
+    return pd.Series([None] * len(series), index=series.index, dtype=object)
+
+def _none_for_missing(series):
+    """Replace NaN with None to match what Series.apply returns for the scalar helpers"""
+    return series.astype(object).where(series.notna(), None)
+
+def _on_uniques(series, func):
+    """Run a column function once per distinct value and broadcast the result back to every row"""
+    # GSTIN/name strings repeat heavily (thousands of parties across a million rows),
+    # so the string work is done on the distinct values only. Missing values map to None.
+    codes, uniques = pd.factorize(series)
+    results = func(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    results = np.append(results, None)  # code -1 (missing) picks the trailing None
+    return pd.Series(results[codes], index=series.index, dtype=object)
+
+def _split_gstin_name_uniques(values):
+    """Split distinct 'GSTIN / NAME' strings into a two-column (gstin, name) frame"""
+    strings = _string_values(values)
+    if strings is None:
+        return pd.DataFrame({'gstin': _all_none(values), 'name': _all_none(values)})
+    parts = strings.str.split('/', n=2, expand=True)
+    gstin = _none_for_missing(parts[0].str.strip())
+    name = _none_for_missing(parts[1].str.strip()) if parts.shape[1] > 1 else _all_none(values)
+    return pd.DataFrame({'gstin': gstin, 'name': name})
+
+def split_gstin_name_vectorized(series):
+    """Split '01AAACI6306G1Z7 / IND LABORATORIES LTD' once and return (GSTIN, NAME) series"""
+    codes, uniques = pd.factorize(series)
+    parts = _split_gstin_name_uniques(pd.Series(uniques, dtype=object))
+    gstin = np.append(parts['gstin'].to_numpy(dtype=object), None)
+    name = np.append(parts['name'].to_numpy(dtype=object), None)
+    return (pd.Series(gstin[codes], index=series.index, dtype=object),
+            pd.Series(name[codes], index=series.index, dtype=object))
+
+def _extract_pan_uniques(values):
+    strings = _string_values(values)
+    if strings is None:
+        return _all_none(values)
+    return _none_for_missing(strings.str[2:12].where(strings.str.len() >= 10))
+
+def extract_pan_vectorized(gstin_series):
+    """Vectorized extract_pan: characters 3-12 of every GSTIN with at least 10 characters"""
+    return _on_uniques(gstin_series, _extract_pan_uniques)
+
+def extract_pan_from_gstin_name_vectorized(series):
+    """Vectorized extract_pan_from_gstin_name"""
+    return _on_uniques(series, lambda values: _extract_pan_uniques(_split_gstin_name_uniques(values)['gstin']))
+
+def _format_date_part_uniques(values):
+    """Format distinct 'DD/MM/YYYY' (or 'MM/DD/YYYY') strings as 'DD-MM-YYYY'"""
+    parsed = pd.to_datetime(values, format='%d/%m/%Y', errors='coerce')
+    retry = parsed.isna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format='%m/%d/%Y', errors='coerce')
+    result = parsed.dt.strftime('%d-%m-%Y').astype(object)
+
+    # Anything pandas could not parse goes through the scalar formatter, which also
+    # covers dates outside the datetime64 range and the '/' -> '-' fallback
+    unparsed = parsed.isna()
+    if unparsed.any():
+        result[unparsed] = values[unparsed].map(format_date_part)
+    return result
+
+def extract_date_vectorized(series):
+    """Vectorized extract_date: parse 'DD/MM/YYYY' first, then 'MM/DD/YYYY', output 'DD-MM-YYYY'"""
+    strings = _string_values(series)
+    if strings is None:
+        return _all_none(series)
+    # 'Serial No. & Dt.' is unique per row, so split it first; the date part repeats
+    parts = strings.str.split(' - ', n=2, expand=True)
+    if parts.shape[1] < 2:
+        return _all_none(series)
+    date_part = parts[1].str.strip().str.partition(' ')[0]
+    return _on_uniques(date_part, _format_date_part_uniques)
+
+def round_assess_value_vectorized(series):
+    """Vectorized round_assess_value: round to the nearest 10000 like Excel ROUND(value, -4)"""
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        # Mixed text/number columns keep the scalar semantics (float() conversion of strings)
+        return series.map(round_assess_value)
+
+    values = series.to_numpy(dtype='float64')
+    scaled = values / 10000
+    rounded = np.rint(scaled) * 10000
+
+    # np.rint works on the scaled value, Python's round() on the exact decimal value.
+    # They can only disagree right at a .5 tie, so redo those few with round()
+    fraction = np.abs(scaled - np.floor(scaled) - 0.5)
+    near_tie = np.flatnonzero(fraction < 1e-6)
+    for pos in near_tie:
+        rounded[pos] = round(values[pos], -4)
+
+    return pd.Series(rounded, index=series.index)
+
+def float_value(value):
+    """float() of a cell, NaN where it is missing or float() rejects it"""
+    if pd.isna(value):
+        return np.nan
     try:
-        # Read the Excel file with engine openpyxl for better performance
-        df = pd.read_excel(input_path, engine='openpyxl')
-        
-        # Create a copy for processing
-        processed_df = df.copy()
-        
-        # Clear original df to free memory
-        del df
-        gc.collect()
-        
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+def float_values_vectorized(series):
+    """Vectorized float_value, as a float64 array"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype='float64', na_value=np.nan)
+    # Text keeps the float() semantics (surrounding spaces, '1_000' and '1e3' are numbers, '1,000' is not)
+    return _on_uniques(series, lambda values: values.map(float_value)).to_numpy(dtype='float64')
+
+def transform_rows(processed_df):
+    """Steps 1-6 of process_excel_file, which work on each row by itself
+
+    Renames the EWB columns, extracts GSTIN, PAN, NAME, Date and VALUE and drops
+    rows whose buyer PAN is the seller's own PAN. Returns (frame, number of rows
+    dropped, None if the file lacks the columns to compare). Because no step
+    looks at other rows, a file can be processed in chunks with the same result.
+    """
+    with instrumentation.stage('extract', rows_in=len(processed_df)) as stage:
         # 1. Change 'EWB No.' to 'Serial No'
         if 'EWB No.' in processed_df.columns:
             processed_df.rename(columns={'EWB No.': 'Serial No'}, inplace=True)
@@ -150,9 +867,8 @@ def process_excel_file(input_path, output_path):
         
         # 3. Extract GSTIN, PAN, and NAME from 'To GSTIN & Name'
         if 'To GSTIN & Name' in processed_df.columns:
-            processed_df['GSTIN'] = processed_df['To GSTIN & Name'].apply(extract_gstin)
-            processed_df['PAN'] = processed_df['GSTIN'].apply(extract_pan)
-            processed_df['NAME'] = processed_df['To GSTIN & Name'].apply(extract_name)
+            processed_df['GSTIN'], processed_df['NAME'] = split_gstin_name_vectorized(processed_df['To GSTIN & Name'])
+            processed_df['PAN'] = extract_pan_vectorized(processed_df['GSTIN'])
         
         # Handle case where 'Name' column already exists (case sensitive)
         if 'Name' in processed_df.columns and 'NAME' not in processed_df.columns:
@@ -161,23 +877,21 @@ def process_excel_file(input_path, output_path):
             # NAME column already exists, keep it as is
             pass
         
-        # Ensure NAME column is created properly
-        if 'NAME' not in processed_df.columns or processed_df['NAME'].isnull().all():
-            print("Warning: NAME column is missing or empty. Check 'To GSTIN & Name' or 'Name' data.")
-            processed_df['NAME'] = 'Unknown'  # Fallback value for missing names
-        
         # 4. Extract Date from 'Serial No. & Dt.'
         if 'Serial No. & Dt.' in processed_df.columns:
-            processed_df['Date'] = processed_df['Serial No. & Dt.'].apply(extract_date)
+            processed_df['Date'] = extract_date_vectorized(processed_df['Serial No. & Dt.'])
         
         # 5. Create VALUE column by rounding 'Assess Val.'
         if 'Assess Val.' in processed_df.columns:
-            processed_df['VALUE'] = processed_df['Assess Val.'].apply(round_assess_value)
-        
-        # 6. Remove duplicate rows based on PAN appearing in 'From GSTIN & Name'
-        if 'From GSTIN & Name' in processed_df.columns and 'PAN' in processed_df.columns:
+            processed_df['VALUE'] = round_assess_value_vectorized(processed_df['Assess Val.'])
+        stage['rows_out'] = len(processed_df)
+    
+    # 6. Remove duplicate rows based on PAN appearing in 'From GSTIN & Name'
+    duplicates_removed = None
+    if 'From GSTIN & Name' in processed_df.columns and 'PAN' in processed_df.columns:
+        with instrumentation.stage('self_pan_filter', rows_in=len(processed_df)) as stage:
             # Extract PAN from 'From GSTIN & Name' for comparison
-            processed_df['From_PAN'] = processed_df['From GSTIN & Name'].apply(extract_pan_from_gstin_name)
+            processed_df['From_PAN'] = extract_pan_from_gstin_name_vectorized(processed_df['From GSTIN & Name'])
             
             # Remove rows where PAN (from To GSTIN) equals From_PAN (from From GSTIN)
             before_count = len(processed_df)
@@ -186,27 +900,23 @@ def process_excel_file(input_path, output_path):
             duplicates_removed = before_count - after_count
             
             # Drop the temporary From_PAN column
-            processed_df.drop(columns=['From_PAN'], inplace=True)
-            
-            print(f"Removed {duplicates_removed} duplicate rows based on PAN matching")
-        
-        # 6.5. Remove duplicate rows from the entire dataset
-        before_dedup = len(processed_df)
-        processed_df = processed_df.drop_duplicates()
-        after_dedup = len(processed_df)
-        total_duplicates_removed = before_dedup - after_dedup
-        print(f"Removed {total_duplicates_removed} duplicate rows from processed data")
-        
+            processed_df = processed_df.drop(columns=['From_PAN'])
+            stage['rows_out'] = len(processed_df)
+    
+    return processed_df, duplicates_removed
+
+def finalize_columns(processed_df):
+    """Steps 7-8 of process_excel_file: drop the source columns and put the rest in report order"""
+    with instrumentation.stage('reorder', rows_in=len(processed_df)) as stage:
+        stage['rows_out'] = len(processed_df)
         # 7. Delete specified columns after creating new ones
         columns_to_delete = ['To GSTIN & Name', 'Assess Val.', 'Tax Val.', 'Latest Vehicle No.']
         # Don't delete 'Name' column if it exists and we're using it for NAME
         if 'Name' in processed_df.columns and processed_df['NAME'].equals(processed_df['Name']):
             # Keep the original 'Name' column, but we can optionally rename it to avoid confusion
             pass
-        for col in columns_to_delete:
-            if col in processed_df.columns:
-                processed_df.drop(columns=[col], inplace=True)
-        
+        processed_df = processed_df.drop(columns=[col for col in columns_to_delete if col in processed_df.columns])
+    
         # 8. Reorder columns according to specification
         desired_order = [
             'Serial No',        # Was EWB No., now renamed to Serial No
@@ -223,22 +933,165 @@ def process_excel_file(input_path, output_path):
             'HSN Code',
             'HSN Desc.'
         ]
-        
+    
         # Only include columns that exist in the dataframe
         existing_columns = [col for col in desired_order if col in processed_df.columns]
-        
+    
         # Add any remaining columns that weren't in the desired order
         remaining_columns = [col for col in processed_df.columns if col not in existing_columns]
         final_column_order = existing_columns + remaining_columns
-        
+    
         # Reorder the dataframe
-        processed_df = processed_df[final_column_order]
+        return processed_df[final_column_order]
+
+def process_excel_file(input_path, progress=None):
+    """Process the Excel file according to the specifications
+
+    Returns (success, message, processed DataFrame). Writing the Excel download
+    is left to the caller so the frame does not have to be read back from xlsx.
+    progress is an optional callback taking (fraction done, message).
+    """
+    report = progress or (lambda fraction, message: None)
+    try:
+        # Read the Excel file with the fastest available engine. Every column is needed:
+        # unknown columns are kept in the output and all columns count for duplicates.
+        # The frame is our own, so it is processed without a copy
+        report(0.05, 'Reading Excel file')
+        with instrumentation.stage('read') as stage:
+            processed_df = excel_io.read_excel(input_path, engine=app.config['EXCEL_READER'])
+            stage['rows_out'] = len(processed_df)
+        
+        # Steps 1-6: renames, extracted columns and removal of self-PAN rows
+        report(0.6, 'Extracting GSTIN, PAN, names and dates')
+        # The self-PAN rows removed are recorded by the self_pan_filter stage
+        processed_df, _ = transform_rows(processed_df)
         
-        # Save the processed file
-        processed_df.to_excel(output_path, index=False)
+        # Ensure NAME column is created properly
+        if 'NAME' not in processed_df.columns or processed_df['NAME'].isnull().all():
+            print("Warning: NAME column is missing or empty. Check 'To GSTIN & Name' or 'Name' data.")
+            processed_df['NAME'] = 'Unknown'  # Fallback value for missing names
         
-        return True, "File processed successfully!"
+        # 6.5. Remove duplicate rows from the entire dataset
+        report(0.75, 'Removing duplicate rows')
+        with instrumentation.stage('dedup', rows_in=len(processed_df)) as stage:
+            processed_df = processed_df.drop_duplicates()
+            stage['rows_out'] = len(processed_df)
+        
+        # Steps 7-8: drop source columns and reorder
+        processed_df = finalize_columns(processed_df)
         
+        return True, "File processed successfully!", excel_io.excel_dtypes(processed_df)
+        
+    except Exception as e:
+        return False, f"Error processing file: {str(e)}", None
+
+def row_digests(df):
+    """64-bit hash of every row of df (the index is not part of it)"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def drop_seen_rows(df, seen):
+    """drop_duplicates() across chunks: return (rows of df not seen before, updated seen)
+
+    seen is a sorted uint64 array of row digests, 8 bytes per distinct row however
+    wide the rows are. Rows are compared by their 64-bit hash, so two different
+    rows are only taken for duplicates on a hash collision, which is vanishingly rare.
+    """
+    with instrumentation.stage('dedup', rows_in=len(df)) as stage:
+        digests = row_digests(df)
+        keep = np.zeros(len(df), dtype=bool)
+        keep[np.unique(digests, return_index=True)[1]] = True  # First occurrence within the chunk
+        if len(seen):
+            pos = np.minimum(np.searchsorted(seen, digests), len(seen) - 1)
+            keep &= seen[pos] != digests
+        stage['rows_out'] = int(keep.sum())
+    return df[keep], np.union1d(seen, digests[keep])
+
+def spill_excel_chunks(input_path, spill_folder, engine=None, progress=None):
+    """First pass of the chunked pipeline: run steps 1-6 on each chunk of the sheet and spill it
+
+    Chunks are pickled into spill_folder. Returns a dict with the chunk files
+    ('parts'), the rows read, the self-PAN rows removed ('removed', None if the
+    file lacks the columns to compare), whether any NAME was found and the
+    excel_io.ChunkDtypes of all chunks. progress gets (fraction of the pass, message).
+    """
+    report = progress or (lambda fraction, message: None)
+    chunk_rows = app.config['PROCESS_CHUNK_ROWS']
+    total_rows = excel_io.sheet_rows(input_path)
+    spilled = {'parts': [], 'rows': 0, 'removed': None, 'names_found': False,
+               'column_types': excel_io.ChunkDtypes()}
+    for chunk in instrumentation.stage_iter('read', excel_io.iter_excel(input_path, chunk_rows, engine=engine)):
+        spilled['rows'] += len(chunk)
+        chunk, removed = transform_rows(chunk)
+        if removed is not None:
+            spilled['removed'] = (spilled['removed'] or 0) + removed
+        if 'NAME' in chunk.columns and chunk['NAME'].notna().any():
+            spilled['names_found'] = True
+        chunk = excel_io.excel_dtypes(chunk, numeric_text=False)
+        spilled['column_types'].observe(chunk)
+        part_path = os.path.join(spill_folder, f"part_{len(spilled['parts'])}.pkl")
+        chunk.to_pickle(part_path)
+        spilled['parts'].append(part_path)
+        # Without a row count from the sheet the bar creeps towards the end of the pass
+        rows_read = spilled['rows']
+        done = min(rows_read / total_rows, 1.0) if total_rows else rows_read / (rows_read + 4 * chunk_rows)
+        report(done, f"Processed {rows_read:,} rows")
+    return spilled
+
+def store_spilled_chunks(session_id, spilled, progress=None):
+    """Second pass of the chunked pipeline: write the spilled chunks as the session dataset
+
+    Gives the chunks the column types of all of them, drops duplicate rows by
+    row digest and finishes the columns, one chunk at a time. Returns the number
+    of rows kept. progress gets (fraction of the pass, message).
+    """
+    report = progress or (lambda fraction, message: None)
+    parts = spilled['parts']
+    counts = {}
+
+    def processed_chunks():
+        seen = np.empty(0, dtype=np.uint64)
+        kept = 0
+        for i, part_path in enumerate(parts):
+            report(i / len(parts), 'Removing duplicate rows and saving')
+            chunk = spilled['column_types'].apply(pd.read_pickle(part_path))
+            if not spilled['names_found']:
+                chunk['NAME'] = 'Unknown'  # Fallback value for missing names
+            chunk, seen = drop_seen_rows(chunk, seen)
+            kept += len(chunk)
+            yield finalize_columns(chunk)
+        counts['kept'] = kept
+
+    session_store.write_dataset_chunks(app.config['CACHE_FOLDER'], session_id, processed_chunks,
+                                       fmt=app.config['SESSION_CACHE_FORMAT'])
+    invalidate_session_caches(session_id)
+    return counts['kept']
+
+def spilled_duplicates(spilled, kept):
+    """Duplicate rows dropped from a spilled upload of which kept rows were kept"""
+    return spilled['rows'] - (spilled['removed'] or 0) - kept
+
+def process_excel_file_chunked(input_path, session_id, progress=None):
+    """process_excel_file for very large exports, in chunks of PROCESS_CHUNK_ROWS rows
+
+    The first pass reads the sheet chunk by chunk, runs the row-wise steps and
+    spills each chunk to disk. The second pass gives the chunks the column types
+    of the whole sheet, drops duplicates by row digest, finishes the columns and
+    streams the result into the session dataset. Only a chunk and the digests
+    are in memory at a time. Returns (success, message).
+    """
+    report = progress or (lambda fraction, message: None)
+    try:
+        report(0.05, 'Reading Excel file')
+        engine = app.config['CHUNKED_EXCEL_READER'] or app.config['EXCEL_READER']
+        with tempfile.TemporaryDirectory(dir=app.config['CACHE_FOLDER']) as spill_folder:
+            spilled = spill_excel_chunks(input_path, spill_folder, engine=engine,
+                                         progress=lambda done, message: report(0.05 + 0.65 * done, message))
+            if not spilled['names_found']:
+                print("Warning: NAME column is missing or empty. Check 'To GSTIN & Name' or 'Name' data.")
+            store_spilled_chunks(session_id, spilled,
+                                 progress=lambda done, message: report(0.7 + 0.2 * done, message))
+        return True, "File processed successfully!"
+
     except Exception as e:
         return False, f"Error processing file: {str(e)}"
 
@@ -271,97 +1124,142 @@ def generate_summary(processed_df):
     """Generate summary grouped by PAN and NAME with product details"""
     try:
         # Group by PAN and NAME, then aggregate unique HSN Desc. and sum VALUE
-        summary = processed_df.groupby(['PAN', 'NAME', 'HSN Desc.']).agg(
+        summary = processed_df.groupby(['PAN', 'NAME', 'HSN Desc.'], observed=True).agg(
             product_value=('VALUE', 'sum')
         ).reset_index()
-
-        # Add Grand Total row for each PAN
-        grand_totals = summary.groupby(['PAN', 'NAME']).agg(
-            total_value=('product_value', 'sum')
-        ).reset_index()
-
-        # Merge product details with grand totals
-        summary = pd.merge(summary, grand_totals, on=['PAN', 'NAME'], how='left')
-
-        return summary
+        return add_summary_totals(summary)
     except Exception as e:
         print(f"Error generating summary: {str(e)}")
         return None
 
+def add_summary_totals(summary):
+    """Add the total_value of each (PAN, NAME) to the product rows of a summary"""
+    # Add Grand Total row for each PAN
+    grand_totals = summary.groupby(['PAN', 'NAME'], observed=True).agg(
+        total_value=('product_value', 'sum')
+    ).reset_index()
+
+    # Merge product details with grand totals
+    return pd.merge(summary, grand_totals, on=['PAN', 'NAME'], how='left')
+
+def concat_frames(frames):
+    """pd.concat of frames with the same columns that keeps categorical columns categorical"""
+    for col in frames[0].columns:
+        dtypes = [frame[col].dtype for frame in frames]
+        if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes) and len(set(dtypes)) > 1:
+            # Different categories would make the column object: give every frame all of them
+            categories = pd.Index(pd.unique(np.concatenate([dtype.categories.to_numpy() for dtype in dtypes])))
+            try:
+                categories = categories.sort_values()
+            except TypeError:
+                pass
+            frames = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+def merge_summaries(summary, new_summary):
+    """generate_summary of the rows of two summaries together"""
+    products = concat_frames([summary.drop(columns=['total_value']), new_summary.drop(columns=['total_value'])])
+    products = products.groupby(['PAN', 'NAME', 'HSN Desc.'], observed=True).agg(
+        product_value=('product_value', 'sum')
+    ).reset_index()
+    return add_summary_totals(products)
+
+def summary_block_starts(summary_df):
+    """Row offsets of each (PAN, NAME) block of a generate_summary() frame, plus a final end offset"""
+    # generate_summary output is sorted by PAN and NAME, so each pair is contiguous
+    pans = summary_df['PAN'].to_numpy()
+    names = summary_df['NAME'].to_numpy()
+    new_block = np.ones(len(summary_df), dtype=bool)
+    new_block[1:] = (pans[1:] != pans[:-1]) | (names[1:] != names[:-1])
+    return np.append(np.flatnonzero(new_block), len(summary_df))
+
+def summary_page(summary_data, page, per_page):
+    """Return the (PAN, NAME) groups of one summary page as plain dicts, and the page count"""
+    summary_df = summary_data['summary']
+    starts = summary_data['starts']
+    total_groups = len(starts) - 1
+    total_pages = (total_groups + per_page - 1) // per_page
+
+    first = min(max(page - 1, 0) * per_page, total_groups)
+    last = min(first + per_page, total_groups)
+    rows = summary_df.iloc[starts[first]:starts[last]]
+
+    groups = []
+    for block_start, block_stop in zip(starts[first:last], starts[first + 1:last + 1]):
+        block = rows.iloc[block_start - starts[first]:block_stop - starts[first]]
+        groups.append({
+            'pan': block['PAN'].iloc[0],
+            'name': block['NAME'].iloc[0],
+            'products': list(zip(block['HSN Desc.'].tolist(), block['product_value'].tolist())),
+            'total': block['total_value'].iloc[0],
+        })
+    return groups, total_pages
+
+def seller_rows(processed_df):
+    """The rows of processed_df with the SELLER_NAME, SELLER_PAN and QUANTITY_MT of each
+
+    Works row by row, so a dataset can be handled in chunks with the same result.
+    """
+    # Work on a shallow copy: the session frame may be shared through the cache
+    processed_df = processed_df.copy(deep=False)
+
+    # First, extract seller names and PANs from 'From GSTIN & Name'
+    seller_gstin, seller_name = split_gstin_name_vectorized(processed_df['From GSTIN & Name'])
+    # Few sellers over many rows: categoricals make the groupbys below cheaper
+    processed_df['SELLER_NAME'] = seller_name.astype('category')
+    processed_df['SELLER_PAN'] = extract_pan_vectorized(seller_gstin).astype('category')
+    
+    # Calculate quantity if 2024-25 price column exists
+    # Quantity (MT) = Assess Val. / (2024-25 * 1000)
+    
+    # Check if QTY.MT already exists (from Data Cleaner)
+    if 'QTY.MT' in processed_df.columns:
+        processed_df['QUANTITY_MT'] = processed_df['QTY.MT']
+    else:
+        # Calculate it dynamically if not pre-calculated, from the column that contains
+        # '2024-25'. Without one Qty.MT is 0.00; the seller comparison page warns about it
+        price_col = None
+        for col in processed_df.columns:
+            if '2024-25' in str(col):
+                price_col = col
+                break
+        
+        if price_col and 'Assess Val.' in processed_df.columns:
+            assess_val = float_values_vectorized(processed_df['Assess Val.'])
+            price = float_values_vectorized(processed_df[price_col])
+
+            # Qty.MT = Assess Val. / (Price * 1000), 0 where either value is missing or the price is 0
+            valid = ~np.isnan(assess_val) & ~np.isnan(price) & (price != 0)
+            quantity = np.zeros(len(processed_df))
+            np.divide(assess_val, price * 1000, out=quantity, where=valid)
+            processed_df['QUANTITY_MT'] = quantity
+        else:
+            processed_df['QUANTITY_MT'] = 0.0
+    return processed_df
+
 def generate_seller_analysis(processed_df):
     """Generate competitive analysis summary by seller companies"""
     try:
-        # First, extract seller names and PANs from 'From GSTIN & Name'
-        processed_df['SELLER_NAME'] = processed_df['From GSTIN & Name'].apply(extract_seller_name)
-        processed_df['SELLER_PAN'] = processed_df['From GSTIN & Name'].apply(extract_seller_pan)
-        
-        # Calculate quantity if 2024-25 price column exists
-        # Quantity (MT) = Assess Val. / (2024-25 * 1000)
-        
-        # Print available columns for debugging
-        print(f"\n=== SELLER ANALYSIS DEBUG ===")
-        print(f"Available columns: {list(processed_df.columns)}")
-        
-        # Check if QTY.MT already exists (from Data Cleaner)
-        if 'QTY.MT' in processed_df.columns:
-            print("Using pre-calculated QTY.MT column from Data Cleaner")
-            processed_df['QUANTITY_MT'] = processed_df['QTY.MT']
-            print(f"Sample quantities: {processed_df['QUANTITY_MT'].head().tolist()}")
-            print(f"=== END DEBUG ===\n")
-        else:
-            # Calculate it dynamically if not pre-calculated
-            print("QTY.MT not found, calculating dynamically...")
-            
-            # Find column that contains '2024-25'
-            price_col = None
-            for col in processed_df.columns:
-                if '2024-25' in str(col):
-                    price_col = col
-                    print(f"Found price column: '{price_col}'")
-                    break
-            
-            if not price_col:
-                print("WARNING: '2024-25' column not found! Please use Data Cleaner first to add pricing data.")
-                print("Qty.MT will be set to 0.00 for all products.")
-            
-            if price_col and 'Assess Val.' in processed_df.columns:
-                def calculate_quantity(row):
-                    try:
-                        price_val = row[price_col]
-                        assess_val = row['Assess Val.']
-                        
-                        if pd.notna(price_val) and pd.notna(assess_val) and float(price_val) != 0:
-                            qty = float(assess_val) / (float(price_val) * 1000)
-                            return qty
-                        return 0.0
-                    except Exception as e:
-                        return 0.0
-                
-                processed_df['QUANTITY_MT'] = processed_df.apply(calculate_quantity, axis=1)
-                print(f"Sample quantities calculated: {processed_df['QUANTITY_MT'].head().tolist()}")
-                print(f"=== END DEBUG ===\n")
-            else:
-                processed_df['QUANTITY_MT'] = 0.0
-                print(f"=== END DEBUG ===\n")
+        processed_df = seller_rows(processed_df)
         
         # Group by Seller PAN and Name, Buyer (NAME), and Product (HSN Desc.)
         agg_dict = {'product_value': ('VALUE', 'sum')}
         if 'QUANTITY_MT' in processed_df.columns:
             agg_dict['product_quantity'] = ('QUANTITY_MT', 'sum')
         
-        seller_analysis = processed_df.groupby(['SELLER_PAN', 'SELLER_NAME', 'NAME', 'HSN Desc.']).agg(
+        seller_analysis = processed_df.groupby(['SELLER_PAN', 'SELLER_NAME', 'NAME', 'HSN Desc.'], observed=True).agg(
             product_value=('VALUE', 'sum'),
             product_quantity=('QUANTITY_MT', 'sum')
         ).reset_index()
         
         # Calculate total sales per seller-buyer combination
-        buyer_totals = processed_df.groupby(['SELLER_PAN', 'SELLER_NAME', 'NAME']).agg(
+        buyer_totals = processed_df.groupby(['SELLER_PAN', 'SELLER_NAME', 'NAME'], observed=True).agg(
             buyer_total=('VALUE', 'sum'),
             buyer_quantity=('QUANTITY_MT', 'sum')
         ).reset_index()
         
         # Calculate total sales per seller
-        seller_totals = processed_df.groupby(['SELLER_PAN', 'SELLER_NAME']).agg(
+        seller_totals = processed_df.groupby(['SELLER_PAN', 'SELLER_NAME'], observed=True).agg(
             seller_total=('VALUE', 'sum'),
             seller_quantity=('QUANTITY_MT', 'sum')
         ).reset_index()
@@ -376,6 +1274,518 @@ def generate_seller_analysis(processed_df):
         print(f"Error generating seller analysis: {str(e)}")
         return None
 
+# Group columns of each generate_seller_analysis() aggregate
+SELLER_AGGREGATE_KEYS = {
+    'seller_analysis': ['SELLER_PAN', 'SELLER_NAME', 'NAME', 'HSN Desc.'],
+    'buyer_totals': ['SELLER_PAN', 'SELLER_NAME', 'NAME'],
+    'seller_totals': ['SELLER_PAN', 'SELLER_NAME'],
+}
+
+def merge_seller_analysis(analysis, new_analysis):
+    """generate_seller_analysis of the rows of two analyses together (without a seller index)"""
+    merged = {'processed_data': concat_frames([analysis['processed_data'], new_analysis['processed_data']])}
+    for name, keys in SELLER_AGGREGATE_KEYS.items():
+        combined = concat_frames([analysis[name], new_analysis[name]])
+        merged[name] = combined.groupby(keys, observed=True).sum().reset_index()
+    return merged
+
+def build_seller_index(processed_df):
+    """Build lookup structures for seller-pair comparisons from the seller analysis frame
+
+    - sellers: sorted seller names, one per PAN (for the selection lists)
+    - pan_by_name: seller name -> PAN
+    - products: (NAME, HSN Desc.) VALUE/product_quantity rows of all sellers,
+      sorted by SELLER_PAN, NAME and HSN Desc.
+    - buyer_names / buyer_starts: one entry per (seller, buyer) block of products;
+      block i covers products rows buyer_starts[i]:buyer_starts[i + 1]
+    - offsets: PAN -> (start, stop) range of that seller's blocks in buyer_names
+    - totals: PAN -> (total value, total quantity) over all of the seller's rows
+    """
+    sellers_df = processed_df[['SELLER_PAN', 'SELLER_NAME']].dropna()
+
+    # Name -> PAN uses the first PAN a name appears with, in row order
+    first_pan = sellers_df.drop_duplicates('SELLER_NAME')
+    pan_by_name = dict(zip(first_pan['SELLER_NAME'], first_pan['SELLER_PAN']))
+
+    # One name per PAN (the first one seen) for the seller selection lists
+    sellers = sellers_df.groupby('SELLER_PAN', observed=True)['SELLER_NAME'].first().tolist()
+    sellers = sorted(seller for seller in sellers if seller and seller != 'None')
+
+    products = processed_df.groupby(['SELLER_PAN', 'NAME', 'HSN Desc.'], observed=True).agg(
+        VALUE=('VALUE', 'sum'),
+        product_quantity=('QUANTITY_MT', 'sum')
+    ).reset_index()
+    # Plain values from here on: the comparison view maps and sorts buyer names
+    products = products.astype({'SELLER_PAN': object, 'NAME': object, 'HSN Desc.': object})
+
+    # groupby sorts by SELLER_PAN and NAME, so every seller and every seller/buyer
+    # pair is one contiguous block of rows
+    pans = products['SELLER_PAN'].to_numpy()
+    names = products['NAME'].to_numpy()
+    new_block = np.ones(len(products), dtype=bool)
+    new_block[1:] = (pans[1:] != pans[:-1]) | (names[1:] != names[:-1])
+    block_starts = np.flatnonzero(new_block)
+    block_pans = pans[block_starts]
+
+    new_seller = np.ones(len(block_starts), dtype=bool)
+    new_seller[1:] = block_pans[1:] != block_pans[:-1]
+    seller_starts = np.flatnonzero(new_seller)
+    seller_stops = np.append(seller_starts[1:], len(block_starts))
+    offsets = {block_pans[start]: (int(start), int(stop)) for start, stop in zip(seller_starts, seller_stops)}
+
+    totals_df = processed_df.groupby('SELLER_PAN', observed=True).agg(
+        total=('VALUE', 'sum'),
+        quantity=('QUANTITY_MT', 'sum')
+    )
+    totals = dict(zip(totals_df.index, zip(totals_df['total'], totals_df['quantity'])))
+
+    return {
+        'sellers': sellers,
+        'pan_by_name': pan_by_name,
+        'products': products.drop(columns=['SELLER_PAN']),
+        'buyer_names': names[block_starts],
+        'buyer_starts': np.append(block_starts, len(products)),
+        'offsets': offsets,
+        'totals': totals,
+    }
+
+def seller_buyer_blocks(seller_index, seller_pan):
+    """Return {buyer name: (start, stop) rows in products} for one seller"""
+    start, stop = seller_index['offsets'].get(seller_pan, (0, 0))
+    buyer_starts = seller_index['buyer_starts']
+    return {
+        name: (buyer_starts[i], buyer_starts[i + 1])
+        for i, name in zip(range(start, stop), seller_index['buyer_names'][start:stop])
+    }
+
+def build_comparison_view(seller_index, seller1_pan, seller2_pan, page, per_page):
+    """Merge two sellers' (NAME, HSN Desc.) tables into the buyer rows of one comparison page
+
+    Buyers are ordered common buyers first, then buyers of seller 1 only, then
+    buyers of seller 2 only, each alphabetically. Within a buyer, seller 1's
+    products come first, then products only seller 2 sells. Returns
+    (buyers, total_pages) where buyers is a list of dicts with name, products
+    (name, value1, qty1, value2, qty2) and per-seller totals; None marks a
+    seller that has no sales for that product or buyer.
+    """
+    seller1_blocks = seller_buyer_blocks(seller_index, seller1_pan)
+    seller2_blocks = seller_buyer_blocks(seller_index, seller2_pan)
+    seller1_buyers = set(seller1_blocks)
+    seller2_buyers = set(seller2_blocks)
+    ordered_buyers = (sorted(seller1_buyers & seller2_buyers)
+                      + sorted(seller1_buyers - seller2_buyers)
+                      + sorted(seller2_buyers - seller1_buyers))
+
+    total_pages = (len(ordered_buyers) + per_page - 1) // per_page
+    start_idx = (page - 1) * per_page
+    page_buyers = ordered_buyers[start_idx:start_idx + per_page]
+    buyer_rank = {buyer: rank for rank, buyer in enumerate(page_buyers)}
+
+    # Only the product rows of the buyers on this page are merged
+    products = seller_index['products']
+
+    def page_rows(blocks):
+        positions = [np.arange(*blocks[buyer]) for buyer in page_buyers if buyer in blocks]
+        return products.iloc[np.concatenate(positions) if positions else []]
+
+    merged = page_rows(seller1_blocks).merge(page_rows(seller2_blocks), on=['NAME', 'HSN Desc.'],
+                                             how='outer', suffixes=('1', '2'), indicator=True)
+    merged['_rank'] = merged['NAME'].map(buyer_rank)
+    merged['_seller2_only'] = merged['_merge'] == 'right_only'
+    merged = merged.sort_values(['_rank', '_seller2_only', 'HSN Desc.'], kind='stable')
+
+    value_columns = ['VALUE1', 'product_quantity1', 'VALUE2', 'product_quantity2']
+    # min_count=1 keeps NaN for a seller without any sales to that buyer
+    totals = merged.groupby('NAME')[value_columns].sum(min_count=1)
+    merged = merged.astype({col: object for col in value_columns})
+    merged[value_columns] = merged[value_columns].where(merged[value_columns].notna(), None)
+    totals = totals.astype(object).where(totals.notna(), None)
+
+    rows_by_buyer = dict(tuple(merged.groupby('NAME', sort=False)))
+    buyers = []
+    for buyer in page_buyers:
+        rows = rows_by_buyer[buyer]
+        buyer_totals = totals.loc[buyer]
+        buyers.append({
+            'name': buyer,
+            'products': [
+                {'name': name, 'value1': value1, 'qty1': qty1, 'value2': value2, 'qty2': qty2}
+                for name, value1, qty1, value2, qty2 in zip(
+                    rows['HSN Desc.'], rows['VALUE1'], rows['product_quantity1'],
+                    rows['VALUE2'], rows['product_quantity2'])
+            ],
+            'total1': buyer_totals['VALUE1'],
+            'qty_total1': buyer_totals['product_quantity1'],
+            'total2': buyer_totals['VALUE2'],
+            'qty_total2': buyer_totals['product_quantity2'],
+        })
+    return buyers, total_pages
+
+# ========== BACKGROUND JOBS ==========
+# Job functions run in a worker process: no request or session, only the arguments
+
+def upload_job(job, session_id, input_path, output_filename, original_filename):
+    """Process an uploaded file into the session dataset
+
+    A file that was processed before (same content) is restored from the result cache.
+    """
+    job.progress(0.01, 'Checking for an earlier upload of this file')
+    cache_key = result_cache.result_key('upload', RESULT_PIPELINE_VERSION, result_cache.file_digest(input_path))
+    cached = restore_cached_result(session_id, cache_key, output_filename)
+    if cached is not None:
+        return {
+            'message': cached['message'],
+            'download_filename': output_filename,
+            'original_filename': original_filename,
+        }
+
+    chunked_bytes = app.config['CHUNKED_UPLOAD_BYTES']
+    if chunked_bytes and os.path.getsize(input_path) > chunked_bytes:
+        # Large export: the chunked pipeline writes the session dataset itself
+        success, message = process_excel_file_chunked(input_path, session_id, progress=job.progress)
+        if not success:
+            raise jobs.JobFailed(message)
+    else:
+        success, message, processed_data = process_excel_file(input_path, progress=job.progress)
+        if not success:
+            raise jobs.JobFailed(message)
+
+        # Load processed data into session; the Excel file is written on first download
+        job.progress(0.9, 'Saving processed data')
+        write_session_dataset(session_id, processed_data)
+        del processed_data
+
+    # The download is written from the data as processed, the session keeps a compact copy
+    queue_session_export(output_filename, session_id)
+    job.progress(0.95, 'Compacting data for analysis')
+    compact_session_dataset(session_id)
+    cache_result(session_id, cache_key, output_filename, {'message': message})
+    return {
+        'message': message,
+        'download_filename': output_filename,
+        'original_filename': original_filename,
+    }
+
+def expand_batch_files(uploads):
+    """Replace the zip files among [(path, name)] uploads by the workbooks they contain
+
+    Returns [(workbook path, name)] in upload order. Members are extracted next
+    to the zip under names of our own, so paths inside the archive are never used.
+    """
+    workbooks = []
+    unzipped = 0
+    for path, name in uploads:
+        if not name.lower().endswith('.zip'):
+            workbooks.append((path, name))
+            continue
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = [info for info in archive.infolist()
+                           if not info.is_dir() and '__MACOSX' not in info.filename
+                           and not os.path.basename(info.filename).startswith('.')
+                           and allowed_file(os.path.basename(info.filename))]
+                unzipped += sum(info.file_size for info in members)
+                if unzipped > app.config['MAX_BATCH_UNZIPPED_BYTES']:
+                    raise jobs.JobFailed(f"{name} is too large to unpack")
+                stem = os.path.splitext(path)[0]
+                for i, info in enumerate(members):
+                    member_name = os.path.basename(info.filename)
+                    safe_name = secure_filename(member_name) or f"workbook.{member_name.rsplit('.', 1)[1].lower()}"
+                    member_path = f"{stem}_{i + 1}_{safe_name}"
+                    with archive.open(info) as source, open(member_path, 'wb') as target:
+                        shutil.copyfileobj(source, target)
+                    workbooks.append((member_path, f"{name}/{member_name}"))
+        except zipfile.BadZipFile:
+            raise jobs.JobFailed(f"{name} is not a valid zip file")
+    return workbooks
+
+def spill_engine(input_path):
+    """Excel reader for spill_excel_chunks: only large workbooks need the streaming one"""
+    chunked_bytes = app.config['CHUNKED_UPLOAD_BYTES']
+    if chunked_bytes and os.path.getsize(input_path) > chunked_bytes:
+        return app.config['CHUNKED_EXCEL_READER'] or app.config['EXCEL_READER']
+    return app.config['EXCEL_READER']
+
+def spill_batch_file(input_path, spill_folder):
+    """First pass of the chunked pipeline over one workbook of a batch (runs in a pool process)"""
+    return spill_excel_chunks(input_path, spill_folder, engine=spill_engine(input_path))
+
+def spill_batch(workbooks, spill_folder, progress):
+    """spill_batch_file for every workbook, BATCH_WORKERS at a time
+
+    Returns the results in the order of workbooks, whatever order they finish
+    in, so the merged dataset and the duplicates it keeps do not depend on timing.
+    """
+    folders = [os.path.join(spill_folder, f"file_{i}") for i in range(len(workbooks))]
+    for folder in folders:
+        os.makedirs(folder)
+    results = [None] * len(workbooks)
+
+    workers = min(app.config['BATCH_WORKERS'], len(workbooks))
+    if workers <= 1:
+        for i, ((path, name), folder) in enumerate(zip(workbooks, folders)):
+            progress(i / len(workbooks), f"Reading {name}")
+            try:
+                results[i] = spill_batch_file(path, folder)
+            except Exception as e:
+                raise jobs.JobFailed(f"Error processing {name}: {str(e)}")
+        return results
+
+    # spawn, like the job queue: a forked child would inherit this process's threads and locks
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(spill_batch_file, path, folder): i
+                   for i, ((path, _), folder) in enumerate(zip(workbooks, folders))}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                pool.shutdown(cancel_futures=True)
+                raise jobs.JobFailed(f"Error processing {workbooks[i][1]}: {str(e)}")
+            progress(done / len(workbooks), f"Read {done} of {len(workbooks)} files")
+    return results
+
+def merge_spilled(results):
+    """Combine the spill_excel_chunks results of several workbooks, in order, into one"""
+    merged = {'parts': [], 'rows': 0, 'removed': None, 'names_found': False,
+              'column_types': excel_io.ChunkDtypes()}
+    for spilled in results:
+        merged['parts'] += spilled['parts']
+        merged['rows'] += spilled['rows']
+        if spilled['removed'] is not None:
+            merged['removed'] = (merged['removed'] or 0) + spilled['removed']
+        merged['names_found'] = merged['names_found'] or spilled['names_found']
+        merged['column_types'].update(spilled['column_types'])
+    return merged
+
+def batch_upload_job(job, session_id, uploads, output_filename):
+    """Process several workbooks (or zip files of them) into one merged session dataset
+
+    Each workbook runs through the row-wise steps in its own process; the merge
+    then drops rows duplicated within or across files, as if the sheets had
+    been uploaded as one.
+    """
+    job.progress(0.02, 'Unpacking files')
+    workbooks = expand_batch_files(uploads)
+    if not workbooks:
+        raise jobs.JobFailed('No Excel files found in the upload')
+
+    with tempfile.TemporaryDirectory(dir=app.config['CACHE_FOLDER']) as spill_folder:
+        results = spill_batch(workbooks, spill_folder,
+                              lambda done, message: job.progress(0.05 + 0.65 * done, message))
+        spilled = merge_spilled(results)
+        if not spilled['names_found']:
+            print("Warning: NAME column is missing or empty. Check 'To GSTIN & Name' or 'Name' data.")
+        kept = store_spilled_chunks(session_id, spilled,
+                                    progress=lambda done, message: job.progress(0.7 + 0.2 * done, message))
+        duplicates_removed = spilled_duplicates(spilled, kept)
+
+    queue_session_export(output_filename, session_id)
+    job.progress(0.95, 'Compacting data for analysis')
+    compact_session_dataset(session_id)
+    return {
+        'message': f"{len(workbooks)} files processed successfully! {kept:,} rows loaded, "
+                   f"{duplicates_removed:,} duplicate rows removed.",
+        'download_filename': output_filename,
+        'original_filename': ', '.join(name for _, name in workbooks),
+    }
+
+def stored_row_digests(session_id, column_types):
+    """Sorted digests of the session dataset's rows, in the plain column types of column_types"""
+    expand = session_compact_dtypes().expand
+    digests = [row_digests(column_types.apply(expand(df)))
+               for df in session_store.read_dataset_chunks(app.config['CACHE_FOLDER'], session_id)]
+    return np.unique(np.concatenate(digests))
+
+def session_row_index(session_id, version):
+    """Row index of the session dataset: the digests of its rows and their column types
+
+    The digests are taken over the rows as processed (before compaction), so
+    rows of a new file can be checked against them. The index is built from the
+    stored dataset the first time rows are appended to it, or after it was
+    replaced, and every append stores it for the new version.
+    """
+    index = session_store.read_row_index(app.config['CACHE_FOLDER'], session_id)
+    if index is not None and index['version'] == version:
+        return index
+
+    expand = session_compact_dtypes().expand
+    column_types = excel_io.ChunkDtypes()
+    for df in session_store.read_dataset_chunks(app.config['CACHE_FOLDER'], session_id):
+        column_types.observe(expand(df))
+    return {'version': version, 'digests': stored_row_digests(session_id, column_types),
+            'column_types': column_types}
+
+def append_job(job, session_id, input_path, output_filename, original_filename):
+    """Process one more export and add its rows that are not loaded yet to the session dataset
+
+    Only the new file is read and processed. Its rows are checked against the
+    row index of the loaded data and written after the loaded rows, which are
+    copied rather than processed again. A row counts as loaded when it matches
+    a loaded row on every column of the session dataset.
+    """
+    folder = app.config['CACHE_FOLDER']
+    base_version = session_store.dataset_version(folder, session_id)
+    if base_version is None:
+        # Nothing loaded any more: a plain upload does the same
+        return upload_job(job, session_id, input_path, output_filename, original_filename)
+
+    with tempfile.TemporaryDirectory(dir=folder) as spill_folder:
+        job.progress(0.05, 'Reading Excel file')
+        spilled = spill_excel_chunks(input_path, spill_folder, engine=spill_engine(input_path),
+                                     progress=lambda done, message: job.progress(0.05 + 0.55 * done, message))
+
+        job.progress(0.6, 'Checking for rows already loaded')
+        index = session_row_index(session_id, base_version)
+        column_types = copy.deepcopy(index['column_types'])
+        for part_path in spilled['parts']:
+            chunk = spilled['column_types'].apply(pd.read_pickle(part_path))
+            if not spilled['names_found']:
+                chunk['NAME'] = 'Unknown'  # Fallback value for missing names
+            chunk = finalize_columns(chunk)
+            column_types.observe(chunk)
+            chunk.to_pickle(part_path)
+
+        # A new column, or values that change a column's type (text in a number column,
+        # gaps in an int column), changes the loaded rows as well
+        retype = column_types.kinds() != index['column_types'].kinds()
+        seen = stored_row_digests(session_id, column_types) if retype else index['digests']
+        added = 0
+        for part_path in spilled['parts']:
+            chunk = column_types.apply(pd.read_pickle(part_path))
+            chunk, seen = drop_seen_rows(chunk, seen)
+            chunk.to_pickle(part_path)
+            added += len(chunk)
+        skipped = spilled_duplicates(spilled, added)
+
+        def new_frames():
+            return (pd.read_pickle(part_path) for part_path in spilled['parts'])
+
+        # The download is the processed new file, as for a plain upload
+        session_store.write_dataset_chunks(folder, f"export_{output_filename}", new_frames,
+                                           fmt=app.config['SESSION_CACHE_FORMAT'])
+        if added:
+            job.progress(0.8, 'Adding the new rows to the loaded data')
+            expand = session_compact_dtypes().expand
+            base_rows = session_store.append_dataset(
+                folder, session_id, new_frames, session_compact_dtypes(), fmt=app.config['SESSION_CACHE_FORMAT'],
+                convert=(lambda df: column_types.apply(expand(df))) if retype else None)
+            version = session_store.dataset_version(folder, session_id)
+            # Versions reached only by appending let the analytics views summarize just the new rows
+            lineage = {} if retype else session_store.read_lineage(folder, session_id)
+            if base_version not in lineage:
+                lineage = {} if retype else {base_version: base_rows}
+            lineage[version] = base_rows + added
+            session_store.write_lineage(folder, session_id, lineage)
+            session_store.write_row_index(folder, session_id,
+                                          {'version': version, 'digests': seen, 'column_types': column_types})
+            for state, rows in (('base', base_rows), ('added', added)):
+                instrumentation.set_gauge('appended_dataset_rows', 'Rows of the last session dataset appended to',
+                                          rows, state=state)
+        elif not retype:
+            session_store.write_row_index(folder, session_id, index)
+
+    return {
+        'message': f"Added {added:,} new rows to the loaded data ({skipped:,} rows were already loaded "
+                   f"or duplicated).",
+        'download_filename': output_filename,
+        'original_filename': original_filename,
+    }
+
+def data_cleaner_job(job, session_id, main_path, price_path, output_filename, price_list_id=None, price_name=None):
+    """Match the main file against the price list and replace the session dataset with the result
+
+    With a price_path the price file is registered first (see register_price_list);
+    otherwise price_list_id names a registered price list.
+    """
+    if price_path is not None:
+        job.progress(0.02, 'Reading price file')
+        try:
+            price_list_id = register_price_list(price_path, price_name)['id']
+        except price_lists.PriceListError as e:
+            raise jobs.JobFailed(str(e))
+        except Exception as e:
+            raise jobs.JobFailed(f"Error processing files: {str(e)}")
+
+    # The same main file cleaned with the same price list before is restored from the result cache
+    cache_key = result_cache.result_key('data_cleaner', RESULT_PIPELINE_VERSION,
+                                        result_cache.file_digest(main_path), price_list_id)
+    cached = restore_cached_result(session_id, cache_key, output_filename)
+    if cached is not None:
+        return {'output_filename': output_filename, 'stats': cached['stats']}
+
+    success, message, stats, processed_data, highlight = process_data_cleaner(main_path, price_list_id,
+                                                                              progress=job.progress)
+    if not success:
+        raise jobs.JobFailed(message)
+
+    # Update the session with the cleaned data; the Excel file is written on first download
+    job.progress(0.9, 'Saving cleaned data')
+    write_session_dataset(session_id, processed_data)
+    queue_excel_export(output_filename, processed_data, highlight=highlight)
+    del processed_data
+    job.progress(0.95, 'Compacting data for analysis')
+    compact_session_dataset(session_id)
+    cache_result(session_id, cache_key, output_filename, {'stats': stats})
+    return {'output_filename': output_filename, 'stats': stats}
+
+def session_job(job_id):
+    """Return the job if it belongs to the current session, else None"""
+    job = job_queue.get(job_id)
+    if job is None or job['owner'] != session.get('session_id'):
+        return None
+    return job
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Progress page of a background job; shows the result page once it is done"""
+    job = session_job(job_id)
+    if job is None:
+        flash('Job not found')
+        return redirect(url_for('index'))
+
+    home = 'data_cleaner' if job['kind'] == 'data_cleaner' else 'index'
+    if job['status'] == jobs.FAILED:
+        flash(f"Error: {job['message']}")
+        return redirect(url_for(home))
+    if job['status'] != jobs.DONE:
+        return render_template('job_status.html', job=job)
+
+    # The job wrote the session dataset; make it the session's data in this browser
+    session['has_data'] = True
+    if job['kind'] != 'append':
+        invalidate_session_caches(job['owner'])  # Appends keep them to update incrementally
+    result = job['result']
+    if job['kind'] == 'data_cleaner':
+        flash('Data cleaned successfully! The cleaned data is now loaded for analysis.')
+        stats = result['stats']
+        return render_template('data_cleaner_result.html',
+                             output_filename=result['output_filename'],
+                             total_rows=stats['total_rows'],
+                             updated_rows=stats['updated_rows'],
+                             not_updated_rows=stats['not_updated_rows'],
+                             matched_hsn=stats['matched_hsn'])
+
+    flash(result['message'])
+    return render_template('success.html',
+                         download_filename=result['download_filename'],
+                         original_filename=result['original_filename'])
+
+@app.route('/jobs/<job_id>/status')
+def job_status_json(job_id):
+    """Job status for polling from the progress page"""
+    job = session_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({
+        'id': job['id'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        # Where the job's time went, stage by stage, once it is done
+        'timings': (job['result'] or {}).get('timings'),
+    })
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -400,37 +1810,57 @@ def upload_file():
         # Save uploaded file
         file.save(input_path)
         
-        # Process the file
+        # Process the file in the background and show its progress
         output_filename = f"processed_{input_filename}"
-        output_path = os.path.join(app.config['PROCESSED_FOLDER'], output_filename)
-        
-        success, message = process_excel_file(input_path, output_path)
-        
-        if success:
-            # Load processed data into session
-            processed_data = pd.read_excel(output_path, engine='openpyxl')
-            save_to_session(processed_data)
-            del processed_data
-            gc.collect()
-            flash(message)
-            return render_template('success.html', 
-                                 download_filename=output_filename,
-                                 original_filename=filename)
+        session_id = current_session_id()
+        if request.form.get('append') and session.get('has_data'):
+            # Add the file's new rows to the data already loaded
+            job_id = job_queue.submit('append', session_id, append_job,
+                                      session_id, input_path, output_filename, filename,
+                                      profile=job_profile('append'))
         else:
-            flash(f"Error: {message}")
-            return redirect(url_for('index'))
+            job_id = job_queue.submit('upload', session_id, upload_job,
+                                      session_id, input_path, output_filename, filename,
+                                      profile=job_profile('upload'))
+        return redirect(url_for('job_status', job_id=job_id))
     else:
         flash('Invalid file type. Please upload an Excel file (.xlsx or .xls)')
         return redirect(url_for('index'))
 
+@app.route('/upload_batch', methods=['POST'])
+def upload_batch():
+    """Upload several exports (or zip files of them) and analyze them as one dataset"""
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        flash('No file selected')
+        return redirect(url_for('index'))
+    if not all(allowed_file(file.filename, BATCH_EXTENSIONS) for file in files):
+        flash('Invalid file type. Please upload Excel files (.xlsx or .xls) or zip files of them')
+        return redirect(url_for('index'))
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    uploads = []
+    for i, file in enumerate(files):
+        filename = secure_filename(file.filename)
+        input_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{i + 1}_{filename}")
+        file.save(input_path)
+        uploads.append((input_path, filename))
+
+    # Process the files in the background and show their progress
+    output_filename = f"processed_{timestamp}_batch.xlsx"
+    session_id = current_session_id()
+    job_id = job_queue.submit('batch_upload', session_id, batch_upload_job,
+                              session_id, uploads, output_filename, profile=job_profile('batch_upload'))
+    return redirect(url_for('job_status', job_id=job_id))
+
 @app.route('/download/<filename>')
 def download_file(filename):
     try:
-        file_path = os.path.join(app.config['PROCESSED_FOLDER'], filename)
-        if os.path.exists(file_path):
+        file_path = excel_export_path(filename)
+        if file_path:
             return send_file(file_path, as_attachment=True)
         else:
-            flash('File not found')
+            flash('File not found, it may have expired: please process the file again')
             return redirect(url_for('index'))
     except Exception as e:
         flash(f'Error downloading file: {str(e)}')
@@ -438,59 +1868,67 @@ def download_file(filename):
 
 @app.route('/summary')
 def summary():
-    processed_data = load_from_session()
-    if processed_data is None:
-        flash('No processed data found to summarize')
-        return redirect(url_for('index'))
-
-    # Generate summary
-    summary_df = generate_summary(processed_data)
-    if summary_df is None:
-        flash('Error generating summary')
+    if session_dataset_version()[1] is None:
+        flash(no_data_message('No processed data found to summarize'))
         return redirect(url_for('index'))
 
-    # Save summary to a temporary file
-    summary_file_path = os.path.join(app.config['PROCESSED_FOLDER'], 'summary_latest.xlsx')
-    summary_df.to_excel(summary_file_path, index=False)
+    page = int(request.args.get('page', 1))
+    per_page = 50  # Number of PAN/NAME groups per page
+    if app.config['ANALYTICS_BACKEND'] == 'sqlite':
+        groups, total_pages = analytics_db.summary_page(analytics_database(), page, per_page)
+    else:
+        # Generate summary (reused while the session dataset is unchanged)
+        summary_data = load_summary()
+        if summary_data is None:
+            flash('Error generating summary')
+            return redirect(url_for('index'))
+        groups, total_pages = summary_page(summary_data, page, per_page)
 
     # Pass summary to template
-    return render_template('summary.html', summary=summary_df, summary_filename='summary_latest.xlsx')
+    return render_template('summary.html',
+                         groups=groups,
+                         current_page=page,
+                         total_pages=total_pages)
+
+@app.route('/summary/download')
+def summary_download():
+    """Download the summary of the session dataset as Excel (see export_summary)"""
+    return export_summary('xlsx')
 
 @app.route('/seller_comparison')
 def seller_comparison():
-    processed_data = load_from_session()
-    if processed_data is None:
-        flash('No processed data found to analyze')
+    if session_dataset_version()[1] is None:
+        flash(no_data_message('No processed data found to analyze'))
         return redirect(url_for('index'))
-    
+
+    if app.config['ANALYTICS_BACKEND'] == 'sqlite':
+        database = analytics_database()
+        info = analytics_db.info(database)
+        has_price_col = info['has_price_col']
+        stats = {key: info[key] for key in ('sellers', 'buyers', 'products', 'total_value')}
+    else:
+        # Generate seller analysis (reused while the session dataset is unchanged)
+        analysis_data = load_seller_analysis()
+        if analysis_data is None:
+            flash('Error generating seller analysis')
+            return redirect(url_for('index'))
+        processed_data = analysis_data['processed_data']
+        has_price_col = any('2024-25' in str(col) for col in processed_data.columns)
+        # Unique sellers grouped by PAN (one name per PAN)
+        stats = {'sellers': len(analysis_data['seller_index']['sellers']), 'buyers': processed_data['NAME'].nunique(),
+                 'products': processed_data['HSN Desc.'].nunique(), 'total_value': processed_data['VALUE'].sum()}
+
     # Check if 2024-25 column exists
-    has_price_col = any('2024-25' in str(col) for col in processed_data.columns)
     if not has_price_col:
         flash('WARNING: Price column (2024-25) not found! Qty.MT will show 0.00. Please use Data Cleaner first to add pricing data.', 'warning')
 
-    # Generate seller analysis
-    analysis_data = generate_seller_analysis(processed_data)
-    if analysis_data is None:
-        flash('Error generating seller analysis')
-        return redirect(url_for('index'))
-
-    # Get list of unique sellers grouped by PAN (one name per PAN)
-    seller_df = analysis_data['processed_data'][['SELLER_PAN', 'SELLER_NAME']].dropna()
-    # Group by PAN and take the first seller name for each PAN
-    unique_sellers = seller_df.groupby('SELLER_PAN')['SELLER_NAME'].first().reset_index()
-    sellers = unique_sellers['SELLER_NAME'].tolist()
-    sellers = [seller for seller in sellers if seller and seller != 'None']
-    sellers.sort()
-
-    return render_template('seller_comparison.html', 
-                         sellers=sellers,
-                         analysis_data=analysis_data)
+    # The seller lists are filled from /api/sellers as the user types
+    return render_template('seller_comparison.html', stats=stats)
 
 @app.route('/compare_sellers')
 def compare_sellers():
-    processed_data = load_from_session()
-    if processed_data is None:
-        flash('No processed data found to analyze')
+    if session_dataset_version()[1] is None:
+        flash(no_data_message('No processed data found to analyze'))
         return redirect(url_for('index'))
 
     seller1 = request.args.get('seller1')
@@ -502,83 +1940,33 @@ def compare_sellers():
         flash('Please select both sellers to compare')
         return redirect(url_for('seller_comparison'))
 
-    # Generate seller analysis
-    analysis_data = generate_seller_analysis(processed_data)
-    if analysis_data is None:
-        flash('Error generating seller analysis')
-        return redirect(url_for('seller_comparison'))
-
-    # Find the PAN for the selected seller names
-    seller_df = analysis_data['processed_data'][['SELLER_PAN', 'SELLER_NAME']].dropna().drop_duplicates()
-    seller1_pan = seller_df[seller_df['SELLER_NAME'] == seller1]['SELLER_PAN'].iloc[0] if len(seller_df[seller_df['SELLER_NAME'] == seller1]) > 0 else None
-    seller2_pan = seller_df[seller_df['SELLER_NAME'] == seller2]['SELLER_PAN'].iloc[0] if len(seller_df[seller_df['SELLER_NAME'] == seller2]) > 0 else None
-
-    # Get data for both sellers based on PAN (this will include all variations of the same company)
-    seller1_data = analysis_data['processed_data'][analysis_data['processed_data']['SELLER_PAN'] == seller1_pan]
-    seller2_data = analysis_data['processed_data'][analysis_data['processed_data']['SELLER_PAN'] == seller2_pan]
-
-    # Group and sum products for each buyer (including quantity if available)
-    if 'QUANTITY_MT' in seller1_data.columns:
-        seller1_grouped = seller1_data.groupby(['NAME', 'HSN Desc.']).agg(
-            VALUE=('VALUE', 'sum'),
-            product_quantity=('QUANTITY_MT', 'sum')
-        ).reset_index()
+    if app.config['ANALYTICS_BACKEND'] == 'sqlite':
+        buyers, total_pages, (seller1_total, seller1_qty_total), (seller2_total, seller2_qty_total) = \
+            analytics_db.comparison(analytics_database(), seller1, seller2, page, per_page)
     else:
-        seller1_grouped = seller1_data.groupby(['NAME', 'HSN Desc.']).agg(
-            VALUE=('VALUE', 'sum')
-        ).reset_index()
-    
-    if 'QUANTITY_MT' in seller2_data.columns:
-        seller2_grouped = seller2_data.groupby(['NAME', 'HSN Desc.']).agg(
-            VALUE=('VALUE', 'sum'),
-            product_quantity=('QUANTITY_MT', 'sum')
-        ).reset_index()
-    else:
-        seller2_grouped = seller2_data.groupby(['NAME', 'HSN Desc.']).agg(
-            VALUE=('VALUE', 'sum')
-        ).reset_index()
-
-    # Sort by company name and product name alphabetically
-    seller1_grouped = seller1_grouped.sort_values(['NAME', 'HSN Desc.'])
-    seller2_grouped = seller2_grouped.sort_values(['NAME', 'HSN Desc.'])
-
-    # Get unique buyers for each seller
-    seller1_buyers_set = set(seller1_grouped['NAME'].unique())
-    seller2_buyers_set = set(seller2_grouped['NAME'].unique())
-    
-    # Find common and unique buyers
-    common_buyers = sorted(list(seller1_buyers_set.intersection(seller2_buyers_set)))
-    seller1_unique_buyers = sorted(list(seller1_buyers_set - seller2_buyers_set))
-    seller2_unique_buyers = sorted(list(seller2_buyers_set - seller1_buyers_set))
-    
-    # Create ordered buyer lists (common first, then unique)
-    seller1_buyers = common_buyers + seller1_unique_buyers
-    seller2_buyers = common_buyers + seller2_unique_buyers
+        # Generate seller analysis (reused while the session dataset is unchanged)
+        analysis_data = load_seller_analysis()
+        if analysis_data is None:
+            flash('Error generating seller analysis')
+            return redirect(url_for('seller_comparison'))
 
-    # Pagination for seller1
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    seller1_buyers_page = seller1_buyers[start_idx:end_idx]
+        # Resolve seller names to PANs; the pre-grouped tables include all name
+        # variations of the same company (grouped by PAN)
+        seller_index = analysis_data['seller_index']
+        seller1_pan = seller_index['pan_by_name'].get(seller1)
+        seller2_pan = seller_index['pan_by_name'].get(seller2)
 
-    # Calculate totals
-    seller1_total = seller1_data['VALUE'].sum()
-    seller2_total = seller2_data['VALUE'].sum()
-    
-    # Calculate quantity totals if available
-    seller1_qty_total = seller1_data['QUANTITY_MT'].sum() if 'QUANTITY_MT' in seller1_data.columns else 0
-    seller2_qty_total = seller2_data['QUANTITY_MT'].sum() if 'QUANTITY_MT' in seller2_data.columns else 0
+        # Merge both sellers' buyer/product rows for the requested page
+        buyers, total_pages = build_comparison_view(seller_index, seller1_pan, seller2_pan, page, per_page)
 
-    # Calculate pagination info
-    total_pages = (len(seller1_buyers) + per_page - 1) // per_page
+        # Totals over all of the seller's rows
+        seller1_total, seller1_qty_total = seller_index['totals'].get(seller1_pan, (0, 0))
+        seller2_total, seller2_qty_total = seller_index['totals'].get(seller2_pan, (0, 0))
 
     return render_template('seller_comparison_result.html',
                          seller1=seller1,
                          seller2=seller2,
-                         seller1_data=seller1_grouped,
-                         seller2_data=seller2_grouped,
-                         seller1_buyers_page=seller1_buyers_page,
-                         seller2_buyers=seller2_buyers,
-                         common_buyers=common_buyers,
+                         buyers=buyers,
                          seller1_total=seller1_total,
                          seller2_total=seller2_total,
                          seller1_qty_total=seller1_qty_total,
@@ -594,14 +1982,276 @@ def download_analysis(filename):
         if os.path.exists(file_path):
             return send_file(file_path, as_attachment=True)
         else:
-            flash('Analysis file not found')
+            flash('Analysis file not found, it may have expired: please run the analysis again')
             return redirect(url_for('index'))
     except Exception as e:
         flash(f'Error downloading analysis file: {str(e)}')
         return redirect(url_for('index'))
 
+# ========== EXPORTS ==========
+# Analytics results are streamed chunk by chunk from the cached views, so a download
+# starts at once and nothing is written to disk
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Buyers of a seller-pair comparison exported at a time
+EXPORT_COMPARISON_BUYERS = 500
+
+def frame_chunks(df, chunk_rows=excel_io.CHUNK_ROWS):
+    """Consecutive row slices of df (views, not copies)"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def export_response(columns, chunks, filename, fmt):
+    """Stream the frames of chunks as a CSV or xlsx download named filename.fmt"""
+    if fmt == 'csv':
+        body = excel_io.stream_csv(columns, chunks)
+    else:
+        body = excel_io.stream_xlsx(columns, chunks)
+    response = Response(stream_with_context(body), mimetype=EXPORT_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    # Let a proxy such as nginx pass the chunks on as they come instead of buffering the file
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def comparison_chunks(comparison_page, columns):
+    """Rows of a whole seller-pair comparison, EXPORT_COMPARISON_BUYERS buyers at a time
+
+    comparison_page(page, per_page) returns (buyers, total_pages) as
+    build_comparison_view(). Each buyer's products are followed by a Total
+    row, as on the comparison page.
+    """
+    page = 1
+    while True:
+        buyers, total_pages = comparison_page(page, EXPORT_COMPARISON_BUYERS)
+        rows = []
+        for buyer in buyers:
+            for product in buyer['products']:
+                rows.append((buyer['name'], product['name'], product['value1'], product['qty1'],
+                             product['value2'], product['qty2']))
+            rows.append((buyer['name'], 'Total', buyer['total1'], buyer['qty_total1'],
+                         buyer['total2'], buyer['qty_total2']))
+        if rows:
+            yield pd.DataFrame.from_records(rows, columns=columns)
+        page += 1
+        if page > total_pages:
+            break
+
+@app.route('/export/summary.<fmt>')
+def export_summary(fmt):
+    """Download the summary of the session dataset as CSV or Excel"""
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    if session_dataset_version()[1] is None:
+        flash(no_data_message('No processed data found to summarize'))
+        return redirect(url_for('index'))
+
+    if app.config['ANALYTICS_BACKEND'] == 'sqlite':
+        chunks = analytics_db.summary_chunks(analytics_database())
+        return export_response(analytics_db.SUMMARY_COLUMNS, chunks, 'summary', fmt)
+
+    summary_data = load_summary()
+    if summary_data is None:
+        flash('Error generating summary')
+        return redirect(url_for('index'))
+
+    summary_df = summary_data['summary']
+    return export_response(list(summary_df.columns), frame_chunks(summary_df), 'summary', fmt)
+
+@app.route('/export/seller_analysis.<fmt>')
+def export_seller_analysis(fmt):
+    """Download the seller analysis (value and quantity per seller, buyer and product) as CSV or Excel"""
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    if session_dataset_version()[1] is None:
+        flash(no_data_message('No processed data found to analyze'))
+        return redirect(url_for('index'))
+
+    if app.config['ANALYTICS_BACKEND'] == 'sqlite':
+        chunks = analytics_db.seller_analysis_chunks(analytics_database())
+        return export_response(analytics_db.SELLER_ANALYSIS_COLUMNS, chunks, 'seller_analysis', fmt)
+
+    analysis_data = load_seller_analysis()
+    if analysis_data is None:
+        flash('Error generating seller analysis')
+        return redirect(url_for('index'))
+
+    seller_analysis = analysis_data['seller_analysis']
+    return export_response(list(seller_analysis.columns), frame_chunks(seller_analysis), 'seller_analysis', fmt)
+
+@app.route('/export/comparison.<fmt>')
+def export_comparison(fmt):
+    """Download the comparison of two sellers (all buyers) as CSV or Excel"""
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    if session_dataset_version()[1] is None:
+        flash(no_data_message('No processed data found to analyze'))
+        return redirect(url_for('index'))
+
+    seller1 = request.args.get('seller1')
+    seller2 = request.args.get('seller2')
+    if not seller1 or not seller2:
+        flash('Please select both sellers to compare')
+        return redirect(url_for('seller_comparison'))
+
+    columns = ['Buyer', 'HSN Desc.', f"{seller1} Value", f"{seller1} Qty.MT", f"{seller2} Value", f"{seller2} Qty.MT"]
+    if app.config['ANALYTICS_BACKEND'] == 'sqlite':
+        database = analytics_database()
+
+        def comparison_page(page, per_page):
+            return analytics_db.comparison(database, seller1, seller2, page, per_page)[:2]
+    else:
+        analysis_data = load_seller_analysis()
+        if analysis_data is None:
+            flash('Error generating seller analysis')
+            return redirect(url_for('seller_comparison'))
+
+        seller_index = analysis_data['seller_index']
+        seller1_pan = seller_index['pan_by_name'].get(seller1)
+        seller2_pan = seller_index['pan_by_name'].get(seller2)
+
+        def comparison_page(page, per_page):
+            return build_comparison_view(seller_index, seller1_pan, seller2_pan, page, per_page)
+    return export_response(columns, comparison_chunks(comparison_page, columns), 'seller_comparison', fmt)
+
+# ========== JSON API ==========
+# Slices of the analytics views for pages that load incrementally. Every endpoint takes
+# limit and offset; the summary, seller totals and comparison also take sort, order
+# (asc/desc) and the filters hsn, buyer, date_from and date_to (YYYY-MM-DD). They read
+# the session's analytics database (see analytics_db.py) whichever ANALYTICS_BACKEND
+# the pages use, as its aggregates answer filtered queries without loading the dataset
+
+# Rows of a response when the request gives no limit, and the most it may ask for
+API_DEFAULT_LIMIT = 50
+API_MAX_LIMIT = 500
+
+def api_paging():
+    """(offset, limit) of an API request; ValueError if they are not valid"""
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', API_DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError('offset and limit must be integers')
+    if offset < 0 or not 0 < limit <= API_MAX_LIMIT:
+        raise ValueError(f'offset must be at least 0 and limit between 1 and {API_MAX_LIMIT}')
+    return offset, limit
+
+def api_filters():
+    """The filters of an API request, as analytics_db.matching_rows() takes them; ValueError for bad dates"""
+    filters = {'hsn': request.args.get('hsn', '').strip() or None,
+               'buyer': request.args.get('buyer', '').strip() or None}
+    for key in ('date_from', 'date_to'):
+        value = request.args.get(key, '').strip()
+        try:
+            filters[key] = date.fromisoformat(value) if value else None
+        except ValueError:
+            raise ValueError(f'{key} must be a date as YYYY-MM-DD')
+    return filters
+
+def api_sort(sorts, default):
+    """(sort, descending) of an API request, sort being one of sorts; ValueError otherwise"""
+    sort = request.args.get('sort', default)
+    order = request.args.get('order', 'asc')
+    if sort not in sorts or order not in ('asc', 'desc'):
+        raise ValueError(f"sort must be one of {', '.join(sorts)} and order asc or desc")
+    return sort, order == 'desc'
+
+def api_page(key, items, total, offset, limit, **extra):
+    """Response of one slice of total items; next_offset is None after the last slice"""
+    return jsonify({key: items, 'total': total, 'offset': offset, 'limit': limit,
+                    'next_offset': offset + limit if offset + limit < total else None, **extra})
+
+def api_no_data():
+    return jsonify({'error': no_data_message('No processed data found')}), 404
+
+@app.route('/api/summary')
+def api_summary():
+    """Summary groups (buyer PAN and name, products and total) of the rows matching the filters"""
+    if session_dataset_version()[1] is None:
+        return api_no_data()
+    try:
+        offset, limit = api_paging()
+        sort, descending = api_sort(analytics_db.SUMMARY_SORTS, 'pan')
+        filters = api_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    groups, total = analytics_db.summary_range(analytics_database(), offset, limit, filters, sort, descending)
+    for group in groups:
+        group['products'] = [{'hsn_desc': product, 'value': value} for product, value in group['products']]
+    return api_page('groups', groups, total, offset, limit)
+
+@app.route('/api/sellers')
+def api_sellers():
+    """Seller names for the selection lists (one per PAN), filtered by q as the user types"""
+    if session_dataset_version()[1] is None:
+        return api_no_data()
+    try:
+        offset, limit = api_paging()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    search = request.args.get('q', '').strip()
+
+    if app.config['ANALYTICS_BACKEND'] == 'sqlite':
+        sellers, total = analytics_db.seller_range(analytics_database(), offset, limit, search)
+        names = [seller['name'] for seller in sellers]
+    else:
+        # The pandas pages already hold the seller list, so no analytics database is built for it
+        analysis_data = load_seller_analysis()
+        if analysis_data is None:
+            return jsonify({'error': 'Error generating seller analysis'}), 500
+        matches = [name for name in analysis_data['seller_index']['sellers'] if search.lower() in name.lower()]
+        names, total = matches[offset:offset + limit], len(matches)
+    return api_page('sellers', names, total, offset, limit)
+
+@app.route('/api/sellers/totals')
+def api_seller_totals():
+    """Value, quantity, buyers and products of each seller over the rows matching the filters"""
+    if session_dataset_version()[1] is None:
+        return api_no_data()
+    try:
+        offset, limit = api_paging()
+        sort, descending = api_sort(analytics_db.SELLER_SORTS, 'name')
+        filters = api_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sellers, total = analytics_db.seller_range(analytics_database(), offset, limit, request.args.get('q', '').strip(),
+                                               filters, sort, descending)
+    return api_page('sellers', sellers, total, offset, limit)
+
+@app.route('/api/comparison')
+def api_comparison():
+    """Buyers of two sellers with each one's value and quantity per product, and the sellers' totals"""
+    if session_dataset_version()[1] is None:
+        return api_no_data()
+    seller1 = request.args.get('seller1')
+    seller2 = request.args.get('seller2')
+    if not seller1 or not seller2:
+        return jsonify({'error': 'seller1 and seller2 are required'}), 400
+    try:
+        offset, limit = api_paging()
+        sort, descending = api_sort(analytics_db.COMPARISON_SORTS, 'default')
+        filters = api_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    buyers, total, (seller1_total, seller1_qty_total), (seller2_total, seller2_qty_total) = \
+        analytics_db.comparison_range(analytics_database(), seller1, seller2, offset, limit, filters, sort, descending)
+    return api_page('buyers', buyers, total, offset, limit,
+                    seller1={'name': seller1, 'total': seller1_total, 'qty_total': seller1_qty_total},
+                    seller2={'name': seller2, 'total': seller2_total, 'qty_total': seller2_qty_total})
+
 # ========== DATA CLEANER ROUTES ==========
 
+def clean_column_name(col):
+    """Column name without surrounding spaces and line breaks"""
+    return str(col).strip().replace('\n', ' ').replace('\r', ' ')
+
 def clean_hsn_code(hsn):
     """Clean HSN code by removing spaces and converting to string for case-insensitive comparison"""
     if pd.isna(hsn):
@@ -609,30 +2259,129 @@ def clean_hsn_code(hsn):
     # Convert to string and remove spaces, convert to lowercase
     return str(hsn).strip().lower().replace(' ', '')
 
-def process_data_cleaner(main_file_path, price_file_path, output_path):
+def clean_hsn_code_vectorized(series):
+    """Vectorized clean_hsn_code, evaluated once per distinct HSN code"""
+    return _on_uniques(series, lambda values: values.map(clean_hsn_code))
+
+def find_price_columns(price_columns):
+    """Return the (HSN Code, HSN Desc, 2024-25 price) columns of a price file, None where missing"""
+    price_hsn_col = None
+    price_desc_col = None
+    price_2024_25_col = None
+
+    # Search for HSN Code in price file
+    for col in price_columns:
+        col_lower = str(col).lower().replace(' ', '').replace('_', '')
+        if 'hsn' in col_lower and 'code' in col_lower:
+            price_hsn_col = col
+            break
+
+    # Search for HSN Desc in price file
+    for col in price_columns:
+        col_lower = str(col).lower().replace(' ', '').replace('_', '')
+        if 'hsn' in col_lower and 'desc' in col_lower:
+            price_desc_col = col
+            break
+
+    # Search for 2024-25 column in price file
+    for col in price_columns:
+        if '2024-25' in str(col) or '2024' in str(col):
+            price_2024_25_col = col
+            break
+
+    return price_hsn_col, price_desc_col, price_2024_25_col
+
+def build_price_lookup(price_file_path):
+    """Read a price file into its HSN lookup
+
+    The lookup has one row per cleaned HSN code that appears exactly once in the
+    file (duplicated codes are ignored completely), with the columns
+    _cleaned_hsn, _new_desc and _new_price. Returns (lookup, info), where info
+    names the price column. Raises price_lists.PriceListError if a column is missing.
     """
-    Process two Excel files:
+    # Only the header is needed to find the columns
+    price_header = excel_io.read_header(price_file_path, engine=app.config['EXCEL_READER'])
+    price_columns = [clean_column_name(col) for col in price_header]
+    price_hsn_col, price_desc_col, price_2024_25_col = find_price_columns(price_columns)
+
+    if not price_hsn_col:
+        raise price_lists.PriceListError(f"HSN Code column not found in price file. Available columns: {price_columns}")
+    if not price_desc_col:
+        raise price_lists.PriceListError(f"HSN Desc column not found in price file. Available columns: {price_columns}")
+    if not price_2024_25_col:
+        raise price_lists.PriceListError(f"2024-25 column not found in price file. Available columns: {price_columns}")
+
+    # Read only the price file columns used for matching
+    raw_price_names = dict(zip(price_columns, price_header))
+    price_df = excel_io.read_excel(price_file_path, engine=app.config['EXCEL_READER'],
+                                   columns=[raw_price_names[col] for col in
+                                            (price_hsn_col, price_desc_col, price_2024_25_col)])
+    price_df.columns = [clean_column_name(col) for col in price_df.columns]
+    price_df['_cleaned_hsn'] = clean_hsn_code_vectorized(price_df[price_hsn_col])
+
+    # First, identify duplicate HSN codes in price list (to be completely ignored)
+    hsn_counts = price_df['_cleaned_hsn'].value_counts()
+    duplicate_hsn = set(hsn_counts[hsn_counts > 1].index)
+
+    # Only include HSN codes that appear exactly once (ignore duplicates completely)
+    price_lookup = price_df.loc[
+        price_df['_cleaned_hsn'].notna() & (price_df['_cleaned_hsn'] != '')
+        & ~price_df['_cleaned_hsn'].isin(duplicate_hsn),
+        ['_cleaned_hsn', price_desc_col, price_2024_25_col]
+    ].reset_index(drop=True)
+    price_lookup.columns = ['_cleaned_hsn', '_new_desc', '_new_price']
+
+    return price_lookup, {
+        'price_column': price_2024_25_col,
+        'rows': len(price_df),
+        'matched_hsn': len(price_lookup),
+        'duplicate_hsn': len(duplicate_hsn),
+    }
+
+def register_price_list(price_file_path, name):
+    """Store a price file in the price list registry and return the info of its version
+
+    A file that is already registered (same content) is not read again.
+    """
+    folder = app.config['PRICE_LIST_FOLDER']
+    version = price_lists.version_id(price_file_path)
+    info = price_lists.info(folder, version)
+    if info is None:
+        with instrumentation.stage('price_list') as stage:
+            price_lookup, info = build_price_lookup(price_file_path)
+            stage['rows_in'], stage['rows_out'] = info['rows'], len(price_lookup)
+        info = price_lists.save(folder, version, price_lookup, dict(info, name=name))
+    return info
+
+def process_data_cleaner(main_file_path, price_list_id, progress=None):
+    """
+    Process the main Excel file against a registered price list:
     1. Match HSN codes from both files (case-insensitive)
     2. Update HSN Desc in main file with HSN Desc from price file
     3. Add 2024-25 price column from price file to main file
     4. Only use HSN codes that appear exactly once in price file (ignore duplicates)
     5. Highlight non-updated rows in yellow
+
+    The price list is the stored lookup of register_price_list, so the price
+    file is not read again.
+
+    Returns (success, message, stats, cleaned DataFrame, mask of rows to highlight).
+    progress is an optional callback taking (fraction done, message).
     """
+    report = progress or (lambda fraction, message: None)
     try:
-        # Read both Excel files with optimized engine
-        main_df = pd.read_excel(main_file_path, engine='openpyxl')
-        price_df = pd.read_excel(price_file_path, engine='openpyxl')
+        # Read the main file with the fastest available engine
+        report(0.05, 'Reading main file')
+        with instrumentation.stage('read') as stage:
+            main_df = excel_io.read_excel(main_file_path, engine=app.config['EXCEL_READER'])
+            stage['rows_out'] = len(main_df)
         
         # Clean up column names - remove extra spaces and newlines
-        main_df.columns = [str(col).strip().replace('\n', ' ').replace('\r', ' ') for col in main_df.columns]
-        price_df.columns = [str(col).strip().replace('\n', ' ').replace('\r', ' ') for col in price_df.columns]
+        main_df.columns = [clean_column_name(col) for col in main_df.columns]
         
         # Find required columns
         main_hsn_col = None
         main_desc_col = None
-        price_hsn_col = None
-        price_desc_col = None
-        price_2024_25_col = None
         
         # Search for HSN Code column in main file
         for col in main_df.columns:
@@ -648,140 +2397,61 @@ def process_data_cleaner(main_file_path, price_file_path, output_path):
                 main_desc_col = col
                 break
         
-        # Search for HSN Code in price file
-        for col in price_df.columns:
-            col_lower = str(col).lower().replace(' ', '').replace('_', '')
-            if 'hsn' in col_lower and 'code' in col_lower:
-                price_hsn_col = col
-                break
-        
-        # Search for HSN Desc in price file
-        for col in price_df.columns:
-            col_lower = str(col).lower().replace(' ', '').replace('_', '')
-            if 'hsn' in col_lower and 'desc' in col_lower:
-                price_desc_col = col
-                break
-        
-        # Search for 2024-25 column in price file
-        for col in price_df.columns:
-            if '2024-25' in str(col) or '2024' in str(col):
-                price_2024_25_col = col
-                break
-        
-        # Debug: Print found columns
-        print(f"Main file columns: {list(main_df.columns)}")
-        print(f"Price file columns: {list(price_df.columns)}")
-        print(f"Found - Main HSN: {main_hsn_col}, Main Desc: {main_desc_col}")
-        print(f"Found - Price HSN: {price_hsn_col}, Price Desc: {price_desc_col}, Price 2024-25: {price_2024_25_col}")
-        
         # Validate required columns exist
         if not main_hsn_col:
-            return False, f"HSN Code column not found in main file. Available columns: {list(main_df.columns)}", None
+            return False, f"HSN Code column not found in main file. Available columns: {list(main_df.columns)}", None, None, None
         if not main_desc_col:
-            return False, f"HSN Desc column not found in main file. Available columns: {list(main_df.columns)}", None
-        if not price_hsn_col:
-            return False, f"HSN Code column not found in price file. Available columns: {list(price_df.columns)}", None
-        if not price_desc_col:
-            return False, f"HSN Desc column not found in price file. Available columns: {list(price_df.columns)}", None
-        if not price_2024_25_col:
-            return False, f"2024-25 column not found in price file. Available columns: {list(price_df.columns)}", None
-        
-        # Create cleaned HSN code columns for matching (case-insensitive)
-        main_df['_cleaned_hsn'] = main_df[main_hsn_col].apply(clean_hsn_code)
-        price_df['_cleaned_hsn'] = price_df[price_hsn_col].apply(clean_hsn_code)
-        
-        # First, identify duplicate HSN codes in price list (to be completely ignored)
-        hsn_counts = price_df['_cleaned_hsn'].value_counts()
-        duplicate_hsn = set(hsn_counts[hsn_counts > 1].index)
-        
-        print(f"Duplicate HSN codes found (will be ignored): {len(duplicate_hsn)}")
-        print(f"Duplicate HSN list: {duplicate_hsn}")
-        
-        # Create a dictionary for HSN code to data mapping from price file
-        # Only include HSN codes that appear exactly once (ignore duplicates completely)
-        hsn_to_data = {}
-        for _, row in price_df.iterrows():
-            cleaned_hsn = row['_cleaned_hsn']
-            # Only add if HSN is not None, not already added, and NOT a duplicate
-            if cleaned_hsn and cleaned_hsn not in hsn_to_data and cleaned_hsn not in duplicate_hsn:
-                hsn_to_data[cleaned_hsn] = {
-                    'desc': row[price_desc_col],
-                    'price': row[price_2024_25_col]
-                }
-        
-        # Track statistics
-        updated_rows = 0
-        not_updated_rows = 0
-        matched_hsn = len(hsn_to_data)
-        
-        print(f"Unique HSN codes available for matching: {matched_hsn}")
-        
-        # Track which rows were updated for highlighting
-        updated_indices = []
-        
-        # Add 2024-25 column to main file if it doesn't exist
-        if price_2024_25_col not in main_df.columns:
-            main_df[price_2024_25_col] = None
-        
-        # Update HSN Desc and 2024-25 price in main file based on HSN Code matching
-        for idx, row in main_df.iterrows():
-            cleaned_hsn = row['_cleaned_hsn']
-            if cleaned_hsn and cleaned_hsn in hsn_to_data:
-                # Update HSN Desc from price file
-                main_df.at[idx, main_desc_col] = hsn_to_data[cleaned_hsn]['desc']
-                # Update 2024-25 price from price file
-                main_df.at[idx, price_2024_25_col] = hsn_to_data[cleaned_hsn]['price']
-                updated_rows += 1
-                updated_indices.append(idx)
-            else:
-                not_updated_rows += 1
-        
-        # Remove temporary cleaned HSN columns
-        main_df.drop(columns=['_cleaned_hsn'], inplace=True)
+            return False, f"HSN Desc column not found in main file. Available columns: {list(main_df.columns)}", None, None, None
+        
+        # The HSN lookup of the price list: unique cleaned HSN codes with their desc and price
+        report(0.6, 'Loading price list')
+        price_lookup, price_info = price_lists.load(app.config['PRICE_LIST_FOLDER'], price_list_id)
+        if price_lookup is None:
+            return False, "Price list not found, please upload the price file again", None, None, None
+        price_2024_25_col = price_info['price_column']
+        
+        # Create cleaned HSN code column for matching (case-insensitive)
+        report(0.7, 'Matching HSN codes')
+        with instrumentation.stage('hsn_join', rows_in=len(main_df)) as stage:
+            main_df['_cleaned_hsn'] = clean_hsn_code_vectorized(main_df[main_hsn_col])
+            
+            # Track statistics
+            matched_hsn = len(price_lookup)
+            
+            # Left-join every main row to the lookup; the keys are unique so row order and count are kept
+            merged = main_df[['_cleaned_hsn']].merge(price_lookup, on='_cleaned_hsn', how='left', indicator=True)
+            updated_mask = (merged['_merge'] == 'both').to_numpy()
+            updated_rows = int(updated_mask.sum())
+            not_updated_rows = len(main_df) - updated_rows
+            
+            # Update HSN Desc and 2024-25 price in main file based on HSN Code matching
+            current_price = main_df[price_2024_25_col] if price_2024_25_col in main_df.columns else None
+            main_df[main_desc_col] = np.where(updated_mask, merged['_new_desc'].to_numpy(dtype=object),
+                                              main_df[main_desc_col].to_numpy(dtype=object))
+            main_df[price_2024_25_col] = np.where(updated_mask, merged['_new_price'].to_numpy(dtype=object),
+                                                  None if current_price is None else current_price.to_numpy(dtype=object))
+            main_df[main_desc_col] = main_df[main_desc_col].infer_objects()
+            main_df[price_2024_25_col] = main_df[price_2024_25_col].infer_objects()
+            
+            # Remove temporary cleaned HSN columns
+            main_df.drop(columns=['_cleaned_hsn'], inplace=True)
+            stage['rows_out'] = updated_rows
         
         # Calculate QTY.MT column: Assess Val. / (2024-25 * 1000)
-        print("\n=== CALCULATING QTY.MT ===")
         if 'Assess Val.' in main_df.columns and price_2024_25_col in main_df.columns:
-            def calculate_qty_mt(row):
-                try:
-                    assess_val = row['Assess Val.']
-                    price = row[price_2024_25_col]
-                    
-                    if pd.notna(assess_val) and pd.notna(price) and float(price) != 0:
-                        # QTY.MT = Assess Val. / (Price * 1000)
-                        qty_mt = float(assess_val) / (float(price) * 1000)
-                        return qty_mt
-                    return None
-                except Exception as e:
-                    return None
-            
-            main_df['QTY.MT'] = main_df.apply(calculate_qty_mt, axis=1)
-            print(f"QTY.MT column added. Sample values: {main_df['QTY.MT'].head().tolist()}")
+            with instrumentation.stage('qty_mt', rows_in=len(main_df)) as stage:
+                assess_val = float_values_vectorized(main_df['Assess Val.'])
+                price = float_values_vectorized(main_df[price_2024_25_col])
+                
+                # QTY.MT = Assess Val. / (Price * 1000), left empty where either value is missing or the price is 0
+                valid = ~np.isnan(assess_val) & ~np.isnan(price) & (price != 0)
+                qty_mt = np.full(len(main_df), np.nan)
+                np.divide(assess_val, price * 1000, out=qty_mt, where=valid)
+                main_df['QTY.MT'] = qty_mt
+                stage['rows_out'] = int(valid.sum())
         else:
             print("WARNING: Could not calculate QTY.MT - missing Assess Val. or price column")
         
-        print("=== END QTY.MT CALCULATION ===\n")
-        
-        # Save to Excel with openpyxl for styling
-        main_df.to_excel(output_path, index=False)
-        
-        # Apply yellow highlighting to non-updated rows
-        wb = load_workbook(output_path)
-        ws = wb.active
-        
-        # Yellow fill for highlighting
-        yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-        
-        # Highlight rows that were NOT updated (skip header row)
-        for row_idx in range(2, len(main_df) + 2):  # Excel rows are 1-indexed, +1 for header
-            df_idx = row_idx - 2  # Convert to DataFrame index
-            if df_idx not in updated_indices:
-                # Highlight entire row
-                for cell in ws[row_idx]:
-                    cell.fill = yellow_fill
-        
-        wb.save(output_path)
-        
         stats = {
             'total_rows': len(main_df),
             'updated_rows': updated_rows,
@@ -789,67 +2459,69 @@ def process_data_cleaner(main_file_path, price_file_path, output_path):
             'matched_hsn': matched_hsn
         }
         
-        return True, "Files processed successfully!", stats
+        # Rows that were NOT updated are highlighted in yellow in the Excel download
+        # (timed as the 'highlight' stage when it is written)
+        highlight = ~updated_mask
+        with instrumentation.stage('excel_dtypes', rows_in=len(main_df)) as stage:
+            main_df = excel_io.excel_dtypes(main_df)
+            stage['rows_out'] = len(main_df)
+        return True, "Files processed successfully!", stats, main_df, highlight
         
     except Exception as e:
-        return False, f"Error processing files: {str(e)}", None
+        return False, f"Error processing files: {str(e)}", None, None, None
 
 @app.route('/data_cleaner')
 def data_cleaner():
     """Render the data cleaner upload page"""
-    return render_template('data_cleaner.html')
+    return render_template('data_cleaner.html',
+                           price_lists=price_lists.list_versions(app.config['PRICE_LIST_FOLDER']))
 
 @app.route('/data_cleaner/process', methods=['POST'])
 def data_cleaner_process():
-    """Process the two uploaded Excel files"""
-    if 'main_file' not in request.files or 'price_file' not in request.files:
+    """Process the uploaded main file against an uploaded or a saved price list"""
+    price_list_id = request.form.get('price_list_id', '')
+    if 'main_file' not in request.files or ('price_file' not in request.files and not price_list_id):
         flash('Both files are required')
         return redirect(url_for('data_cleaner'))
     
     main_file = request.files['main_file']
-    price_file = request.files['price_file']
+    price_file = request.files.get('price_file')
+    has_price_file = price_file is not None and price_file.filename != ''
     
-    if main_file.filename == '' or price_file.filename == '':
+    if main_file.filename == '' or (not has_price_file and not price_list_id):
         flash('Both files must be selected')
         return redirect(url_for('data_cleaner'))
     
-    if main_file and allowed_file(main_file.filename) and price_file and allowed_file(price_file.filename):
+    # A newly uploaded price file takes precedence over a saved price list
+    if not has_price_file and not price_lists.exists(app.config['PRICE_LIST_FOLDER'], price_list_id):
+        flash('Saved price list not found, please upload the price file again')
+        return redirect(url_for('data_cleaner'))
+    
+    if allowed_file(main_file.filename) and (not has_price_file or allowed_file(price_file.filename)):
         # Save uploaded files
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         main_filename = secure_filename(main_file.filename)
-        price_filename = secure_filename(price_file.filename)
-        
         main_input_filename = f"{timestamp}_main_{main_filename}"
-        price_input_filename = f"{timestamp}_price_{price_filename}"
-        
         main_path = os.path.join(app.config['UPLOAD_FOLDER'], main_input_filename)
-        price_path = os.path.join(app.config['UPLOAD_FOLDER'], price_input_filename)
-        
         main_file.save(main_path)
-        price_file.save(price_path)
-        
-        # Process the files
-        output_filename = f"cleaned_{timestamp}_{main_filename}"
-        output_path = os.path.join(app.config['PROCESSED_FOLDER'], output_filename)
         
-        success, message, stats = process_data_cleaner(main_path, price_path, output_path)
+        price_path = None
+        price_name = None
+        if has_price_file:
+            price_filename = secure_filename(price_file.filename)
+            price_input_filename = f"{timestamp}_price_{price_filename}"
+            price_path = os.path.join(app.config['UPLOAD_FOLDER'], price_input_filename)
+            price_file.save(price_path)
+            price_name = price_file.filename
         
-        if success:
-            # Update the session with the cleaned data
-            processed_data = pd.read_excel(output_path)
-            save_to_session(processed_data)
-            flash('Data cleaned successfully! The cleaned data is now loaded for analysis.')
-            
-            return render_template('data_cleaner_result.html',
-                                 output_filename=output_filename,
-                                 total_rows=stats['total_rows'],
-                                 updated_rows=stats['updated_rows'],
-                                 not_updated_rows=stats['not_updated_rows'],
-                                 matched_hsn=stats['matched_hsn'])
-        else:
-            flash(f"Error: {message}")
-            return redirect(url_for('data_cleaner'))
+        # Process the files in the background and show their progress
+        output_filename = f"cleaned_{timestamp}_{main_filename}"
+        session_id = current_session_id()
+        job_id = job_queue.submit('data_cleaner', session_id, data_cleaner_job,
+                                  session_id, main_path, price_path, output_filename,
+                                  price_list_id or None, price_name, profile=job_profile('data_cleaner'))
+        return redirect(url_for('job_status', job_id=job_id))
     else:
         flash('Invalid file type. Please upload Excel files (.xlsx or .xls)')
         return redirect(url_for('data_cleaner'))
@@ -858,11 +2530,11 @@ def data_cleaner_process():
 def data_cleaner_download(filename):
     """Download the processed cleaned file"""
     try:
-        file_path = os.path.join(app.config['PROCESSED_FOLDER'], filename)
-        if os.path.exists(file_path):
+        file_path = excel_export_path(filename)
+        if file_path:
             return send_file(file_path, as_attachment=True)
         else:
-            flash('File not found')
+            flash('File not found, it may have expired: please process the file again')
             return redirect(url_for('data_cleaner'))
     except Exception as e:
         flash(f'Error downloading file: {str(e)}')
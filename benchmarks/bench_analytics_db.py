@@ -0,0 +1,111 @@
+"""Compare the pandas and SQLite analytics backends on growing datasets.
+
+Usage:
+    python benchmarks/bench_analytics_db.py [max_rows]
+
+For each size the pandas backend builds the summary, the seller analysis and
+the seller index (what a web worker keeps in its caches per session), and the
+SQLite backend builds the analytics database from the same rows in chunks.
+Reported are the build time, the traced memory held afterwards (per session
+and worker for pandas, none for SQLite, whose file is cached by the operating
+system) and the time of one summary page and one comparison page.
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import analytics_db
+import app as refractor
+
+
+def build_frame(rows, sellers=300, buyers=5000, products=200, seed=0):
+    """Processed dataset with the columns the analytics views read"""
+    rng = np.random.default_rng(seed)
+    seller_labels = np.array([f"{i % 37:02d}PQRST{i:04d}K1Z2 / SELLER {i} PVT LTD" for i in range(sellers)],
+                             dtype=object)
+    buyer_names = np.array([f"BUYER {i} LTD" for i in range(buyers)], dtype=object)
+    buyer_pans = np.array([f"ABCDE{i:04d}F" for i in range(buyers)], dtype=object)
+    product_names = np.array([f"PRODUCT {i}" for i in range(products)], dtype=object)
+    buyer = rng.integers(0, buyers, size=rows)
+    days = pd.date_range('2024-04-01', periods=365).strftime('%d-%m-%Y').to_numpy(dtype=object)
+    return pd.DataFrame({
+        'From GSTIN & Name': seller_labels[rng.zipf(1.5, size=rows) % sellers],
+        'PAN': buyer_pans[buyer],
+        'NAME': buyer_names[buyer],
+        'HSN Desc.': product_names[rng.integers(0, products, size=rows)],
+        'Date': days[rng.integers(0, len(days), size=rows)],
+        'VALUE': np.round(rng.lognormal(12.5, 1.2, size=rows), 2),
+        'QTY.MT': rng.uniform(0.1, 50, size=rows),
+    })
+
+
+def traced(func, *args):
+    """(result, seconds, traced bytes still held after func) of func(*args)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, held
+
+
+def pandas_views(df):
+    summary_df = refractor.generate_summary(df)
+    summary = {'summary': summary_df, 'starts': refractor.summary_block_starts(summary_df)}
+    analysis = refractor.generate_seller_analysis(df)
+    analysis['seller_index'] = refractor.build_seller_index(analysis['processed_data'])
+    return summary, analysis
+
+
+def sqlite_build(df, path):
+    chunks = (refractor.analytics_rows(chunk) for chunk in refractor.frame_chunks(df))
+    analytics_db.build(path, 'bench', chunks)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    sizes = [size for size in (10000, 100000, 1000000) if size <= max_rows]
+    print(f"{'rows':>9} {'backend':>8} {'build s':>8} {'held MB':>8} {'summary s':>10} {'compare s':>10} "
+          f"{'file MB':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size in sizes:
+            df = build_frame(size)
+            seller1, seller2 = 'SELLER 1 PVT LTD', 'SELLER 2 PVT LTD'
+
+            (summary, analysis), seconds, held = traced(pandas_views, df)
+            summary_seconds = timed(refractor.summary_page, summary, 2, 50)
+            seller_index = analysis['seller_index']
+            compare_seconds = timed(refractor.build_comparison_view, seller_index,
+                                    seller_index['pan_by_name'].get(seller1),
+                                    seller_index['pan_by_name'].get(seller2), 2, 5)
+            print(f"{size:>9} {'pandas':>8} {seconds:>8.3f} {held / 1024 / 1024:>8.1f} {summary_seconds:>10.4f} "
+                  f"{compare_seconds:>10.4f} {'':>8}")
+            del summary, analysis, seller_index
+
+            path = os.path.join(folder, f"{size}.analytics.sqlite3")
+            _, seconds, held = traced(sqlite_build, df, path)
+            summary_seconds = timed(analytics_db.summary_page, path, 2, 50)
+            compare_seconds = timed(analytics_db.comparison, path, seller1, seller2, 2, 5)
+            print(f"{size:>9} {'sqlite':>8} {seconds:>8.3f} {held / 1024 / 1024:>8.1f} {summary_seconds:>10.4f} "
+                  f"{compare_seconds:>10.4f} {os.path.getsize(path) / 1024 / 1024:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
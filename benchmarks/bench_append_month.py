@@ -0,0 +1,84 @@
+"""Compare adding one month of data by appending with re-uploading every month.
+
+Usage:
+    python benchmarks/bench_append_month.py [months] [rows per month]     (default: 12 20000)
+
+Loads the first months as one upload, then times:
+    append     append_job with the next month's workbook
+    re-upload  upload_job with all months in one workbook
+    one month  upload_job with only the next month's workbook (the target cost)
+and the summary and seller analysis after the append, updated from the cached
+results and computed from scratch.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import excel_io
+from bench_excel_reader import build_upload_frame
+
+
+class NoProgress:
+    def progress(self, fraction, message):
+        pass
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # The pipeline prints debugging output
+        result = func(*args)
+    return result, round(time.perf_counter() - start, 2)
+
+
+def main():
+    months = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)  # app creates its upload/cache folders in the working directory
+        import app as excel_app
+
+        excel_app.app.config['CACHE_FOLDER'] = folder
+        frames = []
+        for month in range(months + 1):
+            df = build_upload_frame(rows, seed=month)
+            df['EWB No.'] += month * rows
+            frames.append(df)
+        loaded_path = os.path.join(folder, 'loaded.xlsx')
+        excel_io.write_excel(pd.concat(frames[:-1], ignore_index=True), loaded_path)
+        month_path = os.path.join(folder, 'next_month.xlsx')
+        excel_io.write_excel(frames[-1], month_path)
+        all_path = os.path.join(folder, 'all_months.xlsx')
+        excel_io.write_excel(pd.concat(frames, ignore_index=True), all_path)
+
+        results = {'months_loaded': months, 'rows_per_month': rows}
+        timed(excel_app.upload_job, NoProgress(), 'bench', loaded_path, 'loaded.xlsx', 'loaded.xlsx')
+        with excel_app.app.test_request_context():
+            excel_app.session['session_id'] = 'bench'
+            excel_app.session['has_data'] = True
+            timed(excel_app.load_summary)
+            timed(excel_app.load_seller_analysis)
+            _, results['append_seconds'] = timed(excel_app.append_job, NoProgress(), 'bench', month_path,
+                                                 'appended.xlsx', 'next_month.xlsx')
+            _, results['summary_incremental_seconds'] = timed(excel_app.load_summary)
+            _, results['seller_analysis_incremental_seconds'] = timed(excel_app.load_seller_analysis)
+            excel_app.invalidate_session_caches('bench')
+            _, results['summary_scratch_seconds'] = timed(excel_app.load_summary)
+            _, results['seller_analysis_scratch_seconds'] = timed(excel_app.load_seller_analysis)
+
+        _, results['reupload_seconds'] = timed(excel_app.upload_job, NoProgress(), 'bench', all_path,
+                                               'all.xlsx', 'all_months.xlsx')
+        _, results['one_month_upload_seconds'] = timed(excel_app.upload_job, NoProgress(), 'other', month_path,
+                                                       'month.xlsx', 'next_month.xlsx')
+        print(json.dumps(results), flush=True)
+
+
+if __name__ == '__main__':
+    main()
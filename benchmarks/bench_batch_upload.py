@@ -0,0 +1,66 @@
+"""Time a batch upload of several workbooks with different numbers of worker processes.
+
+Usage:
+    python benchmarks/bench_batch_upload.py [files] [rows per file] [workers ...]
+    (default: 8 files of 50000 rows, 1 worker and one per CPU)
+
+Runs batch_upload_job over synthetic e-way bill exports, one per "state", which
+share a tenth of their rows with the next file so the merge has duplicates to drop.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import excel_io
+from bench_excel_reader import build_upload_frame
+
+
+class NoProgress:
+    def progress(self, fraction, message):
+        pass
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    worker_counts = [int(arg) for arg in sys.argv[3:]] or sorted({1, os.cpu_count() or 1})
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)  # app creates its upload/cache folders in the working directory
+        import app as excel_app
+
+        excel_app.app.config['CACHE_FOLDER'] = folder
+        uploads = []
+        previous = None
+        for i in range(files):
+            df = build_upload_frame(rows, seed=i)
+            df['EWB No.'] += i * rows
+            if previous is not None:
+                df = pd.concat([previous.tail(rows // 10), df.iloc[rows // 10:]], ignore_index=True)
+            path = os.path.join(folder, f'state_{i}.xlsx')
+            excel_io.write_excel(df, path)
+            uploads.append((path, os.path.basename(path)))
+            previous = df
+        print(f"{files} workbooks of {rows} rows", flush=True)
+
+        for workers in worker_counts:
+            excel_app.app.config['BATCH_WORKERS'] = workers
+            start = time.perf_counter()
+            result = excel_app.batch_upload_job(NoProgress(), 'bench', uploads, f'batch_{workers}.xlsx')
+            elapsed = time.perf_counter() - start
+            print(json.dumps({
+                'workers': workers,
+                'files': files,
+                'rows': files * rows,
+                'seconds': round(elapsed, 2),
+                'message': result['message'],
+            }), flush=True)
+
+
+if __name__ == '__main__':
+    main()
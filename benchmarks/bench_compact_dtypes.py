@@ -0,0 +1,64 @@
+"""Compare the session dataset before and after compact_session_dataset.
+
+Usage:
+    python benchmarks/bench_compact_dtypes.py [rows]
+
+Reports in-memory size, file size, load time and the time of the summary and
+seller analysis groupbys for the dataset as processed and compacted.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excel_io
+import session_store
+from bench_session_cache import build_frame
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, round(time.perf_counter() - start, 3)
+
+
+def measure(excel_app, folder, label):
+    path = session_store.dataset_path(folder, 'bench', session_store.FEATHER)
+    df, load_seconds = timed(session_store.read_dataset, folder, 'bench')
+    # The seller analysis prints debugging output on every call
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, summary_seconds = timed(excel_app.generate_summary, df)
+        analysis, analysis_seconds = timed(excel_app.generate_seller_analysis, df)
+        _, index_seconds = timed(excel_app.build_seller_index, analysis['processed_data'])
+    print(json.dumps({
+        'dataset': label,
+        'rows': len(df),
+        'memory_mb': round(df.memory_usage(index=True, deep=True).sum() / 1024 / 1024, 1),
+        'file_mb': round(os.path.getsize(path) / 1024 / 1024, 1),
+        'load_seconds': load_seconds,
+        'summary_seconds': summary_seconds,
+        'seller_analysis_seconds': analysis_seconds,
+        'seller_index_seconds': index_seconds,
+    }), flush=True)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)  # app creates its upload/cache folders in the working directory
+        import app as excel_app
+
+        excel_app.app.config['CACHE_FOLDER'] = folder
+        session_store.write_dataset(folder, 'bench', excel_io.excel_dtypes(build_frame(rows)))
+        measure(excel_app, folder, 'processed')
+        excel_app.compact_session_dataset('bench')
+        measure(excel_app, folder, 'compacted')
+
+
+if __name__ == '__main__':
+    main()
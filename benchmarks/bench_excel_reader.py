@@ -0,0 +1,117 @@
+"""Compare ways of reading an uploaded e-way bill workbook.
+
+Usage:
+    python benchmarks/bench_excel_reader.py [rows ...]     (default: 100000 500000 1000000)
+
+Readers:
+    pandas           pd.read_excel(engine='openpyxl'), the previous upload path
+    openpyxl         excel_io.read_excel with openpyxl read-only streaming
+    calamine         excel_io.read_excel with python-calamine (if installed)
+    calamine-5cols   calamine, keeping only five of the twelve columns
+
+Each read runs in a fresh subprocess so the peak RSS numbers are independent.
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import excel_io
+from bench_excel_writer import current_rss_kb
+from bench_session_cache import peak_rss_kb
+
+PROJECTED_COLUMNS = ['EWB No.', 'From GSTIN & Name', 'To GSTIN & Name', 'Assess Val.', 'HSN Code']
+
+
+def build_upload_frame(rows, seed=0):
+    """Synthetic e-way bill export shaped like the files users upload"""
+    rng = random.Random(seed)
+    data = {name: [] for name in [
+        'EWB No.', 'EWB No. & Dt.', 'From GSTIN & Name', 'To GSTIN & Name', 'From Place & Pin',
+        'To Place & Pin', 'Doc No. & Dt.', 'Assess Val.', 'Tax Val.', 'HSN Code', 'HSN Desc.',
+        'Latest Vehicle No.']}
+    for i in range(rows):
+        seller = rng.randrange(500)
+        buyer = rng.randrange(5000)
+        product = rng.randrange(200)
+        day, month = rng.randint(1, 28), rng.randint(1, 12)
+        data['EWB No.'].append(331000000000 + i)
+        data['EWB No. & Dt.'].append(f"{331000000000 + i} - {day:02d}/{month:02d}/2024 17:41:00")
+        data['From GSTIN & Name'].append(f"{seller % 37:02d}PQRST{seller:04d}K1Z2 / SELLER {seller} PVT LTD")
+        data['To GSTIN & Name'].append(f"{buyer % 37:02d}ABCDE{buyer:04d}F1Z5 / BUYER {buyer} LTD")
+        data['From Place & Pin'].append(f"CITY {seller % 50} - {110000 + seller}")
+        data['To Place & Pin'].append(f"CITY {buyer % 50} - {400000 + buyer}")
+        data['Doc No. & Dt.'].append(f"INV/{i} - {day:02d}/{month:02d}/2024")
+        data['Assess Val.'].append(round(rng.uniform(1e4, 5e6), 2))
+        data['Tax Val.'].append(round(rng.uniform(1e3, 5e5), 2))
+        data['HSN Code'].append(39010000 + product)
+        data['HSN Desc.'].append(f"PRODUCT {product}")
+        data['Latest Vehicle No.'].append(f"MH12AB{rng.randrange(10000):04d}")
+    return pd.DataFrame(data)
+
+
+def read_pandas(path):
+    return pd.read_excel(path, engine='openpyxl')
+
+
+def read_openpyxl(path):
+    return excel_io.read_excel(path, engine=excel_io.OPENPYXL)
+
+
+def read_calamine(path):
+    return excel_io.read_excel(path, engine=excel_io.CALAMINE)
+
+
+def read_calamine_projected(path):
+    return excel_io.read_excel(path, columns=PROJECTED_COLUMNS, engine=excel_io.CALAMINE)
+
+
+READERS = {
+    'pandas': read_pandas,
+    'openpyxl': read_openpyxl,
+    'calamine': read_calamine,
+    'calamine-5cols': read_calamine_projected,
+}
+
+
+def read_once(path, reader):
+    """Read the workbook in this process and report time and RSS growth as JSON"""
+    baseline = current_rss_kb()
+    start = time.perf_counter()
+    df = READERS[reader](path)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    print(json.dumps({
+        'reader': reader,
+        'rows': len(df),
+        'columns': df.shape[1],
+        'read_seconds': round(elapsed, 2),
+        'peak_rss_delta_mb': round((peak - baseline) / 1024, 1),
+    }), flush=True)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 500000, 1000000]
+    readers = [name for name in READERS if not name.startswith('calamine')
+               or excel_io.CALAMINE in excel_io.reader_engines()]
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in sizes:
+            path = os.path.join(folder, f'upload_{rows}.xlsx')
+            excel_io.write_excel(build_upload_frame(rows), path)
+            print(f"{rows} rows: {os.path.getsize(path) / 1024 / 1024:.1f} MB workbook", flush=True)
+            for reader in readers:
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--read', path, reader], check=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--read':
+        read_once(sys.argv[2], sys.argv[3])
+    else:
+        main()
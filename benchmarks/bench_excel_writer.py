@@ -0,0 +1,101 @@
+"""Compare the data cleaner's old and new ways of writing the highlighted output sheet.
+
+Usage:
+    python benchmarks/bench_excel_writer.py [rows]
+
+"reload" is the old path: DataFrame.to_excel, then load_workbook to fill every
+cell of the non-updated rows, then save again. "streaming" is
+excel_io.write_excel, which fills the rows while writing in write-only mode.
+Each writer runs in a fresh subprocess so the peak RSS numbers are independent.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+import excel_io
+from bench_session_cache import build_frame, peak_rss_kb
+
+
+def current_rss_kb():
+    """Current resident set size in KB (falls back to the peak without /proc)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return peak_rss_kb()
+
+
+def write_reload(df, path, highlight):
+    df.to_excel(path, index=False)
+    wb = load_workbook(path)
+    ws = wb.active
+    for flagged, row in zip(highlight, ws.iter_rows(min_row=2, max_row=len(df) + 1)):
+        if flagged:
+            for cell in row:
+                cell.fill = excel_io.YELLOW_FILL
+    wb.save(path)
+
+
+def write_streaming(df, path, highlight):
+    excel_io.write_excel(df, path, highlight=highlight)
+
+
+WRITERS = {
+    'reload': write_reload,
+    'streaming': write_streaming,
+}
+
+
+def write_once(folder, writer):
+    """Write the dataset in this process and report time and RSS growth as JSON"""
+    df = pd.read_pickle(os.path.join(folder, 'frame.pkl'))
+    highlight = np.load(os.path.join(folder, 'highlight.npy'))
+    # Loading the frame may have set a higher peak than writing it, so measure
+    # the write's high-water mark against the memory in use right before it
+    baseline = current_rss_kb()
+    path = os.path.join(folder, f'{writer}.xlsx')
+    start = time.perf_counter()
+    WRITERS[writer](df, path, highlight)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    print(json.dumps({
+        'writer': writer,
+        'rows': len(df),
+        'write_seconds': round(elapsed, 2),
+        'peak_rss_delta_mb': round((peak - baseline) / 1024, 1),
+        'file_mb': round(os.path.getsize(path) / 1024 / 1024, 1),
+    }))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as folder:
+        df = build_frame(rows)
+        df['2024-25'] = 85.0
+        df['QTY.MT'] = df['VALUE'] / (df['2024-25'] * 1000)
+        df.to_pickle(os.path.join(folder, 'frame.pkl'))
+        # Roughly the share of rows without a price match in real uploads
+        np.save(os.path.join(folder, 'highlight.npy'), np.random.default_rng(0).random(rows) < 0.2)
+        del df
+
+        for writer in WRITERS:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--write', folder, writer], check=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--write':
+        write_once(sys.argv[2], sys.argv[3])
+    else:
+        main()
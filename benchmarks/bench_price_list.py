@@ -0,0 +1,78 @@
+"""Compare cleaning with a newly uploaded price file against a saved price list.
+
+Usage:
+    python benchmarks/bench_price_list.py [main rows] [price rows]     (default: 50000 20000)
+
+Times:
+    register  register_price_list on a new price file (parse, normalize, dedup)
+    reuse     register_price_list on the same file again (hash only)
+    cleaning  process_data_cleaner against the saved version
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import excel_io
+
+
+def build_price_frame(rows, seed=0):
+    """Price list with about 5% duplicated HSN codes"""
+    rng = np.random.default_rng(seed)
+    codes = np.arange(10000000, 10000000 + rows)
+    duplicated = rng.choice(rows, size=rows // 20, replace=False)
+    codes[duplicated] = codes[(duplicated + 1) % rows]
+    return pd.DataFrame({
+        'HSN Code': codes.astype(str),
+        'HSN Desc': [f"Item {code}" for code in codes],
+        '2024-25': rng.integers(20, 90, size=rows),
+    })
+
+
+def build_main_frame(rows, price_rows, seed=1):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'HSN Code': (10000000 + rng.integers(0, price_rows * 2, size=rows)).astype(str),
+        'HSN Desc.': 'unknown',
+        'Assess Val.': rng.integers(1000, 1000000, size=rows),
+    })
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # The pipeline prints debugging output
+        result = func(*args)
+    return result, round(time.perf_counter() - start, 3)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    price_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)  # app creates its upload/cache folders in the working directory
+        import app as excel_app
+
+        excel_app.app.config['PRICE_LIST_FOLDER'] = os.path.join(folder, 'price_lists')
+        price_path = os.path.join(folder, 'price.xlsx')
+        excel_io.write_excel(build_price_frame(price_rows), price_path)
+        main_path = os.path.join(folder, 'main.xlsx')
+        excel_io.write_excel(build_main_frame(rows, price_rows), main_path)
+
+        results = {'main_rows': rows, 'price_rows': price_rows}
+        info, results['register_seconds'] = timed(excel_app.register_price_list, price_path, 'price.xlsx')
+        _, results['reuse_seconds'] = timed(excel_app.register_price_list, price_path, 'price.xlsx')
+        result, results['cleaning_seconds'] = timed(excel_app.process_data_cleaner, main_path, info['id'])
+        results['updated_rows'] = result[2]['updated_rows']
+        print(json.dumps(results), flush=True)
+
+
+if __name__ == '__main__':
+    main()
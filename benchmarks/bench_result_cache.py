@@ -0,0 +1,57 @@
+"""Compare the first upload of an export with uploading the same file again.
+
+Usage:
+    python benchmarks/bench_result_cache.py [rows]     (default: 100000)
+
+The repeat is served from the result cache; "repeat after download" also
+restores the workbook the first download wrote.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excel_io
+from bench_excel_reader import build_upload_frame
+
+
+class NoProgress:
+    def progress(self, fraction, message):
+        pass
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # The pipeline prints debugging output
+        result = func(*args)
+    return result, round(time.perf_counter() - start, 3)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)  # app creates its upload/cache folders in the working directory
+        import app as excel_app
+
+        input_path = os.path.join(folder, 'export.xlsx')
+        excel_io.write_excel(build_upload_frame(rows), input_path)
+
+        results = {'rows': rows}
+        _, results['first_upload_seconds'] = timed(excel_app.upload_job, NoProgress(), 'first', input_path,
+                                                   'first.xlsx', 'export.xlsx')
+        _, results['repeat_seconds'] = timed(excel_app.upload_job, NoProgress(), 'second', input_path,
+                                             'second.xlsx', 'export.xlsx')
+        _, results['first_download_seconds'] = timed(excel_app.excel_export_path, 'first.xlsx')
+        _, results['repeat_after_download_seconds'] = timed(excel_app.upload_job, NoProgress(), 'third',
+                                                            input_path, 'third.xlsx', 'export.xlsx')
+        _, results['repeat_download_seconds'] = timed(excel_app.excel_export_path, 'third.xlsx')
+        print(json.dumps(results), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Time the /compare_sellers page as the compared sellers grow.
+
+Usage:
+    python benchmarks/bench_seller_comparison_render.py [max_rows_per_seller]
+
+For each size two sellers get that many rows spread over many buyers. The
+seller index is built once per dataset (as in the app) and is reported
+separately; the per-request cost (index lookup, page merge and template
+render) should stay flat as the sellers grow.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from flask import render_template
+
+import app as refractor
+
+
+def build_frame(rows_per_seller, seed=0):
+    """Processed dataset with two large sellers and a few small ones"""
+    rng = random.Random(seed)
+    sellers = [f"{i:02d}PQRST{i:04d}K1Z2 / SELLER {i} PVT LTD" for i in range(10)]
+    buyers = max(50, rows_per_seller // 20)
+    data = {'From GSTIN & Name': [], 'NAME': [], 'HSN Desc.': [], 'VALUE': [], 'QTY.MT': []}
+    for seller_idx, seller in enumerate(sellers):
+        rows = rows_per_seller if seller_idx < 2 else 100
+        for _ in range(rows):
+            data['From GSTIN & Name'].append(seller)
+            data['NAME'].append(f"BUYER {rng.randrange(buyers)} LTD")
+            data['HSN Desc.'].append(f"PRODUCT {rng.randrange(40)}")
+            data['VALUE'].append(float(rng.randint(1, 500) * 10000))
+            data['QTY.MT'].append(rng.uniform(0.1, 50))
+    return pd.DataFrame(data), 'SELLER 0 PVT LTD', 'SELLER 1 PVT LTD'
+
+
+def time_request(seller_index, seller1, seller2, page, per_page=5):
+    start = time.perf_counter()
+    seller1_pan = seller_index['pan_by_name'].get(seller1)
+    seller2_pan = seller_index['pan_by_name'].get(seller2)
+    buyers, total_pages = refractor.build_comparison_view(seller_index, seller1_pan, seller2_pan, page, per_page)
+    seller1_total, seller1_qty_total = seller_index['totals'].get(seller1_pan, (0, 0))
+    seller2_total, seller2_qty_total = seller_index['totals'].get(seller2_pan, (0, 0))
+    view_seconds = time.perf_counter() - start
+
+    with refractor.app.test_request_context('/compare_sellers'):
+        html = render_template('seller_comparison_result.html',
+                               seller1=seller1, seller2=seller2, buyers=buyers,
+                               seller1_total=seller1_total, seller2_total=seller2_total,
+                               seller1_qty_total=seller1_qty_total, seller2_qty_total=seller2_qty_total,
+                               current_page=page, total_pages=total_pages, per_page=per_page)
+    total_seconds = time.perf_counter() - start
+    return view_seconds, total_seconds, len(html), total_pages
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    sizes = [size for size in (1000, 10000, 100000, 1000000) if size <= max_rows]
+    print(f"{'rows/seller':>12} {'index build s':>14} {'view s':>8} {'request s':>10} {'html KB':>8} {'pages':>6}")
+    for size in sizes:
+        df, seller1, seller2 = build_frame(size)
+        start = time.perf_counter()
+        analysis = refractor.generate_seller_analysis(df)
+        seller_index = refractor.build_seller_index(analysis['processed_data'])
+        index_seconds = time.perf_counter() - start
+
+        time_request(seller_index, seller1, seller2, 1)  # warm up the template cache
+        view_seconds, total_seconds, html_size, pages = time_request(seller_index, seller1, seller2, 2)
+        print(f"{size:>12} {index_seconds:>14.3f} {view_seconds:>8.4f} {total_seconds:>10.4f} "
+              f"{html_size / 1024:>8.1f} {pages:>6}")
+
+
+if __name__ == '__main__':
+    main()
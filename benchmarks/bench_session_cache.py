@@ -0,0 +1,113 @@
+"""Compare load time and peak RSS of the pickle and Feather session cache formats.
+
+Usage:
+    python benchmarks/bench_session_cache.py [rows]
+
+Each load runs in a fresh subprocess so the peak RSS numbers are not polluted
+by the other format or by building the synthetic dataset.
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import session_store
+
+SUMMARY_COLUMNS = ['PAN', 'NAME', 'HSN Desc.', 'VALUE']
+
+
+def build_frame(rows, seed=0):
+    """Synthetic processed dataset shaped like the output of process_excel_file"""
+    rng = random.Random(seed)
+    # Strings are formatted per row (not shared objects) like cells read from Excel
+    data = {
+        'Serial No': [],
+        'From GSTIN & Name': [],
+        'GSTIN': [],
+        'PAN': [],
+        'NAME': [],
+        'Date': [],
+        'VALUE': [],
+        'HSN Code': [],
+        'HSN Desc.': [],
+    }
+    for i in range(rows):
+        buyer = rng.randrange(2000)
+        seller = rng.randrange(500)
+        product = rng.randrange(200)
+        data['Serial No'].append(100000 + i)
+        data['From GSTIN & Name'].append(f"{seller % 37:02d}PQRST{seller:04d}K1Z2 / SELLER {seller} PVT LTD")
+        data['GSTIN'].append(f"{buyer % 37:02d}ABCDE{buyer:04d}F1Z5")
+        data['PAN'].append(f"ABCDE{buyer:04d}F")
+        data['NAME'].append(f"BUYER {buyer} LTD")
+        data['Date'].append(f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2024")
+        data['VALUE'].append(float(rng.randint(1, 500) * 10000))
+        data['HSN Code'].append(39010000 + product)
+        data['HSN Desc.'].append(f"PRODUCT {product}")
+    return pd.DataFrame(data)
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB"""
+    # ru_maxrss survives exec on Linux (it would report the parent's peak), so
+    # prefer the per-process high-water mark from /proc when it is available
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def load_once(folder, fmt, projected):
+    """Load the dataset in this process and report time and RSS growth as JSON"""
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    columns = SUMMARY_COLUMNS if projected else None
+    # Only one format exists in each folder, so read_dataset picks the right file
+    df = session_store.read_dataset(os.path.join(folder, fmt), 'bench', columns=columns)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    print(json.dumps({
+        'format': fmt,
+        'columns': 'summary' if projected else 'all',
+        'rows': len(df),
+        'load_seconds': round(elapsed, 4),
+        'peak_rss_delta_mb': round((peak - baseline) / 1024, 1),
+    }))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    with tempfile.TemporaryDirectory() as folder:
+        df = build_frame(rows)
+        for fmt in (session_store.PICKLE, session_store.FEATHER):
+            os.makedirs(os.path.join(folder, fmt))
+            used = session_store.write_dataset(os.path.join(folder, fmt), 'bench', df, fmt=fmt)
+            size = os.path.getsize(session_store.dataset_path(os.path.join(folder, fmt), 'bench', used))
+            print(f"{fmt}: wrote {rows} rows as {used}, {size / 1024 / 1024:.1f} MB")
+        del df
+
+        for fmt in (session_store.PICKLE, session_store.FEATHER):
+            for projected in (False, True):
+                args = [sys.executable, os.path.abspath(__file__), '--load', folder, fmt]
+                if projected:
+                    args.append('--projected')
+                subprocess.run(args, check=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--load':
+        load_once(sys.argv[2], sys.argv[3], '--projected' in sys.argv)
+    else:
+        main()
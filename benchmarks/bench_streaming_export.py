@@ -0,0 +1,67 @@
+"""Compare writing an export to disk before sending it with streaming it.
+
+Usage:
+    python benchmarks/bench_streaming_export.py [rows]     (default: 200000)
+
+"to_excel" is the old summary download: DataFrame.to_excel into a file, sent
+once complete. "stream_xlsx" and "stream_csv" are the excel_io streaming
+writers behind /export/*; for them the time to the first bytes is what a user
+waits before the download starts.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import excel_io
+
+
+def build_summary_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'PAN': [f"PAN{i:07d}" for i in rng.integers(0, rows // 10, size=rows)],
+        'NAME': [f"BUYER {i} LTD" for i in rng.integers(0, rows // 10, size=rows)],
+        'HSN Desc.': [f"PRODUCT {i}" for i in rng.integers(0, 500, size=rows)],
+        'product_value': rng.uniform(1000, 1e7, size=rows).round(2),
+        'total_value': rng.uniform(1000, 1e8, size=rows).round(2),
+    })
+
+
+def time_stream(body):
+    start = time.perf_counter()
+    first = None
+    size = 0
+    for data in body:
+        if first is None and data:
+            first = time.perf_counter() - start
+        size += len(data)
+    return round(first, 3), round(time.perf_counter() - start, 2), size
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    df = build_summary_frame(rows)
+    chunks = lambda: (df.iloc[start:start + excel_io.CHUNK_ROWS] for start in range(0, len(df), excel_io.CHUNK_ROWS))
+    results = {'rows': rows}
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'summary.xlsx')
+        start = time.perf_counter()
+        df.to_excel(path, index=False)
+        results['to_excel_seconds'] = round(time.perf_counter() - start, 2)
+        results['to_excel_bytes'] = os.path.getsize(path)
+    for name, writer in (('stream_xlsx', excel_io.stream_xlsx), ('stream_csv', excel_io.stream_csv)):
+        first, total, size = time_stream(writer(list(df.columns), chunks()))
+        results[f'{name}_first_bytes_seconds'] = first
+        results[f'{name}_seconds'] = total
+        results[f'{name}_bytes'] = size
+    print(json.dumps(results), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Benchmark the processing pipeline end to end on synthetic data, with JSON results.
+
+Usage:
+    python benchmarks/bench_suite.py [--rows N ...] [--repeat N] [--output results.json]
+    python benchmarks/bench_suite.py --compare baseline.json results.json [--threshold 1.2]
+
+For each size an e-way bill export and a matching price list are generated
+(see synthetic.py) and written as workbooks, then timed:
+
+    process_excel_file       upload processing from the workbook
+    register_price_list      parsing a new price list into its HSN lookup
+    process_data_cleaner     the data cleaner on the processed workbook
+    generate_summary         the summary view of the cleaned data
+    generate_seller_analysis the seller analysis of the cleaned data
+    compare_sellers_cold     GET /compare_sellers with empty caches (load, analysis, index, render)
+    compare_sellers_warm     GET /compare_sellers again (index lookup and render only)
+
+Each benchmark runs --repeat times; the median, the fastest run and the stage
+breakdown of the fastest run (see instrumentation.py) are recorded. The
+results file also records the versions, machine and commit, so two runs can
+be compared with --compare, which exits with status 1 if a benchmark got
+slower than --threshold times its baseline.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+import excel_io
+import instrumentation
+import synthetic
+
+
+def environment():
+    """What the timings depend on besides the code"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'excel_readers': excel_io.reader_engines(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or None,
+        'cpus': os.cpu_count(),
+        'system': platform.system(),
+    }
+
+
+def timed_runs(name, rows, repeat, func, *args, setup=None):
+    """Run func repeat times and return (result of the last run, results entry)"""
+    runs = []
+    fastest = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with instrumentation.collect() as timings, contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(*args)
+            seconds = time.perf_counter() - start
+        runs.append(round(seconds, 4))
+        if fastest is None or seconds < fastest[0]:
+            fastest = (seconds, instrumentation.breakdown(timings))
+    return result, {
+        'benchmark': name,
+        'rows': rows,
+        'seconds': round(statistics.median(runs), 4),
+        'min_seconds': min(runs),
+        'runs': runs,
+        'stages': fastest[1],
+    }
+
+
+def largest_sellers(excel_app, df):
+    """Names of the two sellers with the most rows, as listed on the comparison page"""
+    _, names = excel_app.split_gstin_name_vectorized(df['From GSTIN & Name'])
+    return list(names.value_counts().index[:2])
+
+
+def run_size(excel_app, folder, rows, repeat, options):
+    """Results of every benchmark for one export size"""
+    results = []
+    start = time.perf_counter()
+    upload = synthetic.build_eway_bills(rows, sellers=options.sellers, buyers=options.buyers,
+                                        products=options.products, duplicate_rate=options.duplicate_rate,
+                                        seed=options.seed)
+    upload_path = os.path.join(folder, f'upload_{rows}.xlsx')
+    excel_io.write_excel(upload, upload_path)
+    price_path = os.path.join(folder, f'price_list_{rows}.xlsx')
+    excel_io.write_excel(synthetic.build_price_list(products=options.products, seed=options.seed), price_path)
+    print(f"{rows} rows: generated in {time.perf_counter() - start:.1f}s, "
+          f"{os.path.getsize(upload_path) / 1024 / 1024:.1f} MB workbook", file=sys.stderr, flush=True)
+
+    (success, message, processed), entry = timed_runs(
+        'process_excel_file', rows, repeat, excel_app.process_excel_file, upload_path)
+    if not success:
+        raise RuntimeError(message)
+    results.append(entry)
+
+    # The data cleaner runs on the processed workbook, as users upload it
+    main_path = os.path.join(folder, f'processed_{rows}.xlsx')
+    excel_io.write_excel(processed, main_path)
+    price_folder = os.path.join(folder, 'price_lists')
+
+    def forget_price_lists():
+        excel_app.app.config['PRICE_LIST_FOLDER'] = os.path.join(price_folder, uuid.uuid4().hex)
+
+    info, entry = timed_runs('register_price_list', rows, repeat, excel_app.register_price_list,
+                             price_path, 'price_list.xlsx', setup=forget_price_lists)
+    results.append(entry)
+    (success, message, _, cleaned, _), entry = timed_runs(
+        'process_data_cleaner', rows, repeat, excel_app.process_data_cleaner, main_path, info['id'])
+    if not success:
+        raise RuntimeError(message)
+    results.append(entry)
+
+    _, entry = timed_runs('generate_summary', rows, repeat, excel_app.generate_summary, cleaned)
+    results.append(entry)
+    _, entry = timed_runs('generate_seller_analysis', rows, repeat, excel_app.generate_seller_analysis, cleaned)
+    results.append(entry)
+
+    # /compare_sellers through the app, on a session holding the cleaned data
+    session_id = str(uuid.uuid4())
+    with contextlib.redirect_stdout(io.StringIO()):
+        excel_app.write_session_dataset(session_id, cleaned)
+        excel_app.compact_session_dataset(session_id)
+    client = excel_app.app.test_client()
+    with client.session_transaction() as session:
+        session['session_id'] = session_id
+        session['has_data'] = True
+    seller1, seller2 = largest_sellers(excel_app, cleaned)
+
+    def compare():
+        response = client.get('/compare_sellers', query_string={'seller1': seller1, 'seller2': seller2})
+        if response.status_code != 200:
+            raise RuntimeError(f"/compare_sellers returned {response.status_code}")
+        return len(response.data)
+
+    _, entry = timed_runs('compare_sellers_cold', rows, repeat, compare,
+                          setup=lambda: excel_app.invalidate_session_caches(session_id))
+    results.append(entry)
+    _, entry = timed_runs('compare_sellers_warm', rows, repeat, compare)
+    results.append(entry)
+    return results
+
+
+def run(options):
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)  # app creates its upload/cache folders in the working directory
+        import app as excel_app
+
+        results = []
+        for rows in options.rows:
+            size_results = run_size(excel_app, folder, rows, options.repeat, options)
+            results += size_results
+            for entry in size_results:
+                print(f"{entry['benchmark']:>26} {rows:>9} rows {entry['seconds']:>9.3f}s "
+                      f"(fastest {entry['min_seconds']:.3f}s)", file=sys.stderr, flush=True)
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': environment(),
+        'parameters': {name: value for name, value in vars(options).items()
+                       if name not in ('output', 'compare', 'threshold')},
+        'results': results,
+    }
+
+
+def compare(baseline_path, results_path, threshold):
+    """Print the change of every benchmark in both files; returns the number of regressions"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(results_path) as f:
+        current = json.load(f)
+    before = {(entry['benchmark'], entry['rows']): entry for entry in baseline['results']}
+    print(f"baseline {baseline['environment'].get('commit')}, current {current['environment'].get('commit')}")
+    print(f"{'benchmark':>26} {'rows':>9} {'baseline s':>11} {'current s':>10} {'ratio':>7}")
+    regressions = 0
+    for entry in current['results']:
+        old = before.get((entry['benchmark'], entry['rows']))
+        if old is None:
+            continue
+        ratio = entry['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+        slower = ratio > threshold
+        regressions += slower
+        print(f"{entry['benchmark']:>26} {entry['rows']:>9} {old['seconds']:>11.3f} {entry['seconds']:>10.3f} "
+              f"{ratio:>6.2f}x{'  SLOWER' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the processing pipeline on synthetic data')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help='export sizes to run')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark')
+    parser.add_argument('--sellers', type=int, default=500)
+    parser.add_argument('--buyers', type=int, default=5000)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--duplicate-rate', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this file instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'RESULTS'), help='compare two results files')
+    parser.add_argument('--threshold', type=float, default=1.2, help='ratio above which --compare fails')
+    options = parser.parse_args()
+
+    if options.compare:
+        sys.exit(1 if compare(*options.compare, options.threshold) else 0)
+
+    output = os.path.abspath(options.output) if options.output else None
+    results = run(options)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
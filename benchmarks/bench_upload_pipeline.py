@@ -0,0 +1,74 @@
+"""Compare peak memory of processing an upload in one piece and in chunks.
+
+Usage:
+    python benchmarks/bench_upload_pipeline.py [rows ...]     (default: 100000 250000 500000)
+
+Modes:
+    whole              process_excel_file, then write the session dataset
+    chunked            process_excel_file_chunked (openpyxl streaming reader)
+    chunked-calamine   process_excel_file_chunked reading with calamine (if installed)
+
+Each run happens in a fresh subprocess so the peak RSS numbers are independent.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excel_io
+from bench_excel_reader import build_upload_frame
+from bench_excel_writer import current_rss_kb
+from bench_session_cache import peak_rss_kb
+
+MODES = ['whole', 'chunked', 'chunked-calamine']
+
+
+def run_once(path, rows, mode):
+    """Process the workbook in this process and report time and RSS growth as JSON"""
+    folder = os.path.dirname(path)
+    os.chdir(folder)  # app creates its upload/cache folders in the working directory
+    import app as excel_app
+
+    excel_app.app.config['CACHE_FOLDER'] = folder
+    if mode == 'chunked-calamine':
+        excel_app.app.config['CHUNKED_EXCEL_READER'] = excel_io.CALAMINE
+    baseline = current_rss_kb()
+    start = time.perf_counter()
+    if mode == 'whole':
+        success, message, df = excel_app.process_excel_file(path)
+        excel_app.write_session_dataset('bench', df)
+    else:
+        success, message = excel_app.process_excel_file_chunked(path, 'bench')
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    assert success, message
+    print(json.dumps({
+        'mode': mode,
+        'rows': rows,
+        'seconds': round(elapsed, 2),
+        'peak_rss_delta_mb': round((peak - baseline) / 1024, 1),
+    }), flush=True)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 250000, 500000]
+    modes = [mode for mode in MODES if mode != 'chunked-calamine'
+             or excel_io.CALAMINE in excel_io.reader_engines()]
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in sizes:
+            path = os.path.join(folder, f'upload_{rows}.xlsx')
+            excel_io.write_excel(build_upload_frame(rows), path)
+            print(f"{rows} rows: {os.path.getsize(path) / 1024 / 1024:.1f} MB workbook", flush=True)
+            for mode in modes:
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--run', path, str(rows), mode], check=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run_once(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    else:
+        main()
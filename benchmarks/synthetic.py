@@ -0,0 +1,177 @@
+"""Synthetic e-way bill exports and price lists for the benchmarks.
+
+Usage:
+    python benchmarks/synthetic.py rows upload.xlsx [price_list.xlsx]
+
+build_eway_bills() produces the columns of an e-way bill export ('EWB No. &
+Dt.', 'From GSTIN & Name', 'To GSTIN & Name', 'Assess Val.', 'HSN Code', ...)
+with the features the pipeline cares about: a few large sellers and a long
+tail of small ones, sellers registered in several states under one PAN with
+differently spelled names, branch transfers (buyer PAN equal to the seller's),
+and exact duplicate rows as in overlapping exports. build_price_list() makes
+a matching price list with duplicated and missing HSN codes. Everything is
+generated with numpy from a seed, so the same arguments give the same data.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import excel_io
+
+CHAPTERS = {
+    72: 'IRON AND STEEL', 73: 'ARTICLES OF IRON OR STEEL', 39: 'PLASTICS', 40: 'RUBBER',
+    76: 'ALUMINIUM', 27: 'MINERAL FUELS', 28: 'INORGANIC CHEMICALS', 29: 'ORGANIC CHEMICALS',
+}
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+SUFFIXES = [('PVT LTD', 'PRIVATE LIMITED'), ('LTD', 'LIMITED'), ('LLP', 'LLP'), ('& CO', 'AND COMPANY')]
+
+
+def product_codes(products):
+    """HSN codes and price list descriptions of the products, spread over a few chapters"""
+    chapters = list(CHAPTERS)
+    codes = [chapters[i % len(chapters)] * 1000000 + 1000 + i for i in range(products)]
+    descriptions = [f"{CHAPTERS[code // 1000000]} GRADE {i}" for i, code in enumerate(codes)]
+    return np.array(codes, dtype='int64'), np.array(descriptions, dtype=object)
+
+
+def _pan(index, kind):
+    """A well-formed PAN (5 letters, 4 digits, 1 letter), unique for (index, kind) below 26 ** 3"""
+    letters = ''.join(LETTERS[(index // 26 ** power) % 26] for power in (2, 1, 0))
+    return f"{letters}{kind}{LETTERS[index % 23]}{index % 10000:04d}{LETTERS[(index * 7) % 26]}"
+
+
+def _gstin(state, pan, branch):
+    return f"{state:02d}{pan}{branch + 1}Z{LETTERS[(state + branch) % 26]}"
+
+
+def _parties(count, kind, label, rng, first=0):
+    """(gstin & name, place) of every registration of count companies, with the company of each
+
+    A company has one to three registrations in different states; the name of
+    the later ones is spelled differently, as it is in real exports. PANs are
+    numbered from first, so parties built with different first do not share one.
+    """
+    labels, places, owners = [], [], []
+    registrations = rng.choice([1, 2, 3], size=count, p=[0.7, 0.2, 0.1])
+    states = rng.integers(1, 37, size=count)
+    for company in range(count):
+        pan = _pan(first + company, kind)
+        short, long = SUFFIXES[company % len(SUFFIXES)]
+        for branch in range(registrations[company]):
+            state = (states[company] + branch * 7) % 37 + 1
+            name = f"{label} {company} {short if branch == 0 else long}"
+            labels.append(f"{_gstin(state, pan, branch)} / {name}")
+            places.append(f"CITY {state}-{company % 50} - {110000 + state * 1000 + company % 1000}")
+            owners.append(company)
+    return np.array(labels, dtype=object), np.array(places, dtype=object), np.array(owners)
+
+
+def _zipf_weights(count, skew):
+    weights = 1.0 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+
+def build_eway_bills(rows, sellers=500, buyers=5000, products=200, duplicate_rate=0.02,
+                     self_rate=0.01, skew=1.1, seed=0):
+    """Synthetic e-way bill export with rows rows
+
+    duplicate_rate is the fraction of rows that repeat an earlier row exactly,
+    self_rate the fraction of branch transfers (dropped by the pipeline), and
+    skew how strongly rows concentrate on the first sellers, buyers and
+    products (0 for uniform).
+    """
+    rng = np.random.default_rng(seed)
+    seller_labels, seller_places, seller_owner = _parties(sellers, 'C', 'SELLER', rng)
+    buyer_labels, buyer_places, _ = _parties(buyers, 'C', 'BUYER', rng, first=sellers)
+    codes, _ = product_codes(products)
+    export_descriptions = np.array([f"{CHAPTERS[code // 1000000].title()} {i}" for i, code in enumerate(codes)],
+                                   dtype=object)
+
+    # Choose a company by popularity, then one of its registrations
+    seller_company = rng.choice(sellers, size=rows, p=_zipf_weights(sellers, skew))
+    first_registration = np.searchsorted(seller_owner, seller_company)
+    registration_count = np.bincount(seller_owner, minlength=sellers)[seller_company]
+    seller = first_registration + rng.integers(0, 1 << 30, size=rows) % registration_count
+    buyer = rng.choice(len(buyer_labels), size=rows, p=_zipf_weights(len(buyer_labels), skew * 0.7))
+    product = rng.choice(products, size=rows, p=_zipf_weights(products, skew * 0.8))
+
+    to_labels = buyer_labels[buyer]
+    to_places = buyer_places[buyer]
+    # Branch transfers: the buyer is another registration of the seller's own PAN
+    transfers = rng.random(rows) < self_rate
+    to_labels[transfers] = seller_labels[(first_registration + registration_count - 1)[transfers]]
+    to_places[transfers] = seller_places[(first_registration + registration_count - 1)[transfers]]
+
+    # A financial year of bills, generated during working hours; the text of the
+    # few distinct days and seconds is formatted once and looked up per row
+    days = pd.date_range('2024-04-01', periods=365).strftime('%d/%m/%Y').to_numpy(dtype=object)
+    seconds = np.array([f"{8 + s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(12 * 3600)],
+                       dtype=object)
+    day_text = pd.Series(days[rng.integers(0, len(days), size=rows)])
+    time_text = pd.Series(seconds[rng.integers(0, len(seconds), size=rows)])
+    bill_numbers = 331000000000 + np.arange(rows, dtype='int64')
+    assess_values = np.round(rng.lognormal(12.5, 1.2, size=rows), 2)
+
+    bill_text = pd.Series(bill_numbers).astype(str)
+    frame = pd.DataFrame({
+        'EWB No.': bill_numbers,
+        'EWB No. & Dt.': bill_text + ' - ' + day_text + ' ' + time_text,
+        'From GSTIN & Name': seller_labels[seller],
+        'To GSTIN & Name': to_labels,
+        'From Place & Pin': seller_places[seller],
+        'To Place & Pin': to_places,
+        'Doc No. & Dt.': 'INV/' + bill_text + ' - ' + day_text,
+        'Assess Val.': assess_values,
+        'Tax Val.': np.round(assess_values * 0.18, 2),
+        'HSN Code': codes[product],
+        'HSN Desc.': export_descriptions[product],
+        'Latest Vehicle No.': 'MH12AB' + pd.Series(rng.integers(0, 10000, size=rows)).astype(str).str.zfill(4),
+    })
+
+    # Overlapping exports repeat whole rows
+    duplicates = int(rows * duplicate_rate)
+    if duplicates:
+        targets = rng.choice(rows, size=duplicates, replace=False)
+        sources = rng.integers(0, rows, size=duplicates)
+        frame.iloc[targets] = frame.iloc[sources].to_numpy()
+        frame = frame.infer_objects()
+    return frame
+
+
+def build_price_list(products=200, coverage=0.9, duplicate_rate=0.02, extra_codes=1000, seed=0):
+    """Price list for the products of build_eway_bills
+
+    coverage is the fraction of the products that have a price (the rest are
+    highlighted by the data cleaner), duplicate_rate the fraction of those
+    listed twice with different prices (ignored by the data cleaner), and
+    extra_codes the number of codes that do not occur in the exports.
+    """
+    rng = np.random.default_rng(seed + 1)
+    codes, descriptions = product_codes(products + extra_codes)
+    listed = np.concatenate([rng.permutation(products)[:int(products * coverage)],
+                             np.arange(products, products + extra_codes)])
+    repeated = rng.choice(listed[listed < products], size=int(products * coverage * duplicate_rate), replace=False)
+    entries = rng.permutation(np.concatenate([listed, repeated]))
+    return pd.DataFrame({
+        'HSN Code': codes[entries].astype(str),
+        'HSN Desc': descriptions[entries],
+        '2024-25': rng.integers(20, 200, size=len(entries)),
+    })
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    rows = int(sys.argv[1])
+    excel_io.write_excel(build_eway_bills(rows), sys.argv[2])
+    if len(sys.argv) > 3:
+        excel_io.write_excel(build_price_list(), sys.argv[3])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,593 @@
+"""Excel input and output for large sheets.
+
+Reading goes through a pluggable engine: calamine (a Rust xlsx parser) when
+python-calamine is installed, else openpyxl in read-only mode with plain cell
+values. Both stream rows, can keep only the requested columns, and produce the
+same frame pd.read_excel would.
+
+openpyxl's write-only mode streams rows straight into the xlsx file instead of
+building a cell object for every value, so memory stays bounded by the chunk
+size rather than the sheet size. Row highlighting is applied while writing,
+which avoids reopening the saved workbook to style it.
+
+Downloads that are produced on request are streamed instead: stream_xlsx and
+stream_csv yield the bytes of the file while its rows are still being made.
+"""
+import io
+import re
+import time
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape, quoteattr
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ERROR_CODES, ILLEGAL_CHARACTERS_RE
+from openpyxl.reader.workbook import WorkbookParser
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+import instrumentation
+
+try:
+    import python_calamine
+except ImportError:  # calamine is optional, openpyxl always works
+    python_calamine = None
+
+CALAMINE = 'calamine'
+OPENPYXL = 'openpyxl'
+
+# Rows converted to Python values at a time
+CHUNK_ROWS = 10000
+
+YELLOW_FILL = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+
+# <dimension ref="A1:L5251"/> near the start of a sheet; group 1 is its last row
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension ref="[A-Z]+[0-9]+(?::[A-Z]+([0-9]+))?"')
+
+# Text read_excel parses as a missing value: the default na_values of the read_excel docs
+_DEFAULT_NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+# Error cells such as #DIV/0! are missing too
+_NA_STRINGS = list(_DEFAULT_NA_VALUES | set(ERROR_CODES))
+
+# Same header look as DataFrame.to_excel
+_THIN = Side(style='thin')
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(top=_THIN, right=_THIN, bottom=_THIN, left=_THIN)
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+
+def _header_cells(ws, columns):
+    cells = []
+    for col in columns:
+        cell = WriteOnlyCell(ws, value=str(col))
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+        cells.append(cell)
+    return cells
+
+
+def _column_values(series):
+    """Values of a column as plain Python objects, missing values as empty cells"""
+    values = series.astype(object).where(series.notna(), None)
+    if pd.api.types.is_float_dtype(series.dtype):
+        # to_excel writes infinities as text
+        values = values.where(~np.isposinf(series), 'inf').where(~np.isneginf(series), '-inf')
+    return values.tolist()
+
+
+def _whole_float_to_int(value):
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def _infer_column(series, numeric_text=True):
+    """One column of cell values with the type pd.read_excel infers for it
+
+    With numeric_text=False text that looks like a number stays text; chunked
+    reads decide that once all chunks are known (see ChunkDtypes).
+    """
+    if pd.api.types.is_object_dtype(series.dtype):
+        # read_excel treats text such as 'NA' or 'null' as missing, like read_csv
+        series = series.where(series.notna() & ~series.isin(_NA_STRINGS), np.nan)
+        inferred = pd.api.types.infer_dtype(series, skipna=True)
+        if inferred == 'empty':
+            return series.astype('float64')  # Only empty cells
+        if inferred == 'boolean' and series.notna().all():
+            return series.astype(bool)
+        if inferred in ('datetime', 'datetime64', 'date'):
+            return pd.to_datetime(series)
+        if inferred in ('integer', 'floating', 'mixed-integer-float'):
+            series = series.astype('float64')
+        else:
+            # Text that looks like a number is read as a number, but only if
+            # every value in the column is numeric
+            if numeric_text:
+                try:
+                    return pd.to_numeric(series)
+                except (ValueError, TypeError):
+                    pass
+            if inferred != 'string':
+                # Whole-number cells are read as int, also in columns mixed with text
+                return series.map(_whole_float_to_int)
+            return series
+
+    if pd.api.types.is_float_dtype(series.dtype):
+        values = series.to_numpy()
+        # Whole-number cells are read as int, so a column of them without gaps becomes int64
+        if (len(values) and np.isfinite(values).all() and (np.abs(values) < 2 ** 63).all()
+                and (values == np.floor(values)).all()):
+            return series.astype('int64')
+    return series
+
+
+def excel_dtypes(df, numeric_text=True):
+    """Return df with the column types it would have after write_excel and pd.read_excel
+
+    Processed data used to reach the session by reading the output workbook back,
+    which turned whole-number floats into ints and None into NaN. Applying the same
+    rules in memory keeps the session dataset identical without parsing the file.
+    """
+    result = df.copy(deep=False)
+    for i in range(df.shape[1]):
+        result.isetitem(i, _infer_column(df.iloc[:, i], numeric_text=numeric_text))
+    return result
+
+
+def _chunk_kind(series):
+    """Type of one chunk's column, as far as ChunkDtypes needs to know it"""
+    if series.isna().all():
+        return 'empty'
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return 'int'
+    if pd.api.types.is_float_dtype(series.dtype):
+        return 'float'
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return 'datetime'
+    try:
+        numbers = pd.to_numeric(series)
+    except (ValueError, TypeError):
+        return 'object'
+    # Numeric text, left as text by excel_dtypes(numeric_text=False)
+    return 'text-int' if pd.api.types.is_integer_dtype(numbers.dtype) else 'text-float'
+
+
+class ChunkDtypes:
+    """Gives frames inferred chunk by chunk the column types of the whole sheet
+
+    A column can be int64 in one chunk and float64 in the next (which has a gap),
+    or numeric text in one and ordinary text in another. observe() every chunk
+    (inferred with numeric_text=False) first, then apply() brings each chunk to
+    the types excel_dtypes would have given the concatenated frame, with the
+    columns of all chunks in order of appearance.
+    """
+
+    def __init__(self):
+        self.columns = []
+        self._kinds = {}  # column -> set of chunk kinds
+        self._chunks = 0
+        self._final = {}
+
+    def observe(self, df):
+        for col in self.columns:
+            if col not in df.columns:
+                self._kinds[col].add('empty')
+        for col in df.columns:
+            if col not in self._kinds:
+                # A column that only starts in this chunk was empty in the earlier ones
+                self.columns.append(col)
+                self._kinds[col] = {'empty'} if self._chunks else set()
+            if 'object' not in self._kinds[col]:  # Once it holds text, nothing changes the result
+                self._kinds[col].add(_chunk_kind(df[col]))
+        self._chunks += 1
+        self._final = {}
+
+    def update(self, other):
+        """Add the chunks observed by another ChunkDtypes, as if they came after these"""
+        if not other._chunks:
+            return
+        for col in self.columns:
+            if col not in other._kinds:
+                self._kinds[col].add('empty')
+        for col in other.columns:
+            if col not in self._kinds:
+                self.columns.append(col)
+                self._kinds[col] = {'empty'} if self._chunks else set()
+            self._kinds[col] |= other._kinds[col]
+        self._chunks += other._chunks
+        self._final = {}
+
+    def kinds(self):
+        """{column: type of the whole sheet} for the chunks observed so far"""
+        return {col: self._final_kind(col) for col in self.columns}
+
+    def _final_kind(self, col):
+        if col not in self._final:
+            kinds = self._kinds[col] - {'empty'}
+            gaps = 'empty' in self._kinds[col]
+            if not kinds:
+                final = 'float'
+            elif kinds <= {'int', 'text-int'} and not gaps:
+                final = 'int'
+            elif kinds <= {'int', 'float', 'text-int', 'text-float'}:
+                final = 'float'
+            elif kinds == {'datetime'}:
+                final = 'datetime'
+            elif kinds == {'bool'} and not gaps:
+                final = 'bool'
+            else:
+                final = 'object'
+            self._final[col] = final
+        return self._final[col]
+
+    def apply(self, df):
+        """Return the chunk with every observed column, typed like the whole sheet"""
+        result = df.reindex(columns=self.columns)
+        for i, col in enumerate(self.columns):
+            series = result.iloc[:, i]
+            final = self._final_kind(col)
+            if final in ('int', 'float'):
+                series = pd.to_numeric(series).astype('int64' if final == 'int' else 'float64')
+            elif final == 'datetime':
+                series = pd.to_datetime(series)
+            elif final == 'bool':
+                series = series.astype(bool)
+            elif not pd.api.types.is_object_dtype(series.dtype):
+                values = series.astype(object).where(series.notna(), np.nan)
+                if pd.api.types.is_float_dtype(series.dtype):
+                    # map() would turn a chunk without values back into float64
+                    values = values.map(_whole_float_to_int).astype(object)
+                series = values
+            result.isetitem(i, series)
+        return result
+
+
+def write_excel(df, path, highlight=None, fill=YELLOW_FILL, sheet_name='Sheet1'):
+    """Write a DataFrame (without its index) to an xlsx file in one streaming pass
+
+    highlight is an optional boolean sequence aligned with the rows of df; every
+    cell of the rows where it is True gets the given fill. The time spent on
+    those rows is recorded as the 'highlight' stage.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append(_header_cells(ws, df.columns))
+
+    if highlight is not None:
+        highlight = np.asarray(highlight, dtype=bool)
+    highlight_seconds = 0.0
+
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+        columns = [_column_values(chunk.iloc[:, i]) for i in range(chunk.shape[1])]
+        flags = highlight[start:start + CHUNK_ROWS] if highlight is not None else None
+        for pos, row in enumerate(zip(*columns)):
+            if flags is not None and flags[pos]:
+                row_start = time.perf_counter()
+                cells = []
+                for value in row:
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.fill = fill
+                    cells.append(cell)
+                ws.append(cells)
+                highlight_seconds += time.perf_counter() - row_start
+            else:
+                ws.append(row)
+
+    if highlight is not None:
+        # Part of the caller's write time: the highlighted rows are written among the others
+        instrumentation.record_stage('highlight', highlight_seconds, rows_in=len(df), rows_out=int(highlight.sum()))
+    wb.save(path)
+
+
+_SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# The parts of a one-sheet workbook around the sheet itself; style 1 is the header look
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_RELATIONSHIP_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_RELATIONSHIP_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_RELATIONSHIP_NS}/styles" Target="styles.xml"/>'
+        '</Relationships>'),
+    'xl/styles.xml': (
+        f'<styleSheet xmlns="{_SPREADSHEET_NS}">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border>'
+        '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/>'
+        '</border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" '
+        'applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'),
+}
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable file that collects what zipfile writes until it is drained"""
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _cell_xml(ref, value, style=''):
+    """<c> element of one cell; empty for a missing value"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{style}><v>{value!r}</v></c>'
+    if isinstance(value, datetime) and value == datetime.combine(value.date(), datetime.min.time()):
+        value = value.date()  # Dates without a time of day, as to_csv writes them
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    text = escape(ILLEGAL_CHARACTERS_RE.sub('', str(value)))
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def stream_xlsx(columns, chunks, sheet_name='Sheet1'):
+    """Yield the bytes of an xlsx file with the given header while its rows are produced
+
+    chunks yields DataFrames with these columns. Each one is compressed into the
+    sheet as it arrives and its bytes are yielded right away, so a download can
+    start before the last chunk exists and only one chunk is in memory. Text is
+    stored in the cells (inline strings) since a streaming writer cannot build
+    the shared string table ahead of the sheet.
+    """
+    letters = [get_column_letter(i + 1) for i in range(len(columns))]
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in _XLSX_PARTS.items():
+            archive.writestr(name, _XML_DECLARATION + xml)
+        archive.writestr('xl/workbook.xml', (
+            f'{_XML_DECLARATION}<workbook xmlns="{_SPREADSHEET_NS}" xmlns:r="{_RELATIONSHIP_NS}"><sheets>'
+            f'<sheet name={quoteattr(sheet_name)} sheetId="1" r:id="rId1"/></sheets></workbook>'))
+        yield stream.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            header = ''.join(_cell_xml(f'{letter}1', str(col), ' s="1"') for letter, col in zip(letters, columns))
+            sheet.write(f'{_XML_DECLARATION}<worksheet xmlns="{_SPREADSHEET_NS}"><sheetData>'
+                        f'<row r="1">{header}</row>'.encode())
+            row_number = 1
+            for chunk in chunks:
+                values = [_column_values(chunk.iloc[:, i]) for i in range(chunk.shape[1])]
+                rows = []
+                for row in zip(*values):
+                    row_number += 1
+                    cells = ''.join(_cell_xml(f'{letter}{row_number}', value) for letter, value in zip(letters, row))
+                    rows.append(f'<row r="{row_number}">{cells}</row>')
+                sheet.write(''.join(rows).encode())
+                yield stream.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield stream.drain()
+
+
+def stream_csv(columns, chunks):
+    """Yield the bytes of a CSV file with the given header while its rows are produced
+
+    chunks yields DataFrames with these columns. The file starts with a UTF-8
+    byte order mark so Excel opens non-ASCII text correctly.
+    """
+    yield pd.DataFrame(columns=columns).to_csv(index=False).encode('utf-8-sig')
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=False).encode('utf-8')
+
+
+def reader_engines():
+    """Names of the reader engines that can be used here, fastest first"""
+    return ([CALAMINE] if python_calamine is not None else []) + [OPENPYXL]
+
+
+def _calamine_rows(path):
+    sheet = python_calamine.CalamineWorkbook.from_path(path).get_sheet_by_index(0)
+    # Rows are converted to Python lazily. They start at the first used column,
+    # so pad them to keep cell positions the same as in the sheet
+    lead = ('',) * sheet.start[1] if sheet.start else ()
+    for row in sheet.iter_rows():
+        yield lead + tuple(row) if lead else row
+
+
+def _openpyxl_rows(path):
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        # The stored sheet dimensions can be wrong; let openpyxl find the real extent
+        sheet.reset_dimensions()
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+_ROW_READERS = {
+    CALAMINE: _calamine_rows,
+    OPENPYXL: _openpyxl_rows,
+}
+
+
+def _is_empty(value):
+    return value is None or value == ''
+
+
+def _used_width(row):
+    """Length of a row without its trailing empty cells"""
+    width = len(row)
+    while width and _is_empty(row[width - 1]):
+        width -= 1
+    return width
+
+
+def _column_names(header, width):
+    """read_excel column names: 'Unnamed: i' for empty header cells, '.1', '.2' ... for repeats"""
+    names = []
+    seen = {}
+    for i in range(width):
+        name = header[i] if i < len(header) and not _is_empty(header[i]) else f"Unnamed: {i}"
+        if isinstance(name, float) and name.is_integer():
+            name = int(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+            while name in seen:  # A mangled name that already exists as a header
+                name = f"{name}.1"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def _data_rows(rows):
+    """Rows up to the last one with data; read_excel drops trailing empty rows"""
+    empty = 0
+    for row in rows:
+        # any() stops at the first filled cell, which is nearly always the first one
+        if any(not _is_empty(value) for value in row):
+            for _ in range(empty):
+                yield ()
+            empty = 0
+            yield row
+        else:
+            empty += 1
+
+
+def _frame(records, names, numeric_text=True):
+    """DataFrame of rows of cell values (each as long as names), with read_excel's column types"""
+    width = len(names)
+    records = [row if len(row) == width else tuple(row[:width]) + (None,) * (width - len(row))
+               for row in records]
+    frame = pd.DataFrame(records, columns=names, dtype=object)
+    for i in range(frame.shape[1]):
+        frame.isetitem(i, _infer_column(frame.iloc[:, i], numeric_text=numeric_text))
+    return frame
+
+
+def read_header(path, engine=None):
+    """Column names of the first sheet, as read_excel would name them"""
+    rows = _ROW_READERS[engine or reader_engines()[0]](path)
+    header = list(next(rows, []))
+    if hasattr(rows, 'close'):
+        rows.close()
+    return _column_names(header, _used_width(header))
+
+
+def sheet_rows(path):
+    """Number of data rows according to the first sheet's <dimension> element, None if unknown
+
+    Only an estimate for progress reporting: it is read from the start of the
+    sheet without parsing any rows, and writers can omit it or get it wrong.
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            parser = WorkbookParser(archive, 'xl/workbook.xml')
+            parser.parse()
+            _, rel = next(parser.find_sheets())
+            with archive.open(rel.target) as source:
+                head = source.read(64 * 1024)
+    except (KeyError, StopIteration, zipfile.BadZipFile):
+        return None
+    match = _DIMENSION.search(head)
+    if match is None or match.group(1) is None:
+        return None
+    return int(match.group(1)) - 1
+
+
+def read_excel(path, columns=None, engine=None):
+    """Read the first sheet of a workbook into a DataFrame like pd.read_excel(path)
+
+    columns optionally limits the result to these column names (in sheet order;
+    names the sheet does not have are skipped). Only those cells are kept while
+    streaming, which saves memory and type inference on wide sheets. engine is
+    one of reader_engines(); by default the fastest available one is used.
+    """
+    rows = _ROW_READERS[engine or reader_engines()[0]](path)
+    header = list(next(rows, []))
+    width = _used_width(header)
+
+    if columns is None:
+        records = []
+        for row in _data_rows(rows):
+            if len(row) > width:
+                width = max(width, _used_width(row))  # Data wider than the header
+            records.append(row)
+        return _frame(records, _column_names(header, width))
+
+    wanted = set(columns)
+    positions = [i for i, name in enumerate(_column_names(header, width)) if name in wanted]
+    needed = positions[-1] + 1 if positions else 0
+    if len(positions) > 1:
+        pick = itemgetter(*positions)
+    else:
+        pick = (lambda row: (row[positions[0]],)) if positions else (lambda row: ())
+    records = [pick(row if len(row) >= needed else tuple(row) + (None,) * (needed - len(row)))
+               for row in _data_rows(rows)]
+    names = _column_names(header, width)
+    return _frame(records, [names[i] for i in positions])
+
+
+def iter_excel(path, chunk_rows, engine=None):
+    """Read the first sheet as frames of up to chunk_rows rows
+
+    With the openpyxl engine memory stays bounded by the chunk size (calamine
+    keeps the sheet's cells in native memory while reading). Every chunk is
+    typed on its own and numeric text stays text, so pass the chunks through
+    ChunkDtypes to get the types read_excel gives the whole sheet. Rows wider
+    than the header add columns from that chunk on. At least one frame is
+    yielded, even for a sheet without data rows.
+    """
+    rows = _ROW_READERS[engine or reader_engines()[0]](path)
+    header = list(next(rows, []))
+    width = _used_width(header)
+
+    records = []
+    yielded = False
+    for row in _data_rows(rows):
+        if len(row) > width:
+            width = max(width, _used_width(row))
+        records.append(row)
+        if len(records) == chunk_rows:
+            yield _frame(records, _column_names(header, width), numeric_text=False)
+            records = []
+            yielded = True
+    if records or not yielded:
+        yield _frame(records, _column_names(header, width), numeric_text=False)
@@ -0,0 +1,279 @@
+"""Timing of pipeline stages and routes, shared by every process of the app.
+
+A stage is a named step of a pipeline (read, extract, dedup, ...). stage()
+measures its wall time, the rows going in and out and the change in resident
+memory, and adds them to the totals of that stage. Web workers and job
+processes all add to the same SQLite file, so /metrics sees every process.
+collect() additionally gathers the stages run in the current thread, which is
+how a job reports where its own time went. Routes are timed the same way by
+record_route(), and set_gauge() records the latest value of a measurement
+(such as the size of the last dataset compacted).
+
+Recording only adds to totals in process memory. They are written to the file
+in one transaction by flush(), which runs when FLUSH_SECONDS have passed since
+the last write, before /metrics reads the file, after each job and when the
+process exits, so a request never waits on the file or its write lock.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    name TEXT PRIMARY KEY,
+    calls INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    rows_in INTEGER NOT NULL,
+    rows_out INTEGER NOT NULL,
+    memory_delta_max INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS routes (
+    route TEXT NOT NULL,
+    method TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    calls INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (route, method, status)
+);
+CREATE TABLE IF NOT EXISTS gauges (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    help TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+);
+"""
+
+FLUSH_SECONDS = 5.0
+
+_db_path = None
+_local = threading.local()
+
+# Totals recorded since the last flush, by table and key
+_pending_lock = threading.Lock()
+_pending = {'stages': {}, 'routes': {}, 'gauges': {}}
+_last_flush = time.monotonic()
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):  # Not a POSIX system
+    _PAGE_SIZE = None
+
+
+def _connect():
+    return sqlite3.connect(_db_path, timeout=30)
+
+
+def configure(db_path):
+    """Record totals in the SQLite file at db_path (without it stages are only collected)"""
+    global _db_path
+    _db_path = db_path
+    with closing(_connect()) as conn, conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+
+
+def current_rss():
+    """Resident memory of this process in bytes, or 0 where /proc is not available"""
+    if _PAGE_SIZE is None:
+        return 0
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _add(table, key, values, merge):
+    """Merge values into the pending totals of key, flushing if FLUSH_SECONDS have passed"""
+    with _pending_lock:
+        pending = _pending[table]
+        pending[key] = merge(pending[key], values) if key in pending else values
+        due = time.monotonic() - _last_flush >= FLUSH_SECONDS
+    if due:
+        flush()
+
+
+def _add_totals(old, new):
+    return (old[0] + new[0], old[1] + new[1], old[2] + new[2], old[3] + new[3], max(old[4], new[4]))
+
+
+def _add_route(old, new):
+    return old[0] + new[0], old[1] + new[1]
+
+
+def _latest(old, new):
+    return new
+
+
+def flush():
+    """Write the totals recorded in this process since the last flush to the SQLite file"""
+    global _pending, _last_flush
+    with _pending_lock:
+        pending = _pending
+        _pending = {'stages': {}, 'routes': {}, 'gauges': {}}
+        _last_flush = time.monotonic()
+    if _db_path is None or not any(pending.values()):
+        return
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO stages (name, calls, seconds, rows_in, rows_out, memory_delta_max) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+                "calls = calls + excluded.calls, seconds = seconds + excluded.seconds, "
+                "rows_in = rows_in + excluded.rows_in, rows_out = rows_out + excluded.rows_out, "
+                "memory_delta_max = max(memory_delta_max, excluded.memory_delta_max)",
+                [(name, *totals) for name, totals in pending['stages'].items()])
+            conn.executemany(
+                "INSERT INTO routes (route, method, status, calls, seconds) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (route, method, status) DO UPDATE SET "
+                "calls = calls + excluded.calls, seconds = seconds + excluded.seconds",
+                [(*key, *totals) for key, totals in pending['routes'].items()])
+            conn.executemany(
+                "INSERT INTO gauges (name, labels, help, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name, labels) DO UPDATE SET help = excluded.help, value = excluded.value",
+                [(*key, *values) for key, values in pending['gauges'].items()])
+    except sqlite3.Error as e:
+        # Metrics must never fail the request or job they measure; the totals are kept for the next flush
+        print(f"Could not record metrics: {str(e)}")
+        with _pending_lock:
+            for table, merge in (('stages', _add_totals), ('routes', _add_route), ('gauges', _latest)):
+                current = _pending[table]
+                for key, values in pending[table].items():
+                    current[key] = merge(values, current[key]) if key in current else values
+
+
+atexit.register(flush)
+
+
+@contextmanager
+def stage(name, rows_in=0):
+    """Time a pipeline stage; set 'rows_out' on the yielded dict once it is known"""
+    record = {'rows_in': rows_in, 'rows_out': 0}
+    rss_before = current_rss()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record_stage(name, time.perf_counter() - start, record['rows_in'], record['rows_out'],
+                     current_rss() - rss_before)
+
+
+def record_stage(name, seconds, rows_in=0, rows_out=0, memory_delta=0):
+    """Add one run of a stage timed by the caller, for work that a with block cannot wrap"""
+    rows_in, rows_out = int(rows_in or 0), int(rows_out or 0)
+    for timings in getattr(_local, 'collectors', ()):
+        totals = timings.setdefault(name, {'stage': name, 'calls': 0, 'seconds': 0.0, 'rows_in': 0,
+                                           'rows_out': 0, 'memory_delta': 0})
+        totals['calls'] += 1
+        totals['seconds'] += seconds
+        totals['rows_in'] += rows_in
+        totals['rows_out'] += rows_out
+        totals['memory_delta'] = max(totals['memory_delta'], memory_delta)
+    _add('stages', name, (1, seconds, rows_in, rows_out, memory_delta), _add_totals)
+
+
+def stage_iter(name, iterable):
+    """Yield the frames of iterable, timing the production of each one as a stage"""
+    iterator = iter(iterable)
+    while True:
+        with stage(name) as record:
+            try:
+                frame = next(iterator)
+            except StopIteration:
+                return
+            record['rows_out'] = len(frame)
+        yield frame
+
+
+@contextmanager
+def collect():
+    """Gather the stages run in this thread while the block runs
+
+    Yields a dict that fills up with the totals of each stage; breakdown()
+    turns it into a list for a job result.
+    """
+    timings = {}
+    _local.collectors = getattr(_local, 'collectors', ()) + (timings,)
+    try:
+        yield timings
+    finally:
+        _local.collectors = tuple(item for item in _local.collectors if item is not timings)
+
+
+def breakdown(timings):
+    """Stage totals of collect() in the order the stages first ran, rounded for display"""
+    return [dict(totals, seconds=round(totals['seconds'], 3)) for totals in timings.values()]
+
+
+def record_route(route, method, status, seconds):
+    """Add one request to the totals of its route"""
+    _add('routes', (route, method, status), (1, seconds), _add_route)
+
+
+def set_gauge(name, help_text, value, **labels):
+    """Record the latest value of a measurement, shown by /metrics as a gauge"""
+    _add('gauges', (name, _labels(**labels)), (help_text, value), _latest)
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def prometheus_text(extra=()):
+    """The recorded totals in the Prometheus text exposition format
+
+    extra is a sequence of (name, type, help, [(labels dict, value)]) for
+    metrics kept elsewhere.
+    """
+    stages = routes = gauges = []
+    if _db_path is not None:
+        flush()  # The other processes flush on their own every FLUSH_SECONDS
+        with closing(_connect()) as conn:
+            stages = conn.execute("SELECT name, calls, seconds, rows_in, rows_out, memory_delta_max "
+                                  "FROM stages ORDER BY name").fetchall()
+            routes = conn.execute("SELECT route, method, status, calls, seconds FROM routes "
+                                  "ORDER BY route, method, status").fetchall()
+            gauges = conn.execute("SELECT name, labels, help, value FROM gauges ORDER BY name, labels").fetchall()
+
+    metrics = [
+        ('pipeline_stage_duration_seconds', 'summary', 'Wall time of pipeline stages',
+         [({'stage': name}, seconds) for name, calls, seconds, *_ in stages],
+         [({'stage': name}, calls) for name, calls, *_ in stages]),
+        ('pipeline_stage_rows_in_total', 'counter', 'Rows going into pipeline stages',
+         [({'stage': row[0]}, row[3]) for row in stages], None),
+        ('pipeline_stage_rows_out_total', 'counter', 'Rows coming out of pipeline stages',
+         [({'stage': row[0]}, row[4]) for row in stages], None),
+        ('pipeline_stage_memory_delta_max_bytes', 'gauge', 'Largest change in resident memory during a stage',
+         [({'stage': row[0]}, row[5]) for row in stages], None),
+        ('http_request_duration_seconds', 'summary', 'Time spent handling requests, by route',
+         [({'route': route, 'method': method, 'status': status}, seconds)
+          for route, method, status, calls, seconds in routes],
+         [({'route': route, 'method': method, 'status': status}, calls)
+          for route, method, status, calls, seconds in routes]),
+    ]
+    metrics += [(name, kind, help_text, samples, None) for name, kind, help_text, samples in extra]
+
+    lines = []
+    for name, kind, help_text, samples, counts in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        suffix = '_sum' if counts is not None else ''
+        for labels, value in samples:
+            lines.append(f"{name}{suffix}{_labels(**labels)} {value}")
+        for labels, value in counts or ():
+            lines.append(f"{name}_count{_labels(**labels)} {value}")
+    # Gauge labels are stored already rendered
+    for name in dict.fromkeys(row[0] for row in gauges):
+        rows = [row for row in gauges if row[0] == name]
+        lines.append(f"# HELP {name} {rows[-1][2]}")
+        lines.append(f"# TYPE {name} gauge")
+        lines += [f"{name}{labels} {value}" for _, labels, _, value in rows]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,207 @@
+"""Background jobs for long-running uploads, backed by a SQLite status table.
+
+Jobs run in a local process pool, so parsing a large workbook never holds a
+gunicorn request thread. Job state (status, progress, message, result) lives
+in a SQLite file shared by every worker process: any web worker can report
+on a job started by another, and the job process writes its own progress.
+No external broker is needed.
+"""
+import json
+import multiprocessing
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+
+import instrumentation
+import profiling
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+FINISHED = (DONE, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class JobFailed(Exception):
+    """Raised by a job function to fail the job with a message for the user"""
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_db(db_path):
+    """Create the jobs table if it does not exist"""
+    with closing(_connect(db_path)) as conn, conn:
+        # WAL lets the web workers read job status while a job process writes progress
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(_SCHEMA)
+
+
+def _update(db_path, job_id, **fields):
+    fields['updated'] = time.time()
+    assignments = ', '.join(f"{name} = ?" for name in fields)
+    with closing(_connect(db_path)) as conn, conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+
+
+class JobHandle:
+    """Passed to a job function (in the worker process) to report progress"""
+
+    def __init__(self, db_path, job_id):
+        self.db_path = db_path
+        self.job_id = job_id
+
+    def progress(self, fraction, message):
+        """Record progress as a fraction between 0 and 1 with a short description"""
+        _update(self.db_path, self.job_id, status=RUNNING, progress=fraction, message=message)
+
+    def finish(self, result):
+        _update(self.db_path, self.job_id, status=DONE, progress=1.0, message='Done',
+                result=json.dumps(result))
+
+    def fail(self, message):
+        _update(self.db_path, self.job_id, status=FAILED, message=message)
+
+
+def _run(func, handle, args, profile=None):
+    """Entry point of a job in the worker process; records the outcome in the jobs table
+
+    The pipeline stages the job ran are added to a dict result as 'timings'.
+    profile is a profiling.spec() to profile the job with, or None.
+    """
+    handle.progress(0.0, 'Started')
+    try:
+        with instrumentation.collect() as timings, profiling.profiled(profile):
+            try:
+                result = func(handle, *args)
+            except JobFailed as e:
+                handle.fail(str(e))
+                return
+            except Exception as e:
+                handle.fail(f"Unexpected error: {str(e)}")
+                return
+        if isinstance(result, dict):
+            result = dict(result, timings=instrumentation.breakdown(timings))
+        handle.finish(result)
+    finally:
+        # Pool processes end without running atexit handlers
+        instrumentation.flush()
+
+
+class JobQueue:
+    """Submits job functions to a process pool and reads their status back
+
+    func must be a module-level function so the spawned worker can import it.
+    It is called as func(handle, *args) and returns a JSON-serializable result,
+    or raises JobFailed. With max_workers=0 jobs run synchronously in the
+    calling thread, which is handy for development and debugging.
+    """
+
+    def __init__(self, db_path, max_workers=2, stale_after=3600, keep_for=24 * 3600):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.stale_after = stale_after  # Seconds without progress before a running job counts as lost
+        self.keep_for = keep_for  # Seconds finished jobs are kept
+        self._executor = None
+        self._lock = threading.Lock()
+        init_db(db_path)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: a forked child would inherit the web worker's threads and locks
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _reset_pool(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def submit(self, kind, owner, func, *args, profile=None):
+        """Queue a job and return its id
+
+        profile is a profiling.spec() to profile the job with. Jobs run
+        synchronously are part of the calling request and its profile instead.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(_connect(self.db_path)) as conn, conn:
+            conn.execute("INSERT INTO jobs (id, kind, owner, status, progress, message, created, updated) "
+                         "VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                         (job_id, kind, owner, QUEUED, 'Waiting for a free worker', now, now))
+            conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?",
+                         (DONE, FAILED, now - self.keep_for))
+
+        handle = JobHandle(self.db_path, job_id)
+        if self.max_workers <= 0:
+            _run(func, handle, args)
+            return job_id
+
+        executor = self._pool()
+        try:
+            future = executor.submit(_run, func, handle, args, profile)
+        except BrokenProcessPool:
+            # A worker process died earlier; start a fresh pool and try once more
+            self._reset_pool(executor)
+            executor = self._pool()
+            future = executor.submit(_run, func, handle, args, profile)
+        future.add_done_callback(lambda f: self._check_worker(f, handle, executor))
+        return job_id
+
+    def _check_worker(self, future, handle, executor):
+        # _run records the job's own outcome; this only catches worker processes that died
+        if future.cancelled():
+            handle.fail('Job was cancelled')
+            return
+        error = future.exception()
+        if error is not None:
+            handle.fail(f"Worker process failed: {str(error)}")
+            if isinstance(error, BrokenProcessPool):
+                self._reset_pool(executor)
+
+    def results(self):
+        """(owner, result) of every finished job that is still kept"""
+        with closing(_connect(self.db_path)) as conn:
+            rows = conn.execute("SELECT owner, result FROM jobs WHERE status = ? AND result IS NOT NULL",
+                                (DONE,)).fetchall()
+        return [(row['owner'], json.loads(row['result'])) for row in rows]
+
+    def get(self, job_id):
+        """Return the job as a dict, or None if there is no such job"""
+        with closing(_connect(self.db_path)) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        if job['status'] not in FINISHED and time.time() - job['updated'] > self.stale_after:
+            # The process running it was restarted or killed
+            message = 'Job was interrupted, please try again'
+            _update(self.db_path, job_id, status=FAILED, message=message)
+            job.update(status=FAILED, message=message)
+        return job
@@ -0,0 +1,118 @@
+"""Disk quotas for the upload, processed and cache folders.
+
+Nothing else ever removes an upload, a processed workbook or a session
+dataset, so a sweep applies a quota to each working folder: files unused for
+longer than max_age are removed, then the least recently used ones until the
+folder fits in max_bytes. Files that belong together (a session's dataset, row
+index and lineage, say) share their name up to the first dot and are removed
+as one group. The last use of a group is the newest modification time among
+its files, so touch() marks a group as used. Groups newer than min_age, which
+a running job may still be reading or writing, and groups named in in_use are
+always kept. Subfolders are left alone.
+"""
+import json
+import os
+import time
+import uuid
+
+
+def group_key(name):
+    """Name of the group a file belongs to: its name up to the first dot"""
+    return name.split('.', 1)[0]
+
+
+def touch(path):
+    """Mark the group of a file as used now, creating the file if needed"""
+    with open(path, 'a'):
+        os.utime(path)
+
+
+def _groups(folder):
+    """{group: {'files': [paths], 'bytes': size, 'last_used': newest mtime}} of a folder"""
+    groups = {}
+    if not os.path.isdir(folder):
+        return groups
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            group = groups.setdefault(group_key(entry.name), {'files': [], 'bytes': 0, 'last_used': 0})
+            group['files'].append(entry.path)
+            group['bytes'] += stat.st_size
+            group['last_used'] = max(group['last_used'], stat.st_mtime)
+    return groups
+
+
+def usage(folder):
+    """Bytes and groups of files in a folder (subfolders not included)"""
+    groups = _groups(folder)
+    return {'bytes': sum(group['bytes'] for group in groups.values()), 'groups': len(groups)}
+
+
+def _remove(group):
+    removed = 0
+    for path in group['files']:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            removed += size
+        except FileNotFoundError:
+            pass  # Removed by a concurrent sweep
+    return removed
+
+
+def sweep(folder, max_bytes=None, max_age=None, min_age=0, in_use=(), now=None):
+    """Apply a quota to a folder and return what was removed
+
+    max_bytes and max_age (seconds) may be None for no limit. Returns a dict
+    with the files and bytes removed and the bytes left.
+    """
+    now = time.time() if now is None else now
+    groups = _groups(folder)
+    total = sum(group['bytes'] for group in groups.values())
+    removable = sorted((group['last_used'], key) for key, group in groups.items()
+                       if key not in in_use and now - group['last_used'] >= min_age)
+    files_removed = 0
+    bytes_removed = 0
+    for last_used, key in removable:
+        expired = max_age is not None and now - last_used > max_age
+        over_quota = max_bytes is not None and total > max_bytes
+        if not expired and not over_quota:
+            break  # Oldest first: the rest were used more recently and fit
+        removed = _remove(groups[key])
+        files_removed += len(groups[key]['files'])
+        bytes_removed += removed
+        total -= groups[key]['bytes']
+    return {'files_removed': files_removed, 'bytes_removed': bytes_removed, 'bytes_left': total}
+
+
+def record_sweep(path, results):
+    """Add the results of a sweep ({folder: sweep() result}) to the metrics file at path"""
+    metrics = read_metrics(path)
+    metrics['sweeps'] = metrics.get('sweeps', 0) + 1
+    metrics['last_sweep'] = time.time()
+    folders = metrics.setdefault('folders', {})
+    for folder, result in results.items():
+        totals = folders.setdefault(folder, {'files_removed': 0, 'bytes_removed': 0})
+        totals['files_removed'] += result['files_removed']
+        totals['bytes_removed'] += result['bytes_removed']
+        totals['bytes_left'] = result['bytes_left']
+        totals['last_bytes_removed'] = result['bytes_removed']
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(metrics, f)
+    os.replace(tmp_path, path)
+    return metrics
+
+
+def read_metrics(path):
+    """Totals of every recorded sweep, empty before the first"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
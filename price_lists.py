@@ -0,0 +1,89 @@
+"""Server-side registry of price lists for the data cleaner.
+
+A price list is parsed once and stored as its HSN lookup: one row per
+normalized HSN code that appears exactly once in the file, with the
+description and price to copy into the main file. Each stored lookup is a
+version named after the content of the price file, so uploading the same file
+again reuses it, and every cleaning joins against a stored version without
+reading the price file. Lookups are written with session_store (Feather when
+pyarrow is installed) next to a small JSON description of the version.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+
+import session_store
+
+# Version IDs are the start of the SHA-256 of the price file
+_VERSION_ID = re.compile(r'[0-9a-f]{16}')
+
+
+class PriceListError(Exception):
+    """Raised when a price file cannot be used, with a message for the user"""
+
+
+def version_id(path):
+    """Version ID of a price file: the same content always gets the same ID"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _info_path(folder, version):
+    return os.path.join(folder, f"{version}.json")
+
+
+def exists(folder, version):
+    """Return True if the version is stored in the registry"""
+    return bool(_VERSION_ID.fullmatch(version or '')) and os.path.exists(_info_path(folder, version))
+
+
+def save(folder, version, lookup, details):
+    """Store a lookup frame as a version, described by details (a JSON-serializable dict)
+
+    Returns the info of the version: details with its 'id' and 'created' time.
+    """
+    os.makedirs(folder, exist_ok=True)
+    session_store.write_dataset(folder, version, lookup)
+    version_info = dict(details, id=version, created=time.time())
+    tmp_path = f"{_info_path(folder, version)}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(version_info, f)
+    # The description is written last: a version without it does not exist yet
+    os.replace(tmp_path, _info_path(folder, version))
+    return version_info
+
+
+def info(folder, version):
+    """Return the info of a stored version, or None"""
+    if not exists(folder, version):
+        return None
+    with open(_info_path(folder, version)) as f:
+        return json.load(f)
+
+
+def load(folder, version):
+    """Return (lookup frame, info) of a stored version, or (None, None)"""
+    version_info = info(folder, version)
+    if version_info is None:
+        return None, None
+    lookup = session_store.read_dataset(folder, version)
+    if lookup is None:
+        return None, None
+    return lookup, version_info
+
+
+def list_versions(folder):
+    """Info of every stored version, newest first"""
+    versions = []
+    if os.path.isdir(folder):
+        for name in os.listdir(folder):
+            version, ext = os.path.splitext(name)
+            if ext == '.json' and _VERSION_ID.fullmatch(version):
+                with open(os.path.join(folder, name)) as f:
+                    versions.append(json.load(f))
+    return sorted(versions, key=lambda info: info['created'], reverse=True)
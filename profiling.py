@@ -0,0 +1,191 @@
+"""Opt-in profiles of single requests and jobs, kept as files for later reading.
+
+profiled() runs a block under cProfile ('cpu') or tracemalloc ('memory') and
+saves the result in a profiles folder: the raw artifact (a pstats dump, or a
+tracemalloc snapshot) for offline tools such as snakeviz, and a JSON
+description with the label, timing, peak memory and the top functions (or
+allocation sites), which is what the profiles page shows. Nothing is set up
+unless a profile is asked for, so requests without one pay nothing.
+
+cProfile only sees the thread that runs the block. tracemalloc traces the
+whole process, so one memory profile runs at a time and it includes what
+concurrent requests allocate.
+"""
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+CPU = 'cpu'
+MEMORY = 'memory'
+MODES = (CPU, MEMORY)
+
+TOP_ENTRIES = 25
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_memory_lock = threading.Lock()
+
+
+def spec(mode, folder, label, keep=50, parent=None):
+    """What profiled() should do: a plain dict, so it can be passed to a job process
+
+    parent is the id of the profile this one belongs to (the request that
+    queued a job).
+    """
+    return {'mode': mode, 'folder': folder, 'label': label, 'keep': keep, 'parent': parent}
+
+
+def _short_path(path):
+    if path.startswith(_ROOT + os.sep):
+        return os.path.relpath(path, _ROOT)
+    for prefix in sorted(set(sys.path), key=len, reverse=True):
+        if prefix and path.startswith(prefix + os.sep):
+            return os.path.relpath(path, prefix)
+    return path
+
+
+def _top_functions(profiler):
+    """The functions with the most cumulative time, as dicts for the JSON description"""
+    stats = pstats.Stats(profiler)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    top = []
+    for func in stats.fcn_list[:TOP_ENTRIES]:
+        primitive_calls, calls, own_seconds, cumulative_seconds, _ = stats.stats[func]
+        path, line, name = func
+        top.append({
+            'function': name if path == '~' else f"{_short_path(path)}:{line}({name})",
+            'calls': calls,
+            'own_seconds': round(own_seconds, 4),
+            'cumulative_seconds': round(cumulative_seconds, 4),
+        })
+    return top
+
+
+def _top_allocations(snapshot):
+    """The source lines holding the most memory at the end of the profile"""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+    return [{'function': f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+             'blocks': stat.count, 'bytes': stat.size}
+            for stat in snapshot.statistics('lineno')[:TOP_ENTRIES]]
+
+
+def _start(mode):
+    """Start profiling; returns the profiler (the tracemalloc module for memory), or None if busy"""
+    if mode == CPU:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiler is active in this thread
+            return None
+        return profiler
+    if not _memory_lock.acquire(blocking=False):
+        return None
+    if tracemalloc.is_tracing():
+        _memory_lock.release()
+        return None
+    tracemalloc.start()
+    return tracemalloc
+
+
+def _stop(mode, profiler, details, base_path):
+    """Stop profiling, write the artifact and add the top entries to details"""
+    if mode == CPU:
+        profiler.disable()
+        artifact = f"{base_path}.prof"
+        profiler.dump_stats(artifact)
+        details['top'] = _top_functions(profiler)
+    else:
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            details['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            _memory_lock.release()
+        artifact = f"{base_path}.tracemalloc"
+        snapshot.dump(artifact)
+        details['top'] = _top_allocations(snapshot)
+    details['artifact'] = os.path.basename(artifact)
+
+
+@contextmanager
+def profiled(profile_spec):
+    """Profile the block as profile_spec (see spec()) asks, or do nothing if it is None
+
+    Yields the description of the profile, which the block may add to (a
+    status code, say), or None when there is no profile.
+    """
+    if profile_spec is None:
+        yield None
+        return
+    mode = profile_spec['mode']
+    profiler = _start(mode)
+    if profiler is None:
+        yield None
+        return
+    details = {
+        # Ids sort by creation time
+        'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+        'mode': mode,
+        'label': profile_spec['label'],
+        'parent': profile_spec['parent'],
+        'created': time.time(),
+        'pid': os.getpid(),
+    }
+    start = time.perf_counter()
+    try:
+        yield details
+    finally:
+        details['seconds'] = round(time.perf_counter() - start, 4)
+        folder = profile_spec['folder']
+        os.makedirs(folder, exist_ok=True)
+        _stop(mode, profiler, details, os.path.join(folder, details['id']))
+        tmp_path = os.path.join(folder, f"{details['id']}.json.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(details, f)
+        os.replace(tmp_path, os.path.join(folder, f"{details['id']}.json"))
+        prune(folder, profile_spec['keep'])
+
+
+def list_profiles(folder, limit=None):
+    """Descriptions of the saved profiles, newest first"""
+    if not os.path.isdir(folder):
+        return []
+    ids = sorted((name[:-len('.json')] for name in os.listdir(folder) if name.endswith('.json')), reverse=True)
+    profiles = []
+    for profile_id in ids[:limit]:
+        details = load(folder, profile_id)
+        if details is not None:
+            profiles.append(details)
+    return profiles
+
+
+def load(folder, profile_id):
+    """Description of a saved profile, or None"""
+    if os.sep in profile_id or profile_id.startswith('.'):
+        return None
+    try:
+        with open(os.path.join(folder, f"{profile_id}.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def prune(folder, keep):
+    """Remove all but the newest keep profiles"""
+    ids = sorted((name[:-len('.json')] for name in os.listdir(folder) if name.endswith('.json')), reverse=True)
+    old = set(ids[keep:])
+    for name in os.listdir(folder):
+        if name.split('.', 1)[0] in old:
+            try:
+                os.remove(os.path.join(folder, name))
+            except FileNotFoundError:
+                pass  # Pruned by another process
@@ -0,0 +1,177 @@
+"""Content-addressed cache of processing results.
+
+A result is keyed by the SHA-256 of the uploaded bytes together with the
+pipeline that processed them (and, for the data cleaner, the price list
+version), so uploading the same export again, from any session, restores the
+first result instead of running the pipeline again. Each entry is a folder
+holding the datasets of the result (written with session_store), the output
+workbook once it has been written, and a small JSON description. The cache is
+bounded in bytes on disk and evicts the least recently used entries first.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+import session_store
+
+_KEY = re.compile(r'[0-9a-f]{64}')
+_INFO = 'info.json'
+_WORKBOOK = 'workbook.xlsx'
+
+# Eviction scans the whole cache folder, so one process runs it at a time
+_evict_lock = threading.Lock()
+
+
+def file_digest(path):
+    """SHA-256 of a file's content, as hex"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def result_key(*parts):
+    """Cache key of a result: the SHA-256 of its parts (input digests, pipeline version, ...)"""
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _entry_folder(folder, key):
+    return os.path.join(folder, key)
+
+
+def lookup(folder, key):
+    """Return the details of a cached result and mark it as used, or None"""
+    if not _KEY.fullmatch(key or ''):
+        return None
+    info_path = os.path.join(_entry_folder(folder, key), _INFO)
+    try:
+        with open(info_path) as f:
+            details = json.load(f)
+        os.utime(info_path)  # The modification time of the description is the entry's last use
+    except (FileNotFoundError, ValueError):
+        return None
+    return details
+
+
+def restore_dataset(folder, key, name, target_folder, target_key):
+    """Copy a dataset of a cached result to target_key; returns False if it is gone"""
+    try:
+        return session_store.copy_dataset(_entry_folder(folder, key), name, target_key,
+                                          new_folder=target_folder) is not None
+    except FileNotFoundError:
+        return False  # Evicted while it was being copied
+
+
+def restore_workbook(folder, key, path):
+    """Put the cached workbook of a result at path; returns False if it has none"""
+    source = os.path.join(_entry_folder(folder, key), _WORKBOOK)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            if not os.path.exists(source):
+                return False
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, path)
+        return True
+    except FileNotFoundError:
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save(folder, key, datasets, details, max_bytes):
+    """Store a result: datasets maps names to the (folder, key) of stored datasets to copy
+
+    details (a JSON-serializable dict) is returned by lookup(). The entry is
+    built aside and renamed into place, so a lookup never sees half of it.
+    Evicts old entries if the cache is over max_bytes afterwards.
+    """
+    if max_bytes <= 0 or not _KEY.fullmatch(key):
+        return
+    os.makedirs(folder, exist_ok=True)
+    entry = _entry_folder(folder, key)
+    tmp_entry = os.path.join(folder, f"tmp_{uuid.uuid4().hex}")
+    os.makedirs(tmp_entry)
+    try:
+        for name, (source_folder, source_key) in datasets.items():
+            if session_store.copy_dataset(source_folder, source_key, name, new_folder=tmp_entry) is None:
+                return
+        with open(os.path.join(tmp_entry, _INFO), 'w') as f:
+            json.dump(dict(details, created=time.time()), f)
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            return  # Another job stored the same result first
+    finally:
+        if os.path.exists(tmp_entry):
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+    evict(folder, max_bytes)
+
+
+def save_workbook(folder, key, path, max_bytes):
+    """Add the output workbook at path to a cached result, if the result is still cached"""
+    entry = _entry_folder(folder, key)
+    if max_bytes <= 0 or not _KEY.fullmatch(key or '') or not os.path.isdir(entry):
+        return
+    target = os.path.join(entry, _WORKBOOK)
+    tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    try:
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, target)
+    except FileNotFoundError:
+        return  # Evicted in the meantime
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict(folder, max_bytes)
+
+
+def _entries(folder):
+    """(last used, bytes, key) of every entry"""
+    entries = []
+    if not os.path.isdir(folder):
+        return entries
+    for key in os.listdir(folder):
+        entry = _entry_folder(folder, key)
+        if not _KEY.fullmatch(key):
+            continue
+        try:
+            last_used = os.stat(os.path.join(entry, _INFO)).st_mtime
+            size = sum(os.stat(os.path.join(entry, name)).st_size for name in os.listdir(entry))
+        except FileNotFoundError:
+            continue
+        entries.append((last_used, size, key))
+    return entries
+
+
+def evict(folder, max_bytes):
+    """Remove least recently used entries until the cache fits in max_bytes; returns bytes removed"""
+    with _evict_lock:
+        entries = sorted(_entries(folder))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, key in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(_entry_folder(folder, key), ignore_errors=True)
+            total -= size
+            removed += size
+    return removed
+
+
+def stats(folder):
+    """Entry count and bytes on disk, for monitoring"""
+    entries = _entries(folder)
+    return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries)}
@@ -0,0 +1,561 @@
+"""File-based storage for the per-session processed DataFrame.
+
+Datasets are written as Feather (Arrow IPC) files when pyarrow is installed.
+Feather files are memory-mapped on load and can be read column by column, so a
+route only pays for the columns it actually uses. Pickle is kept as a fallback
+for environments without pyarrow and for frames Arrow cannot represent (for
+example object columns that mix text and numbers).
+"""
+import json
+import os
+import pickle
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional, pickle always works
+    pa = None
+    feather = None
+
+FEATHER = 'feather'
+PICKLE = 'pickle'
+
+EXTENSIONS = {
+    FEATHER: '.feather',
+    PICKLE: '.pkl',
+}
+
+
+def columnar_available():
+    """Return True if the Feather backend can be used"""
+    return feather is not None
+
+
+def dataset_path(folder, key, fmt):
+    """Path of the cache file for a dataset key in the given format"""
+    return os.path.join(folder, f"{key}{EXTENSIONS[fmt]}")
+
+
+def _atomic_write(path, write):
+    """Write to a temporary file first so concurrent readers never see a partial file"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _check_feather_columns(df):
+    # Arrow stores column names as strings and drops the index, so only frames that
+    # round-trip unchanged are written as Feather
+    if not all(isinstance(col, str) for col in df.columns) or df.columns.has_duplicates:
+        raise ValueError("Feather needs unique string column names")
+
+
+def _write_feather(df, path):
+    _check_feather_columns(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    _atomic_write(path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+
+
+def _write_feather_chunks(frames, path):
+    """Write frames with the same columns and dtypes as one Feather file, one batch at a time"""
+    def write(tmp):
+        writer = None
+        try:
+            for df in frames:
+                if writer is None:
+                    _check_feather_columns(df)
+                    schema = pa.Schema.from_pandas(df, preserve_index=False)
+                    # An object column that is empty in the first frame has no Arrow type
+                    # yet; the later frames can only fit it as text
+                    schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                        for field in schema], metadata=schema.metadata)
+                    writer = pa.ipc.new_file(tmp, schema)
+                writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+            if writer is None:
+                raise ValueError("No frames to write")
+        finally:
+            if writer is not None:
+                writer.close()
+    _atomic_write(path, write)
+
+
+def _write_pickle(df, path):
+    def write(tmp):
+        with open(tmp, 'wb') as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+    _atomic_write(path, write)
+
+
+def write_dataset(folder, key, df, fmt=FEATHER):
+    """Store a DataFrame under key and return the format that was actually used"""
+    df = df.reset_index(drop=True)
+    used = PICKLE
+    if fmt == FEATHER and columnar_available():
+        try:
+            _write_feather(df, dataset_path(folder, key, FEATHER))
+            used = FEATHER
+        except (ValueError, TypeError, pa.ArrowException) as e:
+            print(f"Feather cache not possible for this dataset, using pickle: {str(e)}")
+    if used == PICKLE:
+        _write_pickle(df, dataset_path(folder, key, PICKLE))
+    _remove_other_formats(folder, key, used)
+    return used
+
+
+def write_dataset_chunks(folder, key, make_frames, fmt=FEATHER):
+    """Store a DataFrame given in chunks under key and return the format that was used
+
+    make_frames() returns an iterable of frames with the same columns and dtypes.
+    As Feather they are written one at a time, so the whole dataset is never in
+    memory. The pickle fallback has to concatenate them; it calls make_frames()
+    again, so it must produce the same frames every time.
+    """
+    used = PICKLE
+    if fmt == FEATHER and columnar_available():
+        try:
+            _write_feather_chunks(make_frames(), dataset_path(folder, key, FEATHER))
+            used = FEATHER
+        except (ValueError, TypeError, pa.ArrowException) as e:
+            print(f"Feather cache not possible for this dataset, using pickle: {str(e)}")
+    if used == PICKLE:
+        df = pd.concat(make_frames(), ignore_index=True)
+        _write_pickle(df, dataset_path(folder, key, PICKLE))
+    _remove_other_formats(folder, key, used)
+    return used
+
+
+def copy_dataset(folder, key, new_key, new_folder=None):
+    """Store a copy of a dataset under another key without loading it; returns its format or None
+
+    The copy goes to new_folder if given, else next to the dataset.
+    """
+    new_folder = folder if new_folder is None else new_folder
+    fmt = _existing_format(folder, key)
+    if fmt is None:
+        return None
+    source = dataset_path(folder, key, fmt)
+    _atomic_write(dataset_path(new_folder, new_key, fmt), lambda tmp: shutil.copyfile(source, tmp))
+    _remove_other_formats(new_folder, new_key, fmt)
+    return fmt
+
+
+def _remove_other_formats(folder, key, used):
+    # Remove the file of the other format so a stale copy is never read back
+    for other in EXTENSIONS:
+        if other != used:
+            stale = dataset_path(folder, key, other)
+            if os.path.exists(stale):
+                os.remove(stale)
+
+
+def _existing_format(folder, key):
+    """Return the format the dataset is stored in, or None if there is no cache file"""
+    if columnar_available() and os.path.exists(dataset_path(folder, key, FEATHER)):
+        return FEATHER
+    if os.path.exists(dataset_path(folder, key, PICKLE)):
+        return PICKLE
+    return None
+
+
+def dataset_columns(folder, key):
+    """Return the column names of a stored dataset without loading its data"""
+    fmt = _existing_format(folder, key)
+    if fmt == FEATHER:
+        with pa.memory_map(dataset_path(folder, key, FEATHER)) as source:
+            return pa.ipc.open_file(source).schema.names
+    if fmt == PICKLE:
+        df = read_dataset(folder, key)
+        return list(df.columns)
+    return None
+
+
+def dataset_version(folder, key):
+    """Version token of a stored dataset, or None if there is none
+
+    Based on the file's modification time and size, so every write (from any
+    worker process) produces a new version without extra bookkeeping.
+    """
+    fmt = _existing_format(folder, key)
+    if fmt is None:
+        return None
+    try:
+        stat = os.stat(dataset_path(folder, key, fmt))
+    except FileNotFoundError:
+        return None
+    return f"{fmt}-{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def read_dataset(folder, key, columns=None, start=0):
+    """Load a stored dataset, optionally only the given columns (missing ones are skipped)
+
+    With start, only the rows from that position on are loaded.
+    """
+    fmt = _existing_format(folder, key)
+    if fmt == FEATHER:
+        path = dataset_path(folder, key, FEATHER)
+        if columns is not None:
+            with pa.memory_map(path) as source:
+                available = set(pa.ipc.open_file(source).schema.names)
+            columns = [col for col in columns if col in available]
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        return table.slice(start).to_pandas()
+    if fmt == PICKLE:
+        with open(dataset_path(folder, key, PICKLE), 'rb') as f:
+            df = pickle.load(f)
+        if columns is not None:
+            df = df[[col for col in columns if col in df.columns]]
+        return df.iloc[start:].reset_index(drop=True) if start else df
+    return None
+
+
+def read_dataset_chunks(folder, key, columns=None):
+    """Yield a stored dataset as a sequence of frames (Feather: one per record batch)
+
+    Optionally only the given columns are loaded (missing ones are skipped).
+    Yields nothing if there is no dataset, else at least one (possibly empty) frame.
+    """
+    fmt = _existing_format(folder, key)
+    if fmt == FEATHER:
+        with pa.memory_map(dataset_path(folder, key, FEATHER)) as source:
+            reader = pa.ipc.open_file(source)
+            if columns is not None:
+                columns = [col for col in columns if col in reader.schema.names]
+            if reader.num_record_batches == 0:
+                schema = reader.schema if columns is None else pa.schema([reader.schema.field(col) for col in columns])
+                yield schema.empty_table().to_pandas()
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                yield (batch if columns is None else batch.select(columns)).to_pandas()
+    elif fmt == PICKLE:
+        yield read_dataset(folder, key, columns=columns)
+
+
+def delete_dataset(folder, key):
+    """Remove a stored dataset in whatever format it was written"""
+    for fmt in EXTENSIONS:
+        path = dataset_path(folder, key, fmt)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+
+class CompactDtypes:
+    """Smaller column types for a dataset, planned over all of its chunks
+
+    observe() every chunk first, then apply() converts each chunk the same way:
+    - category_columns with at most half as many distinct values as rows become
+      categoricals, with sorted categories so groupby keeps its order
+    - int64 columns whose values all fit become int32
+    - date_columns of text in date_format become datetime64 when every value
+      formats back to exactly the same text
+    Float columns stay float64: the summaries add up many of them and float32
+    sums lose precision. A column stops being a category candidate as soon as it
+    has more distinct values than half the rows seen, which bounds the memory
+    spent on tracking them.
+
+    Chunks that are already compact can be observed too (to add rows to a
+    compacted dataset); apply() turns their columns back into the plain types
+    when the plan no longer covers them, and expand() does so for every column.
+    """
+
+    def __init__(self, category_columns=(), date_columns=(), date_format='%d-%m-%Y'):
+        self.category_columns = set(category_columns)
+        self.date_columns = set(date_columns)
+        self.date_format = date_format
+        self.rows = 0
+        self._values = {}  # category column -> set of distinct values, None once there are too many
+        self._ranges = {}  # int64 column -> (min, max)
+        self._dates = {}  # date column -> every value so far converts
+        self._plan = None
+        self._categories = {}
+
+    def observe(self, df):
+        self.rows += len(df)
+        self._plan = None
+        for col in df.columns:
+            series = df[col]
+            if col in self.category_columns and (pd.api.types.is_object_dtype(series.dtype)
+                                                  or isinstance(series.dtype, pd.CategoricalDtype)):
+                values = self._values.setdefault(col, set())
+                if values is not None:
+                    values.update(series.dropna().unique())
+                    if len(values) > self.rows // 2:
+                        self._values[col] = None
+            elif col in self.date_columns and pd.api.types.is_object_dtype(series.dtype):
+                self._dates[col] = self._dates.get(col, True) and self._dates_convert(series)
+            elif col in self.date_columns and pd.api.types.is_datetime64_dtype(series.dtype):
+                self._dates[col] = self._dates.get(col, True)
+            elif series.dtype in (np.int64, np.int32) and len(series):
+                low, high = int(series.min()), int(series.max())
+                if col in self._ranges:
+                    low, high = min(low, self._ranges[col][0]), max(high, self._ranges[col][1])
+                self._ranges[col] = (low, high)
+
+    def _dates_convert(self, series):
+        # Distinct values only: dates repeat a lot
+        uniques = pd.Series(pd.unique(series.dropna()), dtype=object)
+        parsed = pd.to_datetime(uniques, format=self.date_format, errors='coerce')
+        return bool(parsed.notna().all() and (parsed.dt.strftime(self.date_format) == uniques).all())
+
+    def plan(self):
+        """{column: 'category' | 'int32' | 'datetime'} for the chunks observed so far"""
+        if self._plan is None:
+            self._plan = {}
+            for col, values in self._values.items():
+                if values is None:
+                    continue
+                try:
+                    self._categories[col] = sorted(values)
+                except TypeError:
+                    continue  # Mixed text and numbers have no order
+                self._plan[col] = 'category'
+            int32 = np.iinfo(np.int32)
+            for col, (low, high) in self._ranges.items():
+                if int32.min <= low and high <= int32.max:
+                    self._plan[col] = 'int32'
+            for col, convertible in self._dates.items():
+                if convertible:
+                    self._plan[col] = 'datetime'
+        return self._plan
+
+    def apply(self, df):
+        """Return the chunk with the planned column types"""
+        result = df.copy(deep=False)
+        plan = self.plan()
+        for col in result.columns:
+            kind = plan.get(col)
+            if kind == 'category':
+                result[col] = pd.Categorical(result[col], categories=self._categories[col])
+            elif kind == 'int32':
+                result[col] = result[col].astype(np.int32)
+            elif kind == 'datetime':
+                if not pd.api.types.is_datetime64_dtype(result[col].dtype):
+                    result[col] = pd.to_datetime(result[col], format=self.date_format)
+            else:
+                result[col] = self._expand(col, result[col])
+        return result
+
+    def _expand(self, col, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series.astype(object)
+        if series.dtype == np.int32:
+            return series.astype(np.int64)
+        if col in self.date_columns and pd.api.types.is_datetime64_dtype(series.dtype):
+            return series.dt.strftime(self.date_format)
+        return series
+
+    def expand(self, df):
+        """Return a compacted chunk with the plain column types it had before compaction"""
+        result = df.copy(deep=False)
+        for col in result.columns:
+            result[col] = self._expand(col, result[col])
+        return result
+
+
+def compact_dataset(folder, key, compact, fmt=FEATHER):
+    """Rewrite a stored dataset with the column types of a CompactDtypes, chunk by chunk
+
+    Returns the in-memory size of the dataset in bytes before and after.
+    """
+    before = 0
+    for df in read_dataset_chunks(folder, key):
+        compact.observe(df)
+        before += _memory_usage(df)
+
+    after = 0
+    categories = 0
+
+    def compact_frames():
+        nonlocal after, categories
+        after = 0
+        for df in read_dataset_chunks(folder, key):
+            df = compact.apply(df)
+            # Every chunk carries the same categories; loaded as one frame they exist once
+            categories = sum(df[col].cat.categories.memory_usage(deep=True) for col in df.columns
+                             if isinstance(df[col].dtype, pd.CategoricalDtype))
+            after += _memory_usage(df) - categories
+            yield df
+
+    write_dataset_chunks(folder, key, compact_frames, fmt=fmt)
+    return before, after + categories
+
+
+def append_dataset(folder, key, make_frames, compact, fmt=FEATHER, convert=None):
+    """Add rows at the end of a stored dataset, with the column types of a CompactDtypes
+
+    make_frames() returns the new rows as frames and is called more than once.
+    convert, if given, is applied to every stored chunk first (for example to
+    give it the column types of the new rows). The stored rows keep their order;
+    compacted chunks only have their categories recoded, so no stored row is
+    reprocessed. Returns the number of stored rows before the append.
+    """
+    def stored_frames():
+        for df in read_dataset_chunks(folder, key):
+            yield convert(df) if convert is not None else df
+
+    stored_rows = 0
+    for df in stored_frames():
+        compact.observe(df)
+        stored_rows += len(df)
+    for df in make_frames():
+        compact.observe(df)
+
+    def all_frames():
+        for df in stored_frames():
+            yield compact.apply(df)
+        for df in make_frames():
+            yield compact.apply(df)
+
+    write_dataset_chunks(folder, key, all_frames, fmt=fmt)
+    return stored_rows
+
+
+def _index_path(folder, key):
+    return os.path.join(folder, f"{key}.rowindex.pkl")
+
+
+def _lineage_path(folder, key):
+    return os.path.join(folder, f"{key}.lineage.json")
+
+
+def write_row_index(folder, key, index):
+    """Store the row index of a dataset (a dict holding at least the 'version' it was built for)"""
+    _write_pickle(index, _index_path(folder, key))
+
+
+def read_row_index(folder, key):
+    """Return the stored row index of a dataset, or None"""
+    try:
+        with open(_index_path(folder, key), 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def write_lineage(folder, key, lineage):
+    """Store {dataset version: row count} for the versions a dataset reached only by appending rows"""
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(lineage, f)
+    _atomic_write(_lineage_path(folder, key), write)
+
+
+def read_lineage(folder, key):
+    """Return the stored {dataset version: row count} of a dataset, empty if there is none"""
+    try:
+        with open(_lineage_path(folder, key)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _memory_usage(value):
+    """Approximate size in bytes of a DataFrame or a dict of DataFrames"""
+    if isinstance(value, dict):
+        return sum(_memory_usage(item) for item in value.values())
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return 0
+
+
+class DataFrameCache:
+    """Per-process LRU cache of loaded session datasets with a memory budget in bytes
+
+    Entries are keyed by (session key, dataset version, columns), where columns is
+    None for the full frame. A request for a column subset is served from the
+    full frame when that is cached. Values may also be dicts of DataFrames (such
+    as analysis results), stored and returned as a whole. Cached values are
+    shared between requests and must not be modified by callers.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (key, version, columns) -> (df, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, entry_key):
+        _, nbytes = self._entries.pop(entry_key)
+        self._bytes -= nbytes
+
+    def get(self, key, version, columns=None):
+        """Return the cached frame (or column subset) or None on a miss"""
+        columns = tuple(columns) if columns is not None else None
+        with self._lock:
+            entry_key = (key, version, columns)
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return self._entries[entry_key][0]
+
+            full_key = (key, version, None)
+            if columns is not None and full_key in self._entries and hasattr(self._entries[full_key][0], 'columns'):
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                df = self._entries[full_key][0]
+                return df[[col for col in columns if col in df.columns]]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, version, df, columns=None):
+        """Cache a frame, evicting least recently used entries to stay within budget"""
+        if self.max_bytes <= 0:
+            return
+        nbytes = _memory_usage(df)
+        if nbytes > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        columns = tuple(columns) if columns is not None else None
+        with self._lock:
+            # Older versions of this session's data can never be requested again
+            for entry_key in [k for k in self._entries if k[0] == key and k[1] != version]:
+                self._remove(entry_key)
+            entry_key = (key, version, columns)
+            if entry_key in self._entries:
+                self._remove(entry_key)
+            self._entries[entry_key] = (df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def latest(self, key):
+        """Return (version, value) of the most recently used whole entry of a key, or (None, None)"""
+        with self._lock:
+            for entry_key in reversed(self._entries):
+                if entry_key[0] == key and entry_key[2] is None:
+                    return entry_key[1], self._entries[entry_key][0]
+        return None, None
+
+    def invalidate(self, key):
+        """Drop every cached frame of a session"""
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == key]:
+                self._remove(entry_key)
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
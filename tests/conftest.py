@@ -0,0 +1,56 @@
+"""Shared fixtures of the tests.
+
+app.py creates its upload, processed and cache folders (and the job and
+metrics databases) in the working directory when imported, so the tests
+import it from a scratch directory.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import excel_io  # noqa: E402
+import synthetic  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def excel_app(tmp_path_factory):
+    """The app module, imported with a scratch working directory"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('workdir'))
+    try:
+        import app
+        app.job_queue.max_workers = 0  # Run queued jobs in the request thread
+        yield app
+    finally:
+        os.chdir(cwd)
+
+
+def messy_eway_bills(rows, seed=0):
+    """build_eway_bills() with the cells that make column types differ between chunks
+
+    Besides the exact duplicates of synthetic.py it has blank cells in a
+    numeric column, text in a column of numbers and a column that is empty
+    until its last rows.
+    """
+    df = synthetic.build_eway_bills(rows, sellers=30, buyers=200, products=20, duplicate_rate=0.05, seed=seed)
+    df['Tax Val.'] = df['Tax Val.'].astype(object)
+    df.loc[df.index[rows // 3:rows // 3 + 5], 'Tax Val.'] = None
+    df['Latest Vehicle No.'] = df['Latest Vehicle No.'].astype(object)
+    df.loc[df.index[: rows // 2], 'Latest Vehicle No.'] = np.arange(rows // 2)
+    df['Remarks'] = pd.Series([None] * (rows - 3) + ['LATE', 'NA', 7], index=df.index, dtype=object)
+    return df
+
+
+@pytest.fixture(scope='session')
+def eway_workbook(tmp_path_factory):
+    """Path of a messy_eway_bills() workbook of 2000 rows"""
+    path = str(tmp_path_factory.mktemp('workbooks') / 'eway_bills.xlsx')
+    excel_io.write_excel(messy_eway_bills(2000), path)
+    return path
@@ -0,0 +1,97 @@
+"""The pandas and SQLite analytics backends must render the same pages and exports."""
+import os
+import sys
+import uuid
+from urllib.parse import urlencode
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import synthetic  # noqa: E402
+
+import excel_io  # noqa: E402
+
+BACKENDS = ['pandas', 'sqlite']
+
+
+@pytest.fixture(scope='module')
+def dataset(excel_app, tmp_path_factory):
+    """(session_id, seller names by rows) of a small cleaned dataset in the session cache"""
+    folder = tmp_path_factory.mktemp('backends')
+    upload = str(folder / 'upload.xlsx')
+    price_file = str(folder / 'prices.xlsx')
+    excel_io.write_excel(synthetic.build_eway_bills(2000, sellers=30, buyers=200, products=20), upload)
+    excel_io.write_excel(synthetic.build_price_list(products=20, extra_codes=50), price_file)
+
+    success, message, processed = excel_app.process_excel_file(upload)
+    assert success, message
+    processed_path = str(folder / 'processed.xlsx')
+    excel_io.write_excel(processed, processed_path)
+    price_list = excel_app.register_price_list(price_file, 'prices.xlsx')
+    success, message, _, cleaned, _ = excel_app.process_data_cleaner(processed_path, price_list['id'])
+    assert success, message
+
+    session_id = str(uuid.uuid4())
+    excel_app.write_session_dataset(session_id, cleaned)
+    excel_app.compact_session_dataset(session_id)
+    sellers = excel_app.split_gstin_name_vectorized(cleaned['From GSTIN & Name'])[1].value_counts().index
+    return session_id, list(sellers)
+
+
+@pytest.fixture
+def client(excel_app, dataset):
+    client = excel_app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['session_id'] = dataset[0]
+        sess['has_data'] = True
+    return client
+
+
+def render_all(excel_app, client, monkeypatch, backend, urls):
+    monkeypatch.setitem(excel_app.app.config, 'ANALYTICS_BACKEND', backend)
+    pages = {}
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200, (backend, url)
+        pages[url] = response.get_data()
+    return pages
+
+
+def assert_backends_agree(excel_app, client, monkeypatch, urls):
+    pandas_pages, sqlite_pages = (render_all(excel_app, client, monkeypatch, backend, urls) for backend in BACKENDS)
+    for url in urls:
+        assert pandas_pages[url] == sqlite_pages[url], url
+
+
+def test_summary(excel_app, client, monkeypatch):
+    urls = ['/summary'] + [f'/summary?page={page}' for page in (2, 3, 1000)]
+    assert_backends_agree(excel_app, client, monkeypatch, urls)
+
+
+def test_compare_sellers(excel_app, client, monkeypatch, dataset):
+    sellers = dataset[1]
+    pairs = [(sellers[0], sellers[1]), (sellers[1], sellers[0]), (sellers[0], sellers[-1]),
+             (sellers[2], sellers[2]), (sellers[0], 'NO SUCH SELLER')]
+    urls = [f"/compare_sellers?{urlencode({'seller1': seller1, 'seller2': seller2, 'page': page})}"
+            for seller1, seller2 in pairs for page in (1, 2, 1000)]
+    assert_backends_agree(excel_app, client, monkeypatch, urls)
+
+
+def test_csv_exports(excel_app, client, monkeypatch, dataset):
+    sellers = dataset[1]
+    urls = ['/export/summary.csv', '/export/seller_analysis.csv',
+            f"/export/comparison.csv?{urlencode({'seller1': sellers[0], 'seller2': sellers[1]})}",
+            f"/export/comparison.csv?{urlencode({'seller1': sellers[-1], 'seller2': sellers[3]})}"]
+    assert_backends_agree(excel_app, client, monkeypatch, urls)
+
+
+def test_build_locks_are_released(excel_app, client, monkeypatch, dataset):
+    database = os.path.join(excel_app.app.config['CACHE_FOLDER'], f"{dataset[0]}.analytics.sqlite3")
+    if os.path.exists(database):
+        os.remove(database)
+    render_all(excel_app, client, monkeypatch, 'sqlite', ['/summary'])
+    assert os.path.exists(database)
+    assert len(excel_app._analytics_build_locks) == 0
@@ -0,0 +1,99 @@
+"""Appending an export adds only its new rows, and the analytics views follow incrementally."""
+import uuid
+
+import pandas as pd
+import pytest
+
+import excel_io
+import instrumentation
+import jobs
+import session_store
+import synthetic
+
+
+@pytest.fixture(scope='module')
+def exports(tmp_path_factory):
+    """(first, second, both) workbooks: second repeats the last third of first's rows"""
+    folder = tmp_path_factory.mktemp('append')
+    df = synthetic.build_eway_bills(1800, sellers=30, buyers=200, products=20)
+    paths = {}
+    for name, rows in (('first', df.iloc[:1200]), ('second', df.iloc[800:]), ('both', df)):
+        paths[name] = str(folder / f'{name}.xlsx')
+        excel_io.write_excel(rows, paths[name])
+    return paths
+
+
+def handle(excel_app):
+    return jobs.JobHandle(excel_app.job_queue.db_path, str(uuid.uuid4()))
+
+
+def session_context(excel_app, session_id):
+    context = excel_app.app.test_request_context()
+    context.push()
+    excel_app.session['session_id'] = session_id
+    excel_app.session['has_data'] = True
+    return context
+
+
+def uploaded(excel_app, path):
+    session_id = str(uuid.uuid4())
+    excel_app.upload_job(handle(excel_app), session_id, path, f'{session_id}.xlsx', 'upload.xlsx')
+    return session_id
+
+
+def test_append(excel_app, exports, monkeypatch):
+    folder = excel_app.app.config['CACHE_FOLDER']
+    monkeypatch.setitem(excel_app.app.config, 'RESULT_CACHE_BYTES', 0)
+    session_id = uploaded(excel_app, exports['first'])
+    base_rows = len(session_store.read_dataset(folder, session_id))
+
+    # The views of the loaded data are cached before the append
+    context = session_context(excel_app, session_id)
+    try:
+        assert excel_app.load_summary() is not None
+        assert excel_app.load_seller_analysis() is not None
+    finally:
+        context.pop()
+
+    result = excel_app.append_job(handle(excel_app), session_id, exports['second'], 'appended.xlsx', 'second.xlsx')
+
+    # Only the rows of the second file that were not loaded are stored, after the loaded ones
+    expected = session_store.read_dataset(folder, uploaded(excel_app, exports['both']))
+    stored = session_store.read_dataset(folder, session_id)
+    assert f"Added {len(expected) - base_rows:,} new rows" in result['message']
+    pd.testing.assert_frame_equal(stored, expected, check_categorical=False)
+
+    # The row index is stored for the new version and matches the rows
+    index = session_store.read_row_index(folder, session_id)
+    assert index['version'] == session_store.dataset_version(folder, session_id)
+    assert (index['digests'] == excel_app.stored_row_digests(session_id, index['column_types'])).all()
+
+    # The summary and seller analysis add up just the new rows and agree with a full recompute
+    context = session_context(excel_app, session_id)
+    try:
+        with instrumentation.collect() as timings:
+            summary = excel_app.load_summary()['summary']
+            analysis = excel_app.load_seller_analysis()
+        assert 'summary' not in timings and 'seller_analysis' not in timings
+        full_summary = excel_app.generate_summary(excel_app.load_from_session(columns=excel_app.SUMMARY_COLUMNS))
+        full_analysis = excel_app.generate_seller_analysis(
+            excel_app.load_from_session(columns=excel_app.seller_analysis_columns()))
+    finally:
+        context.pop()
+    pd.testing.assert_frame_equal(summary, full_summary, check_categorical=False)
+    for name in excel_app.SELLER_AGGREGATE_KEYS:
+        pd.testing.assert_frame_equal(analysis[name], full_analysis[name], check_categorical=False)
+    assert analysis['seller_index']['totals'] == pytest.approx(
+        excel_app.build_seller_index(full_analysis['processed_data'])['totals'])
+
+    # The next append reads the stored row index instead of hashing the loaded rows again
+    excel_app.invalidate_session_caches(session_id)
+
+    def rebuilt(*args):
+        raise AssertionError('the row index was rebuilt')
+
+    monkeypatch.setattr(excel_app, 'stored_row_digests', rebuilt)
+    version = session_store.dataset_version(folder, session_id)
+    result = excel_app.append_job(handle(excel_app), session_id, exports['second'], 'again.xlsx', 'second.xlsx')
+    assert result['message'].startswith('Added 0 new rows')
+    assert session_store.dataset_version(folder, session_id) == version
@@ -0,0 +1,43 @@
+"""process_excel_file_chunked must store the dataset process_excel_file gives for the whole sheet."""
+import uuid
+
+import pandas as pd
+import pytest
+
+import excel_io
+import instrumentation
+import session_store
+
+
+def dedup_removed(timings):
+    totals = timings.get('dedup', {'rows_in': 0, 'rows_out': 0})
+    return totals['rows_in'] - totals['rows_out']
+
+
+@pytest.mark.parametrize('engine', excel_io.reader_engines())
+@pytest.mark.parametrize('chunk_rows', [300, 50000])
+def test_chunked_matches_whole_sheet(excel_app, eway_workbook, monkeypatch, engine, chunk_rows):
+    monkeypatch.setitem(excel_app.app.config, 'EXCEL_READER', engine)
+    monkeypatch.setitem(excel_app.app.config, 'CHUNKED_EXCEL_READER', engine)
+    monkeypatch.setitem(excel_app.app.config, 'PROCESS_CHUNK_ROWS', chunk_rows)
+    folder = excel_app.app.config['CACHE_FOLDER']
+
+    with instrumentation.collect() as timings:
+        success, message, whole = excel_app.process_excel_file(eway_workbook)
+    assert success, message
+    whole_removed = dedup_removed(timings)
+    assert whole_removed > 0
+    whole_id = str(uuid.uuid4())
+    excel_app.write_session_dataset(whole_id, whole)
+
+    chunked_id = str(uuid.uuid4())
+    with instrumentation.collect() as timings:
+        success, message = excel_app.process_excel_file_chunked(eway_workbook, chunked_id)
+    assert success, message
+    # The second pass runs again when the dataset cannot be stored as feather and falls back to pickle
+    passes = timings['dedup']['calls'] // timings['self_pan_filter']['calls']
+    assert dedup_removed(timings) == whole_removed * passes
+
+    chunked = session_store.read_dataset(folder, chunked_id)
+    pd.testing.assert_frame_equal(chunked, session_store.read_dataset(folder, whole_id))
+    pd.testing.assert_frame_equal(chunked, whole.reset_index(drop=True))
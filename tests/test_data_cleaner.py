@@ -0,0 +1,124 @@
+"""The vectorized data cleaner must match the row-by-row HSN join it replaced."""
+import numpy as np
+import pandas as pd
+
+import excel_io
+
+MAIN_ROWS = [
+    # HSN Code, HSN Desc., Assess Val.
+    (72001000, 'OLD 0', 250000.0),
+    ('72001000', 'OLD 0 AS TEXT', 1000.0),
+    (' 7200 1001 ', 'SPACES', 5000.0),
+    ('73001A', 'LETTERS', 8000.0),
+    (73001002, 'DUPLICATED IN PRICES', 9000.0),
+    (None, 'BLANK CODE', 7000.0),
+    ('', 'EMPTY CODE', 7000.0),
+    ('   ', 'SPACE CODE', 7000.0),
+    (99999999, 'NOT IN PRICES', 3000.0),
+    (72001003, 'PADDED PRICE', 12000.0),
+    (72001004, 'TEXT PRICE', 12000.0),
+    (72001005, 'ZERO PRICE', 12000.0),
+    (72001006, 'COMMA PRICE', 12000.0),
+    (72001007, 'EXPONENT PRICE', ' 4500 '),
+    (72001008, 'MISSING PRICE', 'n/a value'),
+    (72001007, 'TEXT ASSESS VALUE', 'abc'),
+    (72001003, 'MISSING ASSESS VALUE', None),
+    (72001009, 'UNDERSCORE PRICE', '12_000'),
+    (72001010, 'NEGATIVE PRICE', -6000.0),
+]
+
+PRICE_ROWS = [
+    # HSN Code, HSN Desc, 2024-25
+    (72001000, 'STEEL 0', 50.0),
+    ('72001001', 'STEEL 1', 60),
+    ('73001a', 'PIPES', 70.5),
+    (73001002, 'PIPES 2', 80.0),
+    ('73001002', 'PIPES 2 AGAIN', 81.0),
+    (None, 'NO CODE', 90.0),
+    ('', 'EMPTY CODE', 91.0),
+    ('  ', 'SPACE CODE', 92.0),
+    (None, 'NO CODE AGAIN', 93.0),
+    (72001003, 'STEEL 3', ' 12.5 '),
+    (72001004, 'STEEL 4', 'abc'),
+    (72001005, 'STEEL 5', 0),
+    (72001006, 'STEEL 6', '1,200'),
+    (72001007, 'STEEL 7', '1e3'),
+    (72001008, 'STEEL 8', None),
+    (72001009, 'STEEL 9', '12_0'),
+    (72001010, 'STEEL 10', '-3'),
+]
+
+
+def reference_cleaner(main_df, price_df, clean_hsn_code):
+    """The join and QTY.MT of process_data_cleaner before it was vectorized: (stats, main_df, updated rows)"""
+    main_df = main_df.copy()
+    price_df = price_df.copy()
+    main_hsn_col, main_desc_col = 'HSN Code', 'HSN Desc.'
+    price_hsn_col, price_desc_col, price_2024_25_col = 'HSN Code', 'HSN Desc', '2024-25'
+
+    main_df['_cleaned_hsn'] = main_df[main_hsn_col].apply(clean_hsn_code)
+    price_df['_cleaned_hsn'] = price_df[price_hsn_col].apply(clean_hsn_code)
+    hsn_counts = price_df['_cleaned_hsn'].value_counts()
+    duplicate_hsn = set(hsn_counts[hsn_counts > 1].index)
+
+    hsn_to_data = {}
+    for _, row in price_df.iterrows():
+        cleaned_hsn = row['_cleaned_hsn']
+        if cleaned_hsn and cleaned_hsn not in hsn_to_data and cleaned_hsn not in duplicate_hsn:
+            hsn_to_data[cleaned_hsn] = {'desc': row[price_desc_col], 'price': row[price_2024_25_col]}
+
+    updated_rows = 0
+    not_updated_rows = 0
+    updated_indices = []
+    if price_2024_25_col not in main_df.columns:
+        main_df[price_2024_25_col] = None
+    for idx, row in main_df.iterrows():
+        cleaned_hsn = row['_cleaned_hsn']
+        if cleaned_hsn and cleaned_hsn in hsn_to_data:
+            main_df.at[idx, main_desc_col] = hsn_to_data[cleaned_hsn]['desc']
+            main_df.at[idx, price_2024_25_col] = hsn_to_data[cleaned_hsn]['price']
+            updated_rows += 1
+            updated_indices.append(idx)
+        else:
+            not_updated_rows += 1
+    main_df.drop(columns=['_cleaned_hsn'], inplace=True)
+
+    def calculate_qty_mt(row):
+        try:
+            assess_val = row['Assess Val.']
+            price = row[price_2024_25_col]
+            if pd.notna(assess_val) and pd.notna(price) and float(price) != 0:
+                return float(assess_val) / (float(price) * 1000)
+            return None
+        except Exception:
+            return None
+
+    main_df['QTY.MT'] = main_df.apply(calculate_qty_mt, axis=1)
+    stats = {'total_rows': len(main_df), 'updated_rows': updated_rows, 'not_updated_rows': not_updated_rows,
+             'matched_hsn': len(hsn_to_data)}
+    return stats, main_df, updated_indices
+
+
+def missing_as_none(series):
+    return series.astype(object).where(series.notna(), None)
+
+
+def test_matches_row_by_row_join(excel_app, tmp_path):
+    main_path, price_path = str(tmp_path / 'main.xlsx'), str(tmp_path / 'prices.xlsx')
+    excel_io.write_excel(pd.DataFrame(MAIN_ROWS, columns=['HSN Code', 'HSN Desc.', 'Assess Val.']), main_path)
+    excel_io.write_excel(pd.DataFrame(PRICE_ROWS, columns=['HSN Code', 'HSN Desc', '2024-25']), price_path)
+
+    price_list = excel_app.register_price_list(price_path, 'prices.xlsx')
+    success, message, stats, cleaned, highlight = excel_app.process_data_cleaner(main_path, price_list['id'])
+    assert success, message
+
+    expected_stats, expected, updated = reference_cleaner(
+        excel_io.read_excel(main_path), excel_io.read_excel(price_path), excel_app.clean_hsn_code)
+    assert stats == expected_stats
+    assert stats['updated_rows'] and stats['not_updated_rows']
+    for col in ('HSN Code', 'HSN Desc.', 'Assess Val.', '2024-25'):
+        # Missing cells are written the same whether they hold None or NaN
+        pd.testing.assert_series_equal(missing_as_none(cleaned[col]), missing_as_none(expected[col]))
+    np.testing.assert_array_equal(cleaned['QTY.MT'].to_numpy(dtype='float64'),
+                                  expected['QTY.MT'].to_numpy(dtype='float64'))
+    assert np.flatnonzero(~np.asarray(highlight)).tolist() == updated
@@ -0,0 +1,74 @@
+"""DataFrameCache: LRU eviction within the memory budget, versions and its counters."""
+import numpy as np
+import pandas as pd
+
+import session_store
+
+
+def frame(value, rows=1000):
+    return pd.DataFrame({'a': np.full(rows, value, dtype='int64'), 'b': np.full(rows, float(value))})
+
+
+def budget_for(frames):
+    return sum(int(df.memory_usage(index=True, deep=True).sum()) for df in frames)
+
+
+def test_evicts_least_recently_used():
+    cache = session_store.DataFrameCache(budget_for([frame(0), frame(0)]))
+    cache.put('one', 'v1', frame(1))
+    cache.put('two', 'v1', frame(2))
+    assert cache.get('one', 'v1') is not None  # 'two' is now the least recently used
+    cache.put('three', 'v1', frame(3))
+
+    assert cache.get('two', 'v1') is None
+    assert cache.get('one', 'v1')['a'].iloc[0] == 1
+    assert cache.get('three', 'v1')['a'].iloc[0] == 3
+    assert cache.stats() == {'entries': 2, 'bytes': budget_for([frame(0), frame(0)]),
+                             'max_bytes': budget_for([frame(0), frame(0)]), 'hits': 3, 'misses': 1,
+                             'evictions': 1}
+
+
+def test_new_version_replaces_old():
+    cache = session_store.DataFrameCache(budget_for([frame(0)] * 4))
+    cache.put('one', 'v1', frame(1))
+    cache.put('one', 'v1', frame(1)[['a']], columns=['a'])
+    cache.put('other', 'v1', frame(9))
+    cache.put('one', 'v2', frame(2))
+
+    assert cache.get('one', 'v1') is None
+    assert cache.get('one', 'v1', columns=['a']) is None
+    assert cache.get('one', 'v2')['a'].iloc[0] == 2
+    assert cache.get('other', 'v1') is not None  # Other sessions keep their entries
+    assert cache.latest('one')[0] == 'v2'
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 0
+
+
+def test_columns_and_invalidate():
+    cache = session_store.DataFrameCache(budget_for([frame(0)] * 4))
+    cache.put('one', 'v1', frame(1))
+    pd.testing.assert_frame_equal(cache.get('one', 'v1', columns=['b', 'missing']), frame(1)[['b']])
+
+    cache.invalidate('one')
+    assert cache.get('one', 'v1') is None
+    assert cache.latest('one') == (None, None)
+    assert cache.stats()['bytes'] == 0
+
+
+def test_over_budget_and_disabled():
+    cache = session_store.DataFrameCache(budget_for([frame(0)]) - 1)
+    cache.put('one', 'v1', frame(1))
+    assert cache.get('one', 'v1') is None
+
+    cache = session_store.DataFrameCache(0)
+    cache.put('one', 'v1', frame(1))
+    assert cache.stats()['entries'] == 0
+
+
+def test_metrics_report_memory_caches(excel_app):
+    text = excel_app.app.test_client().get('/metrics').get_data(as_text=True)
+    for name in excel_app.MEMORY_CACHES:
+        for metric in ('hits_total', 'misses_total', 'evictions_total', 'bytes', 'entries'):
+            assert f'memory_cache_{metric}{{cache="{name}"}}' in text
+    metrics = excel_app.app.test_client().get('/storage/metrics').get_json()
+    assert set(metrics['memory_caches']) == set(excel_app.MEMORY_CACHES)
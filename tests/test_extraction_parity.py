@@ -0,0 +1,143 @@
+"""The *_vectorized column helpers must give exactly what the per-row helpers give through Series.apply."""
+import numpy as np
+import pandas as pd
+import pytest
+
+GSTIN_NAMES = [
+    '01AAACI6306G1Z7 / IND LABORATORIES LTD',
+    '01AAACI6306G1Z7 / IND LABORATORIES LTD',  # Repeated values are split once
+    None,
+    np.nan,
+    12345,
+    3.5,
+    '',
+    '   ',
+    '01AAACI6306G1Z7',                      # No ' / '
+    '01AAACI6306G1Z7/IND LABS',             # '/' without spaces
+    '01AAACI6306G1Z7 /IND LABS',
+    '  27AAACR1234A1Z5  /  R / S TRADERS / UNIT 2 ',  # Extra '/' and whitespace
+    '/ NAME ONLY',
+    '01AAACI6306G1Z7 / ',
+    'SHORT / X',
+    '\t09ABCDE1234F1Z5\t/\tTAB TRADERS\n',
+]
+
+GSTINS = ['01AAACI6306G1Z7', ' 01AAACI6306G1Z7', 'SHORT', '123456789', '1234567890', '', None, np.nan, 42]
+
+EWB_DATES = [
+    '6713 - 02/09/2023 17:41:00',
+    '6713 - 13/09/2023 10:00:00',   # Only valid as DD/MM
+    '6713 - 09/13/2023 10:00:00',   # Only valid as MM/DD: the fallback
+    '6713 - 01/02/2023 10:00:00',   # Valid both ways: DD/MM wins
+    '6713 - 29/02/2023 10:00:00',   # Not a date either way
+    '6713 - 29/02/2024 10:00:00',   # Leap day
+    '6713 - 13/13/2023 10:00:00',   # Month 13 either way
+    '6713 - 01/01/1500 10:00:00',   # Outside the datetime64 range
+    '6713 -  02/09/2023   17:41:00',
+    '6713 - 02/09/2023',
+    '6713 - ',
+    'a - b - 02/09/2023 10:00:00',
+    '6713 02/09/2023 17:41:00',     # No ' - '
+    '6713-02/09/2023 17:41:00',
+    None,
+    np.nan,
+    7,
+]
+
+ASSESS_VALUES = [5000.0, -5000.0, 15000.0, 25000.0, -15000.0, 35000.0, 14999.99, 4999.999999, 0.0,
+                 1234567.0, 1e12 + 5000, 0.00005, np.nan]
+
+
+def assert_same(vectorized, scalar):
+    pd.testing.assert_series_equal(vectorized, scalar, check_dtype=False)
+    # assert_series_equal takes None and NaN as equal; the pipeline writes them differently
+    assert [value is None for value in vectorized.tolist()] == [value is None for value in scalar.tolist()]
+
+
+@pytest.mark.parametrize('values', [
+    GSTIN_NAMES,
+    [None, np.nan],
+    [1.0, 2.0, np.nan],
+    ['01AAACI6306G1Z7 / A', 'NO SLASH'],
+])
+def test_split_gstin_name(excel_app, values):
+    series = pd.Series(values, dtype=object)
+    gstin, name = excel_app.split_gstin_name_vectorized(series)
+    assert_same(gstin, series.apply(excel_app.extract_gstin))
+    assert_same(name, series.apply(excel_app.extract_name))
+
+
+def test_split_gstin_name_numeric_column(excel_app):
+    series = pd.Series([1.0, 2.0, np.nan])
+    gstin, name = excel_app.split_gstin_name_vectorized(series)
+    assert_same(gstin, series.apply(excel_app.extract_gstin).astype(object))
+    assert_same(name, series.apply(excel_app.extract_name).astype(object))
+
+
+@pytest.mark.parametrize('values', [GSTINS, [None, np.nan], ['SHORT']])
+def test_extract_pan(excel_app, values):
+    series = pd.Series(values, dtype=object)
+    assert_same(excel_app.extract_pan_vectorized(series), series.apply(excel_app.extract_pan))
+
+
+@pytest.mark.parametrize('values', [GSTIN_NAMES, [None, np.nan], ['SHORT / X', 'NO SLASH']])
+def test_extract_pan_from_gstin_name(excel_app, values):
+    series = pd.Series(values, dtype=object)
+    assert_same(excel_app.extract_pan_from_gstin_name_vectorized(series),
+                series.apply(excel_app.extract_pan_from_gstin_name))
+
+
+@pytest.mark.parametrize('values', [
+    EWB_DATES,
+    ['6713 02/09/2023 17:41:00', '6714 03/09/2023'],  # No row has ' - '
+    [None, np.nan],
+])
+def test_extract_date(excel_app, values):
+    series = pd.Series(values, dtype=object)
+    assert_same(excel_app.extract_date_vectorized(series), series.apply(excel_app.extract_date))
+
+
+def test_extract_date_numeric_column(excel_app):
+    series = pd.Series([6713.0, np.nan])
+    assert_same(excel_app.extract_date_vectorized(series), series.apply(excel_app.extract_date).astype(object))
+
+
+@pytest.mark.parametrize('series', [
+    pd.Series(ASSESS_VALUES),
+    pd.Series([5000, 15000, -25000, 45000, 123456789]),
+    pd.Series([5000.0, '15000', '25000.0', '12,345', 'abc', None, np.nan, 35000], dtype=object),
+    pd.Series([True, False]),
+])
+def test_round_assess_value(excel_app, series):
+    assert_same(excel_app.round_assess_value_vectorized(series), series.apply(excel_app.round_assess_value))
+
+
+def test_round_assess_value_ties(excel_app):
+    """Every exact multiple of 5000 is a tie, rounded half to even as Python's round() does"""
+    series = pd.Series(np.arange(-200, 201) * 5000.0)
+    assert_same(excel_app.round_assess_value_vectorized(series), series.apply(excel_app.round_assess_value))
+
+
+def row_quantity(row, price_col):
+    """The per-row Qty.MT of seller_rows before it was vectorized"""
+    try:
+        price_val = row[price_col]
+        assess_val = row['Assess Val.']
+        if pd.notna(price_val) and pd.notna(assess_val) and float(price_val) != 0:
+            return float(assess_val) / (float(price_val) * 1000)
+        return 0.0
+    except Exception:
+        return 0.0
+
+
+@pytest.mark.parametrize('assess, price', [
+    ([250000.0, 1000.0, np.nan, 5000.0, 0.0, -6000.0, 1e12], [50.0, 0.0, 60.0, np.nan, 70.0, 80.0, 1e-3]),
+    ([250000, 1000, 5000, 12000, 12000, 12000, 12000, 12000],
+     [' 12.5 ', 'abc', 0, '1,200', '1e3', None, '12_0', True]),
+    (['4500', ' 4500 ', 'n/a value', None, '12_000', 3, 4.5, 'inf'], [60, 60, 60, 60, 60, '0', 60, 60]),
+])
+def test_seller_quantity(excel_app, assess, price):
+    df = pd.DataFrame({'From GSTIN & Name': '01AAACI6306G1Z7 / IND LABORATORIES LTD',
+                       'Assess Val.': assess, 'Price 2024-25': price})
+    expected = df.apply(row_quantity, axis=1, price_col='Price 2024-25')
+    pd.testing.assert_series_equal(excel_app.seller_rows(df)['QUANTITY_MT'], expected, check_names=False)
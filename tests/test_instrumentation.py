@@ -0,0 +1,51 @@
+"""Stage, route and gauge totals are kept in memory and written to the metrics file by flush()."""
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import instrumentation
+
+
+@pytest.fixture
+def metrics_db(tmp_path, monkeypatch):
+    instrumentation.flush()  # Totals recorded by other tests go to their own file
+    path = str(tmp_path / 'metrics.sqlite3')
+    monkeypatch.setattr(instrumentation, '_db_path', None)
+    instrumentation.configure(path)
+    monkeypatch.setattr(instrumentation, 'FLUSH_SECONDS', 3600)
+    yield path
+    instrumentation.flush()
+
+
+def rows(path, sql):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_totals_are_written_on_flush(metrics_db):
+    for rows_in, rows_out in ((4, 3), (6, 6)):
+        instrumentation.record_stage('dedup', 0.5, rows_in, rows_out, memory_delta=rows_in)
+    instrumentation.record_route('/summary', 'GET', 200, 0.25)
+    instrumentation.record_route('/summary', 'GET', 200, 0.25)
+    instrumentation.set_gauge('session_dataset_bytes', 'Size', 10, state='after')
+    instrumentation.set_gauge('session_dataset_bytes', 'Size', 8, state='after')
+    assert rows(metrics_db, "SELECT * FROM stages") == []
+
+    instrumentation.flush()
+    instrumentation.record_stage('dedup', 1.0, 2, 1)
+    instrumentation.flush()
+    assert rows(metrics_db, "SELECT * FROM stages") == [('dedup', 3, 2.0, 12, 10, 6)]
+    assert rows(metrics_db, "SELECT * FROM routes") == [('/summary', 'GET', 200, 2, 0.5)]
+    assert rows(metrics_db, "SELECT value FROM gauges") == [(8,)]
+
+
+def test_flush_is_due_after_flush_seconds(metrics_db, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'FLUSH_SECONDS', 0)
+    instrumentation.record_stage('read', 0.1, 0, 5)
+    assert rows(metrics_db, "SELECT name, calls FROM stages") == [('read', 1)]
+
+
+def test_prometheus_text_includes_unflushed_totals(metrics_db):
+    instrumentation.record_stage('read', 0.1, 0, 5)
+    assert 'pipeline_stage_rows_out_total{stage="read"} 5' in instrumentation.prometheus_text()